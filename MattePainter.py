@@ -19,6 +19,7 @@ bl_info = {
 
 import os
 import bpy
+import bpy.utils.previews
 import bpy_extras
 from bpy.props import PointerProperty, BoolProperty
 import math 
@@ -30,6 +31,18 @@ import shutil
 from bpy_extras import view3d_utils
 from bpy_extras.io_utils import ImportHelper
 import time, sys
+import json
+import re
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, wait
+import numpy as np
+from bpy.app.handlers import persistent
+
+# The pixel engine ships next to the add-on, install the zip from build_release.py rather than MattePainter.py on its own
+try:
+	import mattepainter_pixels
+except ImportError as error:
+	raise ImportError("MattePainter.py needs mattepainter_pixels.py installed next to it, install the zip made by build_release.py instead of the single file") from error
 
 # Draw Functions
 import blf
@@ -246,6 +259,1006 @@ def MATTEPAINTER_FN_setShaders(nodes, links, image_file, mask=None):
 	node_colorramp_roughness.location = Vector((-500,-600))
 	node_bump.location = Vector((-500,-900))
 
+def MATTEPAINTER_FN_getFadedPixels(nodes, node_name, blur_name, linearise=True):
+	# Pixels of a texture node as the shader sees them: byte sRGB linearised first (like the texture node does),
+	# then cross-faded with the precomputed blur by the same amount as the fade node
+	image = nodes.get(node_name).image
+	pixels = mattepainter_pixels.read_image_pixels(image)
+	if linearise and not image.is_float and image.colorspace_settings.name == 'sRGB':
+		pixels[:, :, :3] = mattepainter_pixels.srgb_to_linear(pixels[:, :, :3])
+	node_blur = nodes.get(blur_name)
+	amount = nodes.get('blur_amount').outputs['Value'].default_value if nodes.get('blur_amount') else 0.0
+	if node_blur is not None and node_blur.image is not None and amount > 0.0 and tuple(node_blur.image.size) == tuple(image.size):
+		blurred = mattepainter_pixels.read_image_pixels(node_blur.image)
+		if linearise and not node_blur.image.is_float and node_blur.image.colorspace_settings.name == 'sRGB':
+			blurred[:, :, :3] = mattepainter_pixels.srgb_to_linear(blurred[:, :, :3])
+		pixels += (blurred - pixels) * min(amount, 1.0)
+	return pixels
+
+def MATTEPAINTER_FN_getLayerAlpha(nodes, albedo_pixels=None):
+	# Visible alpha of a Layer as a (height, width) matrix: mask (or image alpha for paint layers), invert, original alpha,
+	# each faded with its precomputed blur. Pass the albedo when it has been read already, only its alpha is used.
+	# The shader reads the mask through the texture's Color output, so byte sRGB masks are linearised like it does.
+	if albedo_pixels is None:
+		albedo_pixels = MATTEPAINTER_FN_getFadedPixels(nodes, 'albedo', 'albedo_blur', linearise=False)
+	node_mask = nodes.get('transparency_mask')
+	if node_mask is None:
+		alpha = albedo_pixels[:, :, 3].copy()
+	else:
+		alpha = MATTEPAINTER_FN_getFadedPixels(nodes, 'transparency_mask', 'mask_blur')[:, :, 0].copy()
+		if not nodes.get('combineoriginalalpha').mute and alpha.shape == albedo_pixels.shape[:2]:
+			alpha *= albedo_pixels[:, :, 3]
+	if not nodes.get('invert').mute:
+		alpha = 1.0 - alpha
+	return alpha
+
+def MATTEPAINTER_FN_newImageFromPixels(name, pixels, source):
+	# Creates a new Image from a (height, width, 4) matrix with the source Image's precision, color space & alpha mode,
+	# so float plates are not clamped to 8 bits and Non-Color data is not shown as sRGB
+	image = bpy.data.images.new(name=name, width=pixels.shape[1], height=pixels.shape[0], alpha=True, float_buffer=source.is_float)
+	image.colorspace_settings.name = source.colorspace_settings.name
+	image.alpha_mode = source.alpha_mode
+	mattepainter_pixels.write_image_pixels(image, pixels)
+	return image
+
+def MATTEPAINTER_FN_saveImageBeside(image, source, suffix):
+	# Writes a derived Image next to its source's file (PNG, or EXR for float Images), keeps packed sources packed.
+	# Returns False when the source lives nowhere on disk, the new Image is then as unsaved as its source was.
+	if source.packed_file is not None:
+		image.pack()
+		return True
+	filepath = bpy.path.abspath(source.filepath_raw)
+	if source.source != 'FILE' or source.filepath_raw == '' or not os.path.isabs(filepath):
+		return False
+	directory, filename = os.path.split(filepath)
+	extension, file_format = ('.exr', 'OPEN_EXR') if image.is_float else ('.png', 'PNG')
+	image.filepath_raw = os.path.join(directory, os.path.splitext(filename)[0] + suffix + extension)
+	image.file_format = file_format
+	image.save()
+	return True
+
+def MATTEPAINTER_FN_getMeshUVs(mesh):
+	# Returns (vertex coordinates, per-vertex UVs, affine UV -> position fit) of a Layer's plane
+	loop_count = len(mesh.loops)
+	vertex_count = len(mesh.vertices)
+	coords = np.empty(vertex_count * 3, dtype=np.float64)
+	mesh.vertices.foreach_get('co', coords)
+	coords = coords.reshape(-1, 3)
+	vertex_indices = np.empty(loop_count, dtype=np.int64)
+	mesh.loops.foreach_get('vertex_index', vertex_indices)
+	uvs = np.empty(loop_count * 2, dtype=np.float64)
+	mesh.uv_layers.active.data.foreach_get('uv', uvs)
+	uvs = uvs.reshape(-1, 2)
+	vertex_uvs = np.zeros((vertex_count, 2), dtype=np.float64)
+	vertex_uvs[vertex_indices] = uvs
+	return coords, vertex_uvs, mattepainter_pixels.fit_uv_to_position(uvs, coords[vertex_indices])
+
+def MATTEPAINTER_FN_cropLayerGeometry(mesh, uv_bounds):
+	# Moves a Layer's vertices so the plane only covers uv_bounds of the original, UVs stay 0-1 for the cropped image.
+	# Vertex positions follow the plane's UV -> position mapping, so the on-screen result is unchanged.
+	coords, vertex_uvs, affine = MATTEPAINTER_FN_getMeshUVs(mesh)
+	coords = mattepainter_pixels.uv_to_position(affine, mattepainter_pixels.crop_uvs(vertex_uvs, uv_bounds))
+	mesh.vertices.foreach_set('co', coords.ravel())
+	mesh.update()
+
+def MATTEPAINTER_FN_newMeshFromUVs(name, affine, uvs, triangles, materials):
+	# Builds a Layer mesh from UV space triangles, positions come from the plane's UV -> position fit
+	mesh = bpy.data.meshes.new(name)
+	mesh.from_pydata(mattepainter_pixels.uv_to_position(affine, uvs).tolist(), [], triangles.tolist())
+	uv_layer = mesh.uv_layers.new(name='UVMap')
+	vertex_indices = np.empty(len(mesh.loops), dtype=np.int64)
+	mesh.loops.foreach_get('vertex_index', vertex_indices)
+	uv_layer.data.foreach_set('uv', np.asarray(uvs, dtype=np.float64)[vertex_indices].ravel())
+	for material in materials:
+		mesh.materials.append(material)
+	mesh.update()
+	return mesh
+
+def MATTEPAINTER_FN_getBlendSignature(nodes):
+	# Everything besides pixels that changes a Layer's visible alpha, plus what currently feeds the output
+	node_mask = nodes.get('transparency_mask')
+	surface = nodes.get('material_output').inputs['Surface'].links
+	return (
+		nodes.get('albedo').image.name if nodes.get('albedo').image else None,
+		node_mask.image.name if node_mask is not None and node_mask.image else None,
+		nodes.get('invert').mute,
+		nodes.get('combineoriginalalpha').mute,
+		round(nodes.get('opacity').inputs['Fac'].default_value, 4),
+		round(nodes.get('blur_amount').outputs['Value'].default_value, 4) if nodes.get('blur_amount') else 0.0,
+		surface[0].from_node.name if surface else None,
+	)
+
+def MATTEPAINTER_FN_setBlendMode(material, alpha_mode):
+	# OPAQUE Layers bypass the Mix Shader so the mask subgraph is never evaluated, BINARY ones use alpha clipping.
+	# Only writes what changed, every write triggers another depsgraph update.
+	nodes = material.node_tree.nodes
+	links = material.node_tree.links
+	material_output = nodes.get('material_output')
+	surface = material_output.inputs['Surface'].links
+	source = nodes.get('Principled BSDF') if alpha_mode == 'OPAQUE' else nodes.get('mix')
+	if surface and surface[0].from_node.name == 'opacity':
+		# Mask preview is on, leave the tree alone
+		return
+	if not surface or surface[0].from_node != source:
+		links.new(source.outputs[0], material_output.inputs['Surface'])
+	if bpy.app.version < (4, 3, 0):
+		blend_method = {'OPAQUE': 'OPAQUE', 'BINARY': 'CLIP', 'SOFT': 'HASHED'}[alpha_mode]
+		shadow_method = 'OPAQUE' if alpha_mode == 'OPAQUE' else 'CLIP'
+		if material.blend_method != blend_method:
+			material.blend_method = blend_method
+		if material.shadow_method != shadow_method:
+			material.shadow_method = shadow_method
+
+def MATTEPAINTER_FN_updateBlendMode(material):
+	# Analyses the Layer's alpha and applies the cheapest blend mode that still looks the same
+	nodes = material.node_tree.nodes
+	albedo = nodes.get('albedo').image
+	blurred = nodes.get('blur_amount') is not None and nodes.get('blur_amount').outputs['Value'].default_value > 0.0
+	if albedo is None or albedo.source not in ['FILE', 'GENERATED'] or nodes.get('opacity').inputs['Fac'].default_value < 1.0 or blurred:
+		alpha_mode = 'SOFT'
+	else:
+		alpha_mode = mattepainter_pixels.classify_alpha(MATTEPAINTER_FN_getLayerAlpha(nodes))
+	MATTEPAINTER_FN_setBlendMode(material, alpha_mode)
+	blend_mode_cache[material.name] = MATTEPAINTER_FN_getBlendSignature(nodes)
+	return alpha_mode
+
+def MATTEPAINTER_FN_isCurveIdentity(node_curves):
+	# True when every curve of an RGB Curves node is the default straight line
+	mapping = node_curves.mapping
+	if tuple(mapping.black_level) != (0.0, 0.0, 0.0) or tuple(mapping.white_level) != (1.0, 1.0, 1.0):
+		return False
+	for curve in mapping.curves:
+		points = [tuple(point.location) for point in curve.points]
+		if points != [(0.0, 0.0), (1.0, 1.0)]:
+			return False
+	return True
+
+def MATTEPAINTER_FN_isGradeNeutral(nodes):
+	# True when curves, HSV, blur and bump all leave the image untouched, muted nodes count as neutral
+	node_curves = nodes.get('curves')
+	node_HSV = nodes.get('HSV')
+	curves_neutral = node_curves.mute or node_curves.inputs['Fac'].default_value == 0.0 or MATTEPAINTER_FN_isCurveIdentity(node_curves)
+	HSV_neutral = node_HSV.mute or node_HSV.inputs['Fac'].default_value == 0.0 or (
+		node_HSV.inputs['Hue'].default_value == 0.5 and node_HSV.inputs['Saturation'].default_value == 1.0 and node_HSV.inputs['Value'].default_value == 1.0)
+	blur_neutral = nodes.get('blur_mix').inputs['Fac'].default_value == 0.0 and nodes.get('mixRGB').inputs['Fac'].default_value == 0.0
+	bump = [node for node in nodes if node.type == 'BUMP']
+	bump_neutral = all(node.inputs['Strength'].default_value == 0.0 for node in bump)
+	return curves_neutral and HSV_neutral and blur_neutral and bump_neutral
+
+def MATTEPAINTER_FN_isShaderLite(nodes):
+	return not nodes.get('HSV').outputs['Color'].links
+
+def MATTEPAINTER_FN_getAlbedoColor(nodes):
+	# The Layer's color before grading, the precomputed blur cross-fade when there is one
+	node_fade = nodes.get('blur_fade')
+	if node_fade is not None:
+		return node_fade.outputs['Color']
+	return nodes.get('albedo').outputs['Color']
+
+def MATTEPAINTER_FN_rerouteSocket(links, old_socket, new_socket):
+	# Moves every link leaving old_socket so it leaves new_socket instead
+	for link in list(old_socket.links):
+		to_socket = link.to_socket
+		links.remove(link)
+		links.new(new_socket, to_socket)
+
+def MATTEPAINTER_FN_addBlurNodes(nodes, links):
+	# Cross-fades the albedo (and mask) with precomputed blurred copies, one Value node drives every fade
+	if nodes.get('blur_amount') is not None:
+		return
+	node_albedo = nodes.get('albedo')
+	node_mask = nodes.get('transparency_mask')
+	node_amount = nodes.new(type="ShaderNodeValue")
+	node_amount.name = 'blur_amount'
+	node_amount.outputs['Value'].default_value = 0.0
+	node_amount.location = Vector((-1700.0, -600.0))
+
+	sources = [(node_albedo, 'albedo_blur', [('Color', 'blur_fade'), ('Alpha', 'blur_fade_alpha')])]
+	if node_mask is not None:
+		sources.append((node_mask, 'mask_blur', [('Color', 'mask_blur_fade')]))
+	for node_source, blur_name, fades in sources:
+		node_blur = nodes.new(type="ShaderNodeTexImage")
+		node_blur.name = blur_name
+		node_blur.extension = "CLIP"
+		node_blur.interpolation = node_source.interpolation
+		node_blur.location = node_source.location + Vector((0.0, -250.0))
+		if node_source.inputs['Vector'].links:
+			links.new(node_source.inputs['Vector'].links[0].from_socket, node_blur.inputs['Vector'])
+		for offset, (output, fade_name) in enumerate(fades):
+			node_fade = nodes.new(type="ShaderNodeMixRGB")
+			node_fade.name = fade_name
+			node_fade.blend_type = "MIX"
+			node_fade.location = node_source.location + Vector((150.0, -100.0 - 200.0 * offset))
+			MATTEPAINTER_FN_rerouteSocket(links, node_source.outputs[output], node_fade.outputs['Color'])
+			links.new(node_source.outputs[output], node_fade.inputs['Color1'])
+			links.new(node_blur.outputs[output], node_fade.inputs['Color2'])
+			links.new(node_amount.outputs['Value'], node_fade.inputs['Fac'])
+
+def MATTEPAINTER_FN_setShaderVariant(material, lite):
+	# Lite: the image feeds the BSDF directly and UVs skip the noise blur, so curves, HSV, noise and bump are not compiled.
+	# Full: the original graph from MATTEPAINTER_FN_setShaders. The nodes themselves stay so the panels keep working.
+	nodes = material.node_tree.nodes
+	links = material.node_tree.links
+	if MATTEPAINTER_FN_isShaderLite(nodes) == lite:
+		return
+	node_albedo = nodes.get('albedo')
+	node_mask = nodes.get('transparency_mask')
+	node_HSV = nodes.get('HSV')
+	node_curves = nodes.get('curves')
+	node_color = nodes.get('Principled BSDF')
+	node_bump = [node for node in nodes if node.type == 'BUMP']
+
+	# Wherever the graded color currently goes (Base Color or Emission, ColorRamps, Bump)
+	albedo_color = MATTEPAINTER_FN_getAlbedoColor(nodes)
+	old_color = node_HSV.outputs['Color'] if lite else albedo_color
+	targets = [link.to_socket for link in old_color.links if link.to_node != node_curves]
+	new_color = albedo_color if lite else node_HSV.outputs['Color']
+	for link in [link for link in old_color.links if link.to_node != node_curves]:
+		links.remove(link)
+	for socket in targets:
+		if lite and socket.node in node_bump:
+			continue
+		links.new(new_color, socket)
+
+	# UVs, straight from the Texture Coordinate node or through the blur mix
+	uv = nodes.get('blur_mix').outputs['Color']
+	if lite:
+		uv = [node for node in nodes if node.type == 'TEX_COORD'][0].outputs['UV']
+	for node in [node_albedo, node_mask, nodes.get('albedo_blur'), nodes.get('mask_blur')]:
+		if node is not None:
+			links.new(uv, node.inputs['Vector'])
+
+	# Bump, Strength 0 is the same as no normal at all
+	for node in node_bump:
+		if lite:
+			for link in node.outputs['Normal'].links:
+				links.remove(link)
+		else:
+			links.new(node_HSV.outputs['Color'], node.inputs['Height'])
+			links.new(node.outputs['Normal'], node_color.inputs['Normal'])
+
+def MATTEPAINTER_FN_getCurveState(mapping):
+	# Everything the curves' output depends on, as a hashable key
+	curves = tuple(tuple((tuple(point.location), point.handle_type) for point in curve.points) for curve in mapping.curves)
+	return (tuple(mapping.black_level), tuple(mapping.white_level), mapping.extend, curves)
+
+def MATTEPAINTER_FN_getCurveLUTs(node_curves, size=1024):
+	# Samples an RGB Curves node into per-channel 1D LUTs over [0, 1], combined (C) curve first then the channel curve.
+	# Also returns the slopes just past both ends, float values outside [0, 1] follow them like the node's extrapolated ends.
+	# Sampling costs thousands of evaluate() calls, so the result is cached per curve state.
+	mapping = node_curves.mapping
+	state = MATTEPAINTER_FN_getCurveState(mapping)
+	cached = curve_lut_cache.get(state)
+	if cached is not None:
+		return cached
+	mapping.initialize()
+	# One extra sample past each end gives the slopes
+	step = 1.0 / (size - 1)
+	positions = np.linspace(-step, 1.0 + step, size + 2)
+	samples = np.empty((3, size + 2), dtype=np.float32)
+	for channel in range(3):
+		black = mapping.black_level[channel]
+		white = mapping.white_level[channel]
+		scale = 1.0 / (white - black) if white != black else 1.0
+		for i, position in enumerate(positions):
+			combined = mapping.evaluate(mapping.curves[3], (position - black) * scale)
+			samples[channel, i] = mapping.evaluate(mapping.curves[channel], combined)
+	luts = np.ascontiguousarray(samples[:, 1:-1])
+	slopes = np.stack(((samples[:, 1] - samples[:, 0]) / step, (samples[:, -1] - samples[:, -2]) / step), axis=1)
+	if len(curve_lut_cache) >= 32:
+		curve_lut_cache.clear()
+	curve_lut_cache[state] = (luts, slopes)
+	return luts, slopes
+
+def MATTEPAINTER_FN_getGrade(nodes):
+	# Opacity, Curves & HSV of a Layer as plain lists, small enough to keep many presets in a Scene string
+	node_curves = nodes.get('curves')
+	node_HSV = nodes.get('HSV')
+	mapping = node_curves.mapping
+	curves = []
+	for curve in mapping.curves:
+		points = []
+		for point in curve.points:
+			location = [round(point.location[0], 4), round(point.location[1], 4)]
+			points.append(location if point.handle_type == 'AUTO' else location + [point.handle_type])
+		curves.append(points)
+	return {
+		'opacity': round(nodes.get('opacity').inputs['Fac'].default_value, 4),
+		'curves': [node_curves.mute, round(node_curves.inputs['Fac'].default_value, 4), [round(v, 4) for v in mapping.black_level], [round(v, 4) for v in mapping.white_level], curves],
+		'hsv': [node_HSV.mute] + [round(node_HSV.inputs[name].default_value, 4) for name in ['Hue', 'Saturation', 'Value', 'Fac']],
+	}
+
+def MATTEPAINTER_FN_setCurvePoints(curve, points):
+	# Curves always keep at least two points, so grow or shrink to the target count before moving them
+	while len(curve.points) > max(len(points), 2):
+		curve.points.remove(curve.points[len(curve.points) - 1])
+	while len(curve.points) < len(points):
+		curve.points.new(1.0, 1.0)
+	for point, values in zip(curve.points, points):
+		point.location = (values[0], values[1])
+		point.handle_type = values[2] if len(values) > 2 else 'AUTO'
+
+def MATTEPAINTER_FN_setGrade(nodes, grade):
+	node_curves = nodes.get('curves')
+	node_HSV = nodes.get('HSV')
+	mapping = node_curves.mapping
+	nodes.get('opacity').inputs['Fac'].default_value = grade['opacity']
+	curves_mute, curves_fac, black_level, white_level, curves = grade['curves']
+	node_curves.mute = curves_mute
+	node_curves.inputs['Fac'].default_value = curves_fac
+	mapping.black_level = black_level
+	mapping.white_level = white_level
+	for curve, points in zip(mapping.curves, curves):
+		MATTEPAINTER_FN_setCurvePoints(curve, points)
+	mapping.update()
+	node_HSV.mute = grade['hsv'][0]
+	for name, value in zip(['Hue', 'Saturation', 'Value', 'Fac'], grade['hsv'][1:]):
+		node_HSV.inputs[name].default_value = value
+
+def MATTEPAINTER_FN_getSelectedLayerMaterials(context):
+	# Linked duplicates share a material, each material is only listed once so relative edits are not applied twice
+	materials = []
+	for obj in context.selected_objects:
+		if obj.type == 'MESH' and obj.MATTEPAINTER_VAR_isLayer and obj.data.materials and obj.data.materials[0] not in materials:
+			materials.append(obj.data.materials[0])
+	return materials
+
+def MATTEPAINTER_FN_getGradePresets(scene):
+	try:
+		return json.loads(scene.MATTEPAINTER_VAR_gradePresets)
+	except ValueError:
+		return {}
+
+def MATTEPAINTER_FN_setGradePresets(scene, presets):
+	scene.MATTEPAINTER_VAR_gradePresets = json.dumps(presets, separators=(',', ':'), sort_keys=True)
+
+def MATTEPAINTER_FN_gradePresetItems(self, context):
+	# Blender does not keep the strings of dynamic enum items alive, so the list lives at module level
+	grade_preset_items.clear()
+	grade_preset_items.extend((name, name, '') for name in sorted(MATTEPAINTER_FN_getGradePresets(context.scene)))
+	return grade_preset_items
+
+def MATTEPAINTER_FN_applyLayerGrade(nodes, pixels):
+	# Curves & HSV of a Layer applied to scene linear pixels, unchanged when the grade is neutral
+	node_curves = nodes.get('curves')
+	node_HSV = nodes.get('HSV')
+	if MATTEPAINTER_FN_isGradeNeutral(nodes):
+		return pixels
+	curve_luts, curve_slopes = (None, None) if node_curves.mute else MATTEPAINTER_FN_getCurveLUTs(node_curves)
+	hsv = None if node_HSV.mute else tuple(node_HSV.inputs[name].default_value for name in ['Hue', 'Saturation', 'Value', 'Fac'])
+	return mattepainter_pixels.bake_grade(pixels, curve_luts, node_curves.inputs['Fac'].default_value, hsv, curve_slopes)
+
+def MATTEPAINTER_FN_getLayerColor(nodes):
+	# Straight RGBA of a Layer as the shader shows it: scene linear, blur fade & grade applied, alpha = visible alpha x opacity
+	pixels = MATTEPAINTER_FN_getFadedPixels(nodes, 'albedo', 'albedo_blur')
+	alpha = MATTEPAINTER_FN_getLayerAlpha(nodes, pixels)
+
+	pixels = MATTEPAINTER_FN_applyLayerGrade(nodes, pixels)
+
+	if alpha.shape == pixels.shape[:2]:
+		pixels[:, :, 3] = alpha
+	pixels[:, :, 3] *= nodes.get('opacity').inputs['Fac'].default_value
+	return pixels
+
+def MATTEPAINTER_FN_getCameraMatrix(scene, camera, width, height):
+	# World -> clip matrix of a camera for a width x height frame, as a NumPy array
+	depsgraph = bpy.context.evaluated_depsgraph_get()
+	projection = camera.calc_matrix_camera(depsgraph, x=width, y=height, scale_x=scene.render.pixel_aspect_x, scale_y=scene.render.pixel_aspect_y)
+	return np.array(projection @ camera.matrix_world.inverted())
+
+def MATTEPAINTER_FN_getLayerUVToScreen(obj, camera, camera_matrix, width, height):
+	# Homography from the Layer's UV square to frame pixels, and the Layer's view space depth (works for orthographic too)
+	coords, vertex_uvs, affine = MATTEPAINTER_FN_getMeshUVs(obj.data)
+	matrix_world = np.array(obj.matrix_world)
+	corners = mattepainter_pixels.uv_to_position(affine, mattepainter_pixels.UNIT_SQUARE) @ matrix_world[:3, :3].T + matrix_world[:3, 3]
+	screen, w = mattepainter_pixels.project_points(camera_matrix, corners, width, height)
+	view_matrix = np.array(camera.matrix_world.inverted())
+	depth = -float(np.mean(corners @ view_matrix[2, :3] + view_matrix[2, 3]))
+	if np.any(w <= 0.0):
+		return None, depth
+	return mattepainter_pixels.compute_homography(mattepainter_pixels.UNIT_SQUARE, screen), depth
+
+def MATTEPAINTER_FN_getVisibleLayers():
+	# Rendered Layers with a still image, the ones a flatten can composite
+	layers = []
+	for obj in bpy.data.objects:
+		if not obj.MATTEPAINTER_VAR_isLayer or obj.type != 'MESH' or obj.hide_render or not obj.visible_get() or len(obj.data.materials) == 0:
+			continue
+		material = obj.data.materials[0]
+		if material is None or not material.use_nodes or material.node_tree.nodes.get('albedo') is None:
+			continue
+		image = material.node_tree.nodes.get('albedo').image
+		if image is None or image.source not in ['FILE', 'GENERATED']:
+			continue
+		layers.append(obj)
+	return layers
+
+def MATTEPAINTER_FN_getLayerMaterials():
+	# Layer materials that still have the MattePainter shader tree
+	materials = {obj.data.materials[0] for obj in bpy.data.objects if obj.MATTEPAINTER_VAR_isLayer and obj.type == 'MESH' and len(obj.data.materials) > 0}
+	return [material for material in materials if material is not None and material.use_nodes and material.node_tree.nodes.get('albedo') is not None and material.node_tree.nodes.get('HSV') is not None]
+
+def MATTEPAINTER_FN_getLayerMaterialNames():
+	# Cached names of MATTEPAINTER_FN_getLayerMaterials for the update handler, rebuilt after Objects change
+	if layer_update_state['layer_materials'] is None:
+		layer_update_state['layer_materials'] = {material.name for material in MATTEPAINTER_FN_getLayerMaterials()}
+	return layer_update_state['layer_materials']
+
+def MATTEPAINTER_FN_setProjectionMaterial(obj, source_image, width, height):
+	# Replaces the Object's materials with a Layer material around an empty image & a white mask, ready to receive a projection
+	obj.data.materials.clear()
+	name = f'{source_image.name}_projection'
+	material = bpy.data.materials.new(name=name)
+	material.use_nodes = True
+	if bpy.app.version > (3, 0, 0) and bpy.app.version < (4, 3, 0):
+		material.blend_method = "HASHED"
+		material.shadow_method = "CLIP"
+	obj.data.materials.append(material)
+
+	mask = MATTEPAINTER_FN_addMask(name="mask_" + name, width=width, height=height)
+	# Same buffer type & color space as the source, so projected pixels are copied without any conversion
+	projection_image = bpy.data.images.new(name=name, width=width, height=height, float_buffer=source_image.is_float)
+	projection_image.colorspace_settings.name = source_image.colorspace_settings.name
+	mattepainter_pixels.write_image_pixels(projection_image, np.zeros((height, width, 4), dtype=np.float32))
+	MATTEPAINTER_FN_setShaders(material.node_tree.nodes, material.node_tree.links, projection_image, mask=mask)
+	return material, projection_image, mask
+
+def MATTEPAINTER_FN_unwrapObject(obj):
+	# Smart UV Project over the whole mesh, scaled to fill the UV square. Works in background mode.
+	if obj.mode != 'EDIT':
+		bpy.ops.object.mode_set(mode='EDIT')
+	bpy.ops.mesh.select_all(action='SELECT')
+	bpy.ops.uv.smart_project(scale_to_bounds=True)
+	bpy.ops.object.mode_set(mode='OBJECT')
+
+def MATTEPAINTER_FN_getProjectionBytesPerTexel(image):
+	# Projection color (float or byte), byte mask and float visibility
+	return (16 if image.is_float else 4) + 4 + 16
+
+def MATTEPAINTER_FN_getProjectionSize(obj, cameras, project_resolution, auto_resolution, memory_budget):
+	# Texture size for projecting the cameras' Background Images onto an unwrapped Object, keeping the images' aspect.
+	# Auto: one texel per background image pixel over the Object's on screen area (the densest camera wins), capped by
+	# memory_budget in MB. Otherwise the largest background image scaled by project_resolution.
+	# Returns (width, height, capped).
+	scene = bpy.context.scene
+	images = [camera.data.background_images[0].image for camera in cameras]
+	image_width = max(image.size[0] for image in images)
+	image_height = max(image.size[1] for image in images)
+	if not auto_resolution:
+		return max(int(image_width * project_resolution), 1), max(int(image_height * project_resolution), 1), False
+	texels = 0.0
+	for camera, image in zip(cameras, images):
+		source_width, source_height = image.size
+		camera_matrix = MATTEPAINTER_FN_getCameraMatrix(scene, camera, source_width, source_height)
+		triangle_uvs, triangle_homogeneous = MATTEPAINTER_FN_getProjectionTriangles(obj, camera, camera_matrix, source_width, source_height)[:2]
+		texels = max(texels, mattepainter_pixels.projection_texel_count(triangle_uvs, triangle_homogeneous, source_width, source_height))
+	return mattepainter_pixels.fit_texture_size(texels, image_width / image_height, MATTEPAINTER_FN_getProjectionBytesPerTexel(images[0]), memory_budget * 1024 * 1024)
+
+def MATTEPAINTER_FN_describeProjectionSize(image, capped):
+	megabytes = image.size[0] * image.size[1] * MATTEPAINTER_FN_getProjectionBytesPerTexel(image) / (1024 * 1024)
+	message = f"{image.name}: {image.size[0]}x{image.size[1]} ({megabytes:.1f} MB)"
+	if capped:
+		message += ", reduced to fit the memory budget"
+	return message + "."
+
+def MATTEPAINTER_FN_getProjectionTriangles(obj, camera, camera_matrix, width, height):
+	# Per loop triangle UVs (T, 3, 2), homogeneous source texel coordinates (T, 3, 3) and view depths (T, 3) of a
+	# Mesh Object seen by a camera, plus each triangle's facing ratio (T,), 0 for back faces
+	mesh = obj.data
+	mesh.calc_loop_triangles()
+	triangle_count = len(mesh.loop_triangles)
+	loops = np.empty(triangle_count * 3, dtype=np.int32)
+	vertices = np.empty(triangle_count * 3, dtype=np.int32)
+	mesh.loop_triangles.foreach_get('loops', loops)
+	mesh.loop_triangles.foreach_get('vertices', vertices)
+	coords = np.empty(len(mesh.vertices) * 3, dtype=np.float64)
+	mesh.vertices.foreach_get('co', coords)
+	uvs = np.empty(len(mesh.loops) * 2, dtype=np.float64)
+	mesh.uv_layers.active.data.foreach_get('uv', uvs)
+	matrix_world = np.array(obj.matrix_world)
+	world = coords.reshape(-1, 3) @ matrix_world[:3, :3].T + matrix_world[:3, 3]
+	homogeneous = mattepainter_pixels.project_homogeneous(camera_matrix, world, width, height)
+
+	# View space, the camera looks down -Z
+	view_matrix = np.array(camera.matrix_world.inverted())
+	view = (world @ view_matrix[:3, :3].T + view_matrix[:3, 3])[vertices].reshape(-1, 3, 3)
+	normals = np.cross(view[:, 1] - view[:, 0], view[:, 2] - view[:, 0])
+	normals /= np.maximum(np.linalg.norm(normals, axis=1), 1e-12)[:, np.newaxis]
+	if camera.data.type == 'ORTHO':
+		to_camera = np.array((0.0, 0.0, 1.0))
+	else:
+		to_camera = -view.mean(axis=1)
+		to_camera /= np.maximum(np.linalg.norm(to_camera, axis=1), 1e-12)[:, np.newaxis]
+	facing = np.clip((normals * to_camera).sum(axis=-1), 0.0, 1.0)
+	return uvs.reshape(-1, 2)[loops].reshape(-1, 3, 2), homogeneous[vertices].reshape(-1, 3, 3), -view[:, :, 2], facing
+
+def MATTEPAINTER_FN_getSceneDepthBuffer(target, camera, camera_matrix, target_homogeneous, target_depth, width, height):
+	# Z-buffer of the target and every other visible mesh from the camera, evaluated so modifiers occlude too.
+	# Layers are left out, they are mostly alpha cards and would hide everything behind their whole rectangle.
+	depsgraph = bpy.context.evaluated_depsgraph_get()
+	view_matrix = np.array(camera.matrix_world.inverted())
+	homogeneous = [target_homogeneous]
+	depth = [target_depth]
+	for obj in bpy.context.scene.objects:
+		if obj == target or obj.type != 'MESH' or obj.MATTEPAINTER_VAR_isLayer or not obj.visible_get():
+			continue
+		mesh = obj.evaluated_get(depsgraph).data
+		mesh.calc_loop_triangles()
+		vertices = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+		mesh.loop_triangles.foreach_get('vertices', vertices)
+		coords = np.empty(len(mesh.vertices) * 3, dtype=np.float64)
+		mesh.vertices.foreach_get('co', coords)
+		matrix_world = np.array(obj.matrix_world)
+		world = (coords.reshape(-1, 3) @ matrix_world[:3, :3].T + matrix_world[:3, 3])[vertices]
+		homogeneous.append(mattepainter_pixels.project_homogeneous(camera_matrix, world, width, height).reshape(-1, 3, 3))
+		depth.append(-(world @ view_matrix[2, :3] + view_matrix[2, 3]).reshape(-1, 3))
+	return mattepainter_pixels.rasterise_depth(np.concatenate(homogeneous), np.concatenate(depth), width, height)
+
+def MATTEPAINTER_FN_writeProjection(material, projection_image, mask, pixels, covered, visibility):
+	# Unseen texels are masked out, edges are padded so filtering does not pull in black along seams
+	height, width = covered.shape
+	nodes = material.node_tree.nodes
+	layers = np.concatenate((pixels, (visibility > 0.0)[:, :, np.newaxis], visibility[:, :, np.newaxis]), axis=2).astype(np.float32)
+	layers = mattepainter_pixels.extend_edges(layers, covered, 4)[0]
+	mask_pixels = np.ones((height, width, 4), dtype=np.float32)
+	mask_pixels[:, :, :3] = layers[:, :, 4:5]
+	mattepainter_pixels.write_image_pixels(projection_image, layers[:, :, :4])
+	mattepainter_pixels.write_image_pixels(mask, mask_pixels)
+
+	# Visibility weighted by how squarely the camera saw each texel, for blending projections from several cameras.
+	# Reprojections write into the existing visibility image.
+	node_visibility = nodes.get('visibility')
+	if node_visibility is None:
+		node_visibility = nodes.new(type="ShaderNodeTexImage")
+		node_visibility.name = 'visibility'
+		node_visibility.label = 'Visibility'
+		node_visibility.location = (nodes.get('transparency_mask').location.x, nodes.get('transparency_mask').location.y - 300)
+	if node_visibility.image is None or tuple(node_visibility.image.size) != (width, height):
+		node_visibility.image = bpy.data.images.new(name="visibility_" + projection_image.name, width=width, height=height, float_buffer=True, is_data=True)
+	visibility_pixels = np.ones((height, width, 4), dtype=np.float32)
+	visibility_pixels[:, :, :3] = layers[:, :, 5:6]
+	mattepainter_pixels.write_image_pixels(node_visibility.image, visibility_pixels)
+
+def MATTEPAINTER_FN_getProjectionMaterial(obj):
+	# The projection material of an Object projected onto before, None if it has none or it lost its images
+	if obj.type != 'MESH' or len(obj.data.materials) == 0 or obj.data.materials[0] is None or obj.data.uv_layers.active is None:
+		return None
+	material = obj.data.materials[0]
+	if not material.use_nodes:
+		return None
+	nodes = material.node_tree.nodes
+	for name in ['albedo', 'transparency_mask', 'visibility']:
+		if nodes.get(name) is None or nodes.get(name).image is None:
+			return None
+	return material
+
+def MATTEPAINTER_FN_saveProjection(material):
+	# Saves the images a projection writes (color, mask & visibility) and nothing else the user has edited.
+	# Images that were never given a file are left to the user, like any new Image.
+	nodes = material.node_tree.nodes
+	images = [nodes.get(name).image for name in ['albedo', 'transparency_mask', 'visibility'] if nodes.get(name) is not None]
+	return MATTEPAINTER_FN_saveImagesAsync([image for image in images if image is not None])
+
+def MATTEPAINTER_FN_cacheProjection(material, triangle_uvs, triangle_homogeneous, checksums):
+	# What Reproject compares against: the UVs & camera view the projection was made with and the source's tile checksums
+	projection_cache[material.name] = {'uvs': triangle_uvs, 'view': triangle_homogeneous, 'checksums': checksums}
+
+def MATTEPAINTER_FN_getSequenceFrames(image):
+	# Every file of an Image Sequence ordered by frame number: same name as the first file, any number in place of its digits
+	filepath = bpy.path.abspath(image.filepath)
+	directory, filename = os.path.split(filepath)
+	match = re.match(r'^(.*?)(\d+)(\.\w+)$', filename)
+	if match is None:
+		return [filepath]
+	prefix, digits, extension = match.groups()
+	pattern = re.compile(re.escape(prefix) + r'(\d+)' + re.escape(extension) + '$')
+	frames = []
+	for name in os.listdir(directory):
+		found = pattern.match(name)
+		if found is not None:
+			frames.append((int(found.group(1)), name))
+	return [os.path.join(directory, name) for number, name in sorted(frames)]
+
+def MATTEPAINTER_FN_extractMovieFrames(image, directory):
+	# Writes a movie's frames to PNGs through a temporary Video Sequencer scene, Python cannot read movie pixels directly.
+	# The Standard view transform keeps the PNGs' values identical to the movie's. Returns the frame filepaths.
+	scene = bpy.data.scenes.new(name="MattePainter_Frames")
+	try:
+		scene.sequence_editor_create()
+		strips = scene.sequence_editor.strips if hasattr(scene.sequence_editor, 'strips') else scene.sequence_editor.sequences
+		strip = strips.new_movie(name=image.name, filepath=bpy.path.abspath(image.filepath), channel=1, frame_start=1)
+		scene.frame_start = 1
+		scene.frame_end = strip.frame_final_duration
+		scene.render.resolution_x, scene.render.resolution_y = image.size
+		scene.render.resolution_percentage = 100
+		scene.render.use_sequencer = True
+		scene.render.use_compositing = False
+		scene.view_settings.view_transform = 'Standard'
+		scene.render.image_settings.file_format = 'PNG'
+		scene.render.image_settings.color_mode = 'RGBA'
+		scene.render.filepath = os.path.join(directory, f"{bpy.path.clean_name(image.name)}_source_")
+		bpy.ops.render.render(animation=True, scene=scene.name)
+		return [scene.render.frame_path(frame=frame) for frame in range(scene.frame_start, scene.frame_end + 1)]
+	finally:
+		bpy.data.scenes.remove(scene)
+
+def MATTEPAINTER_FN_readImageFile(filepath):
+	# RGBA pixels of an image file without keeping it in the Blend File
+	image = bpy.data.images.load(filepath)
+	try:
+		return mattepainter_pixels.to_rgba(mattepainter_pixels.read_image_pixels(image))
+	finally:
+		bpy.data.images.remove(image)
+
+def MATTEPAINTER_FN_bakeWindowProjection(context, obj, source_image, target_image, channel):
+	# Bakes source_image, mapped through the scene camera's window coordinates, into target_image over the Object's UVs.
+	# Cycles evaluates Window coordinates from the scene camera while baking, so no viewport or camera view is needed.
+	# channel 'COLOR' bakes the image, 'ALPHA' bakes its alpha (0 outside the camera frame) for use as a mask.
+	material = bpy.data.materials.new(name="MattePainter_Bake")
+	material.use_nodes = True
+	nodes = material.node_tree.nodes
+	links = material.node_tree.links
+	nodes.clear()
+	node_coord = nodes.new(type="ShaderNodeTexCoord")
+	node_source = nodes.new(type="ShaderNodeTexImage")
+	node_source.image = source_image
+	node_source.extension = 'CLIP'
+	node_emission = nodes.new(type="ShaderNodeEmission")
+	node_output = nodes.new(type="ShaderNodeOutputMaterial")
+	node_target = nodes.new(type="ShaderNodeTexImage")
+	node_target.image = target_image
+	links.new(node_coord.outputs['Window'], node_source.inputs['Vector'])
+	links.new(node_source.outputs['Alpha' if channel == 'ALPHA' else 'Color'], node_emission.inputs['Color'])
+	links.new(node_emission.outputs['Emission'], node_output.inputs['Surface'])
+	node_target.select = True
+	nodes.active = node_target
+
+	previous_materials = [slot.material for slot in obj.material_slots]
+	for slot in obj.material_slots:
+		slot.material = material
+	try:
+		with context.temp_override(active_object=obj, object=obj, selected_objects=[obj], selected_editable_objects=[obj]):
+			bpy.ops.object.bake(type='EMIT', target='IMAGE_TEXTURES', use_clear=True, margin=4)
+	finally:
+		for slot, previous in zip(obj.material_slots, previous_materials):
+			slot.material = previous
+		bpy.data.materials.remove(material)
+
+def MATTEPAINTER_FN_layerUpdateTimer():
+	# Debounced, switches neutral Layers back to the lite shader and re-analyses alpha of edited Layers
+	remaining = 0.5 - (time.time() - layer_update_state['last_update'])
+	if remaining > 0.0:
+		return remaining
+	layer_update_state['scheduled'] = False
+	dirty_images = set(layer_update_state['images'])
+	dirty_materials = set(layer_update_state['materials'])
+	layer_update_state['images'].clear()
+	layer_update_state['materials'].clear()
+	scene = bpy.context.scene
+	for material in MATTEPAINTER_FN_getLayerMaterials():
+		nodes = material.node_tree.nodes
+		if scene.MATTEPAINTER_VAR_autoLiteShaders and (material.name in dirty_materials or material.name not in blend_mode_cache):
+			MATTEPAINTER_FN_setShaderVariant(material, MATTEPAINTER_FN_isGradeNeutral(nodes))
+		if scene.MATTEPAINTER_VAR_autoBlendMode:
+			# Only Layers that were edited, untouched Layers keep their blend mode until Analyse Blend Modes is run
+			signature = MATTEPAINTER_FN_getBlendSignature(nodes)
+			images_edited = not dirty_images.isdisjoint(signature[:2])
+			if images_edited or (material.name in dirty_materials and blend_mode_cache.get(material.name) != signature):
+				MATTEPAINTER_FN_updateBlendMode(material)
+	return None
+
+def MATTEPAINTER_FN_getLayerColorSignature(nodes):
+	# Everything that changes MATTEPAINTER_FN_getLayerColor apart from pixel edits
+	node_curves = nodes.get('curves')
+	node_HSV = nodes.get('HSV')
+	blur_images = tuple(nodes.get(name).image.name if nodes.get(name) is not None and nodes.get(name).image else None for name in ['albedo_blur', 'mask_blur'])
+	mapping = node_curves.mapping
+	curves = tuple(tuple(tuple(point.location) for point in curve.points) for curve in mapping.curves)
+	return MATTEPAINTER_FN_getBlendSignature(nodes)[:6] + blur_images + (
+		node_curves.mute, node_curves.inputs['Fac'].default_value, curves, tuple(mapping.black_level), tuple(mapping.white_level),
+		node_HSV.mute, tuple(node_HSV.inputs[name].default_value for name in ['Hue', 'Saturation', 'Value', 'Fac']),
+	)
+
+def MATTEPAINTER_FN_updatePreview(scene):
+	# Incremental low resolution flatten. Per Layer, the color (read, graded, reduced to its on-screen size) and the
+	# warped contribution are cached separately, so moving a Layer only re-warps it and only pixel or grade edits re-read it.
+	camera = scene.camera
+	if camera is None:
+		return False
+	percentage = scene.render.resolution_percentage / 100.0
+	width = max(int(scene.render.resolution_x * percentage * scene.MATTEPAINTER_VAR_previewScale), 1)
+	height = max(int(scene.render.resolution_y * percentage * scene.MATTEPAINTER_VAR_previewScale), 1)
+	camera_matrix = MATTEPAINTER_FN_getCameraMatrix(scene, camera, width, height)
+	dirty_images = set(preview_state['images'])
+	preview_state['images'].clear()
+
+	stack = []
+	changed = False
+	for obj in MATTEPAINTER_FN_getVisibleLayers():
+		uv_to_screen, depth = MATTEPAINTER_FN_getLayerUVToScreen(obj, camera, camera_matrix, width, height)
+		bounds = None if uv_to_screen is None else mattepainter_pixels.screen_bounds(uv_to_screen, width, height)
+		if bounds is None:
+			continue
+		nodes = obj.data.materials[0].node_tree.nodes
+		cache = preview_cache.setdefault(obj.name, {'color_key': None, 'warp_key': None, 'version': 0})
+
+		# Texels needed are about the Layer's footprint on the preview, box reduce anything larger
+		albedo = nodes.get('albedo').image
+		footprint = max(bounds[2] - bounds[0], bounds[3] - bounds[1], 1)
+		factor = max(int(max(albedo.size) // footprint), 1)
+		color_key = (MATTEPAINTER_FN_getLayerColorSignature(nodes), factor)
+		signature = color_key[0]
+		if cache['color_key'] != color_key or not dirty_images.isdisjoint(name for name in signature[:2] + signature[6:8] if name):
+			color = mattepainter_pixels.premultiply(MATTEPAINTER_FN_getLayerColor(nodes))
+			cache['color'] = mattepainter_pixels.downsample_box(color, factor) if factor > 1 else color
+			cache['color_key'] = color_key
+			cache['version'] += 1
+
+		warp_key = (tuple(np.round(uv_to_screen, 6).ravel()), width, height, cache['version'])
+		if cache['warp_key'] != warp_key:
+			cache['warp'] = mattepainter_pixels.warp_layer(cache['color'], uv_to_screen, width, height)
+			cache['warp_key'] = warp_key
+			changed = True
+		if cache['warp'] is not None:
+			stack.append((depth, obj.name, cache['warp']))
+
+	stack.sort(key=lambda layer: layer[0], reverse=True)
+	order = [(name, depth) for depth, name, warp in stack]
+	for name in [name for name in preview_cache if name not in [name for name, depth in order]]:
+		del preview_cache[name]
+		changed = True
+	if not changed and preview_state['order'] == order and preview_state['size'] == (width, height):
+		return False
+	preview_state['order'] = order
+	preview_state['size'] = (width, height)
+
+	canvas = np.zeros((height, width, 4), dtype=np.float32)
+	for depth, name, warp in stack:
+		mattepainter_pixels.composite_over(canvas, *warp)
+	image = bpy.data.images.get(PREVIEW_IMAGE_NAME)
+	if image is not None and tuple(image.size) != (width, height):
+		bpy.data.images.remove(image)
+		image = None
+	if image is None:
+		image = bpy.data.images.new(name=PREVIEW_IMAGE_NAME, width=width, height=height, alpha=True, float_buffer=True)
+	mattepainter_pixels.write_image_pixels(image, canvas)
+	return True
+
+def MATTEPAINTER_FN_previewTimer():
+	# Short debounce, the preview should follow Layers while they are being moved
+	remaining = 0.1 - (time.time() - preview_state['last_update'])
+	if remaining > 0.0:
+		return remaining
+	preview_state['scheduled'] = False
+	scene = bpy.context.scene
+	if scene.MATTEPAINTER_VAR_livePreview:
+		MATTEPAINTER_FN_updatePreview(scene)
+	return None
+
+def MATTEPAINTER_FN_collectPreviewUpdates(depsgraph):
+	# Any object, mesh, material or image edit can change the composite, writing the preview itself must not
+	updated = False
+	for update in depsgraph.updates:
+		if isinstance(update.id, bpy.types.Image):
+			if update.id.name == PREVIEW_IMAGE_NAME:
+				continue
+			preview_state['images'].add(update.id.name)
+			updated = True
+		elif isinstance(update.id, (bpy.types.Object, bpy.types.Mesh, bpy.types.Material, bpy.types.Camera)):
+			updated = True
+	if updated:
+		preview_state['last_update'] = time.time()
+		if not preview_state['scheduled']:
+			preview_state['scheduled'] = True
+			bpy.app.timers.register(MATTEPAINTER_FN_previewTimer, first_interval=0.1)
+
+def MATTEPAINTER_FN_getScopeKey(scene, obj):
+	# Identifies what the scope shows: Layer, mode, grade and how often its image was edited
+	nodes = obj.data.materials[0].node_tree.nodes
+	albedo = nodes.get('albedo').image
+	return (obj.name, scene.MATTEPAINTER_VAR_scopeMode, MATTEPAINTER_FN_getLayerColorSignature(nodes), scope_state['versions'].get(albedo.name, 0))
+
+def MATTEPAINTER_FN_updateScope(scene, obj):
+	# Samples are a strided subsample of the linearised albedo, cached per image edit. Only the grade is re-applied
+	# when sliders move, on a few ten thousand pixels instead of the whole image.
+	nodes = obj.data.materials[0].node_tree.nodes
+	albedo = nodes.get('albedo').image
+	samples_key = (albedo.name, tuple(albedo.size), scope_state['versions'].get(albedo.name, 0))
+	if scope_cache.get('samples_key') != samples_key:
+		pixels = mattepainter_pixels.read_image_pixels(albedo)
+		samples = np.ascontiguousarray(mattepainter_pixels.subsample(pixels, 256)[0])
+		if not albedo.is_float and albedo.colorspace_settings.name == 'sRGB':
+			samples[:, :, :3] = mattepainter_pixels.srgb_to_linear(samples[:, :, :3])
+		scope_cache['samples'] = samples
+		scope_cache['samples_key'] = samples_key
+
+	graded = MATTEPAINTER_FN_applyLayerGrade(nodes, scope_cache['samples'].copy())
+	graded[:, :, :3] = mattepainter_pixels.linear_to_srgb(graded[:, :, :3])
+	if scene.MATTEPAINTER_VAR_scopeMode == 'WAVEFORM':
+		scope = mattepainter_pixels.draw_waveform(mattepainter_pixels.waveform(graded, 256, 128))
+	else:
+		scope = mattepainter_pixels.draw_histogram(mattepainter_pixels.histogram(graded, 256), 128)
+
+	collection = scope_previews.get('collection')
+	if collection is None:
+		return
+	preview = collection.get('scope') or collection.new('scope')
+	preview.image_size = (scope.shape[1], scope.shape[0])
+	preview.image_pixels_float = scope.ravel()
+
+def MATTEPAINTER_FN_scopeTimer():
+	# Debounced, dragging a slider only redraws the scope once it pauses
+	remaining = 0.15 - (time.time() - scope_state['last_request'])
+	if remaining > 0.0:
+		return remaining
+	scope_state['scheduled'] = False
+	scene = bpy.context.scene
+	obj = bpy.context.active_object
+	if obj is None or obj.type != 'MESH' or not obj.MATTEPAINTER_VAR_isLayer or MATTEPAINTER_FN_getLayerMaterials() == []:
+		return None
+	key = MATTEPAINTER_FN_getScopeKey(scene, obj)
+	if key != scope_state['key']:
+		MATTEPAINTER_FN_updateScope(scene, obj)
+		scope_state['key'] = key
+		for window in bpy.context.window_manager.windows:
+			for area in window.screen.areas:
+				if area.type == 'VIEW_3D':
+					area.tag_redraw()
+	return None
+
+def MATTEPAINTER_FN_requestScope():
+	scope_state['last_request'] = time.time()
+	if not scope_state['scheduled']:
+		scope_state['scheduled'] = True
+		bpy.app.timers.register(MATTEPAINTER_FN_scopeTimer, first_interval=0.15)
+
+@persistent
+def MATTEPAINTER_FN_layerUpdateHandler(scene, depsgraph):
+	# Collects edits, the heavier work runs later from a timer so strokes and slider drags are not slowed down.
+	# Leaving the lite shader is the exception, it happens right away so grading shows up while dragging.
+	for update in depsgraph.updates:
+		if isinstance(update.id, bpy.types.Image):
+			image_versions[update.id.name] = image_versions.get(update.id.name, 0) + 1
+		elif isinstance(update.id, (bpy.types.Object, bpy.types.Collection)):
+			# Layers or their material slots may have changed
+			layer_update_state['layer_materials'] = None
+	if scene.MATTEPAINTER_VAR_livePreview:
+		MATTEPAINTER_FN_collectPreviewUpdates(depsgraph)
+	if scene.MATTEPAINTER_VAR_showScopes:
+		for update in depsgraph.updates:
+			if isinstance(update.id, bpy.types.Image):
+				scope_state['versions'][update.id.name] = scope_state['versions'].get(update.id.name, 0) + 1
+	if not scene.MATTEPAINTER_VAR_autoBlendMode and not scene.MATTEPAINTER_VAR_autoLiteShaders:
+		return
+	updated = False
+	for update in depsgraph.updates:
+		if isinstance(update.id, bpy.types.Image):
+			layer_update_state['images'].add(update.id.name)
+			updated = True
+		elif isinstance(update.id, bpy.types.Material):
+			layer_update_state['materials'].add(update.id.name)
+			material = bpy.data.materials.get(update.id.name)
+			if scene.MATTEPAINTER_VAR_autoLiteShaders and material is not None and material.name in MATTEPAINTER_FN_getLayerMaterialNames():
+				nodes = material.node_tree.nodes
+				if MATTEPAINTER_FN_isShaderLite(nodes) and not MATTEPAINTER_FN_isGradeNeutral(nodes):
+					MATTEPAINTER_FN_setShaderVariant(material, False)
+			updated = True
+	if updated:
+		layer_update_state['last_update'] = time.time()
+		if not layer_update_state['scheduled']:
+			layer_update_state['scheduled'] = True
+			bpy.app.timers.register(MATTEPAINTER_FN_layerUpdateTimer, first_interval=0.5)
+
+def MATTEPAINTER_FN_getSaveFormat(image):
+	# Format the background encoder writes for an Image, None when only Image.save() gets it right:
+	# byte images to PNG & float images to EXR keep their values, anything else needs Blender's conversions
+	if image.file_format == 'PNG' and not image.is_float:
+		return 'PNG'
+	if image.file_format == 'OPEN_EXR' and image.is_float:
+		return 'OPEN_EXR'
+	return None
+
+def MATTEPAINTER_FN_getPixelDigest(pixels):
+	return hashlib.blake2b(pixels.data, digest_size=16).digest()
+
+def MATTEPAINTER_FN_writeSnapshot(filepath, pixels, file_format, previous):
+	# Runs on the save pool: waits for an earlier save of the same file so snapshots land in order, then writes
+	# unless the pixels match what the file last received. Returns True when the file was written.
+	if previous is not None:
+		wait([previous])
+	digest = MATTEPAINTER_FN_getPixelDigest(pixels)
+	if save_state['digests'].get(filepath) == digest:
+		return False
+	mattepainter_pixels.write_image_file(filepath, pixels, file_format)
+	save_state['digests'][filepath] = digest
+	return True
+
+def MATTEPAINTER_FN_saveImagesAsync(images):
+	# Snapshots every modified Image with foreach_get and encodes them on a thread pool, so painting carries on meanwhile.
+	# Written Images are reloaded afterwards when still identical to their file, so unchanged ones are no longer dirty
+	# and are skipped here before any copy.
+	# Packed Images are repacked and formats the encoder does not cover are saved by Blender right away.
+	# In background mode there is no event loop to poll from, so it waits for the pool instead.
+	# Returns (images queued, images saved right away).
+	if save_state['executor'] is None:
+		save_state['executor'] = ThreadPoolExecutor(max_workers=max(os.cpu_count() - 1, 1))
+	if len(save_state['jobs']) == 0:
+		save_state['start'] = time.time()
+	queued = 0
+	saved = 0
+	for image in images:
+		if not image.is_dirty or image.source not in ['FILE', 'GENERATED']:
+			continue
+		if image.packed_file is not None:
+			image.pack()
+			saved += 1
+			continue
+		if image.filepath_raw == '':
+			continue
+		file_format = MATTEPAINTER_FN_getSaveFormat(image)
+		if file_format is None:
+			image.save()
+			saved += 1
+			continue
+		filepath = bpy.path.abspath(image.filepath_raw)
+		pixels = mattepainter_pixels.read_image_pixels(image)
+		future = save_state['executor'].submit(MATTEPAINTER_FN_writeSnapshot, filepath, pixels, file_format, save_state['files'].get(filepath))
+		save_state['files'][filepath] = future
+		save_state['jobs'].append((image.name, future, filepath))
+		queued += 1
+
+	if queued > 0 and bpy.app.background:
+		wait([future for name, future, filepath in save_state['jobs']])
+		MATTEPAINTER_FN_finishSaves()
+	elif queued > 0 and not save_state['scheduled']:
+		save_state['scheduled'] = True
+		bpy.app.timers.register(MATTEPAINTER_FN_saveTimer, first_interval=0.25)
+	return queued, saved
+
+def MATTEPAINTER_FN_finishSaves():
+	# Sums up a finished batch of background saves for the File Management panel.
+	# Reloading an Image from its just written file clears is_dirty (the encoders are lossless), but only when the
+	# Image still hashes to what the file received: strokes made while saving would otherwise be thrown away.
+	written = 0
+	unchanged = 0
+	errors = []
+	for name, future, filepath in save_state['jobs']:
+		if future.exception() is not None:
+			errors.append(f"{name}: {future.exception()}")
+			continue
+		if future.result():
+			written += 1
+		else:
+			unchanged += 1
+		image = bpy.data.images.get(name)
+		if image is None or not image.is_dirty or bpy.path.abspath(image.filepath_raw) != filepath:
+			continue
+		if MATTEPAINTER_FN_getPixelDigest(mattepainter_pixels.read_image_pixels(image)) == save_state['digests'].get(filepath):
+			if image.source == 'GENERATED':
+				image.source = 'FILE'
+			image.reload()
+	save_state['jobs'].clear()
+	save_state['files'].clear()
+	message = f"Saved {written} images in {time.time() - save_state['start']:.2f}s"
+	if unchanged > 0:
+		message += f", {unchanged} unchanged"
+	if len(errors) > 0:
+		message += f", {len(errors)} failed: " + "; ".join(errors)
+	save_state['message'] = message
+	save_state['failed'] = len(errors) > 0
+
+def MATTEPAINTER_FN_saveTimer():
+	# Polls the background saves until the whole batch is written
+	if any(not future.done() for name, future, filepath in save_state['jobs']):
+		return 0.25
+	save_state['scheduled'] = False
+	MATTEPAINTER_FN_finishSaves()
+	for window in bpy.context.window_manager.windows:
+		for area in window.screen.areas:
+			if area.type == 'VIEW_3D':
+				area.tag_redraw()
+	return None
+
 def MATTEPAINTER_FN_contextOverride(area_to_check):
 	return [area for area in bpy.context.screen.areas if area.type == area_to_check][0]
 
@@ -595,7 +1608,8 @@ class MATTEPAINTER_OT_layerShowMask(bpy.types.Operator):
 
 		# send the mask straight to the material output:
 		if opacity.outputs['Color'].links[0].to_node.name == 'mix':
-			links.remove(mix.outputs['Shader'].links[0])
+			for link in material_output.inputs['Surface'].links:
+				links.remove(link)
 			links.remove(opacity.outputs['Color'].links[0])
 			link = links.new(opacity.outputs['Color'], material_output.inputs['Surface'])
 		else:
@@ -619,33 +1633,38 @@ class MATTEPAINTER_OT_layerUseEmit(bpy.types.Operator):
 		links = material.node_tree.links
 
 		bsdf = nodes.get("Principled BSDF")
-		hsv = nodes.get("HSV")
 
 		if bpy.app.version <= (3, 99, 99):
 			if bsdf.inputs[0].links:
+				color = bsdf.inputs[0].links[0].from_socket
 				links.remove(bsdf.inputs[0].links[0])
-				links.new(hsv.outputs[0], bsdf.inputs[19])
+				links.new(color, bsdf.inputs[19])
 			elif bsdf.inputs[19].links:
+				color = bsdf.inputs[19].links[0].from_socket
 				links.remove(bsdf.inputs[19].links[0])
-				links.new(hsv.outputs[0], bsdf.inputs[0])
+				links.new(color, bsdf.inputs[0])
 			else:
 				return{'CANCELLED'}
 		if bpy.app.version > (3, 99, 99) and bpy.app.version < (4, 3, 0):
 			if bsdf.inputs[0].links:
+				color = bsdf.inputs[0].links[0].from_socket
 				links.remove(bsdf.inputs[0].links[0])
-				links.new(hsv.outputs[0], bsdf.inputs[26])
+				links.new(color, bsdf.inputs[26])
 			elif bsdf.inputs[26].links:
+				color = bsdf.inputs[26].links[0].from_socket
 				links.remove(bsdf.inputs[26].links[0])
-				links.new(hsv.outputs[0], bsdf.inputs[0])
+				links.new(color, bsdf.inputs[0])
 			else:
 				return{'CANCELLED'}
 		if bpy.app.version >= (4, 3, 0):
 			if bsdf.inputs['Base Color'].links:
+				color = bsdf.inputs['Base Color'].links[0].from_socket
 				links.remove(bsdf.inputs['Base Color'].links[0])
-				links.new(hsv.outputs['Color'], bsdf.inputs['Emission Color'])
+				links.new(color, bsdf.inputs['Emission Color'])
 			elif bsdf.inputs['Emission Color'].links:
+				color = bsdf.inputs['Emission Color'].links[0].from_socket
 				links.remove(bsdf.inputs['Emission Color'].links[0])
-				links.new(hsv.outputs['Color'], bsdf.inputs['Base Color'])
+				links.new(color, bsdf.inputs['Base Color'])
 			else:
 				self.report({"WARNING"}, 'Principled BSDF Socket mismatch, cancelling.')
 				return{'CANCELLED'}		
@@ -699,6 +1718,349 @@ class MATTEPAINTER_OT_makeUnique(bpy.types.Operator):
 			self.report({"INFO"}, 'Made Shader Tree Unique.')
 		return {'FINISHED'}	
 
+#--------------------------------------------------------------
+# Mask Tools
+#--------------------------------------------------------------
+
+class MATTEPAINTER_OT_refineEdge(bpy.types.Operator):
+	# Snaps the painted mask's soft edges to edges in the Layer's image using a tiled guided filter.
+	bl_idname = "mattepainter.refine_edge"
+	bl_label = "Refine Edge"
+	bl_options = {"REGISTER", "UNDO"}
+	bl_description = "Refines the Active Layer's mask edges using the image as a guide"
+
+	radius: bpy.props.IntProperty(name='Radius', default=8, min=1, soft_max=64, description='Size of the edge region in pixels')
+	epsilon: bpy.props.FloatProperty(name='Smoothness', default=0.001, min=0.00001, soft_max=0.1, precision=5, description='Higher values follow the image edges less strictly')
+
+	@classmethod
+	def poll(cls, context):
+		return context.active_object is not None and context.active_object.MATTEPAINTER_VAR_isLayer
+
+	def execute(self, context):
+		active_object = bpy.context.active_object
+		nodes = active_object.data.materials[0].node_tree.nodes
+		node_mask = nodes.get('transparency_mask')
+		if node_mask is None:
+			self.report({"WARNING"}, "Layer has no mask to refine.")
+			return {'CANCELLED'}
+
+		albedo = nodes.get('albedo').image
+		mask = node_mask.image
+		if albedo.source not in ['FILE', 'GENERATED']:
+			self.report({"WARNING"}, "Refine Edge only supports still images.")
+			return {'CANCELLED'}
+		if tuple(albedo.size) != tuple(mask.size):
+			self.report({"WARNING"}, "Mask and image resolutions do not match.")
+			return {'CANCELLED'}
+
+		albedo_pixels = mattepainter_pixels.read_image_pixels(albedo)
+		mask_pixels = mattepainter_pixels.read_image_pixels(mask)
+		mattepainter_pixels.refine_mask(albedo_pixels, mask_pixels, radius=self.radius, epsilon=self.epsilon)
+		mattepainter_pixels.write_image_pixels(mask, mask_pixels)
+		self.report({"INFO"}, "Refined mask edges.")
+		return {'FINISHED'}
+
+class MATTEPAINTER_OT_keyMask(bpy.types.Operator):
+	# Generates the Layer's mask from the image with a chroma (greenscreen) or luma (sky) key.
+	# Preview keys a subsampled copy of the image so the redo panel stays interactive, untick it to commit at full resolution.
+	bl_idname = "mattepainter.key_mask"
+	bl_label = "Key Mask"
+	bl_options = {"REGISTER", "UNDO"}
+	bl_description = "Generates the Active Layer's mask from a chroma or luma key"
+
+	mode: bpy.props.EnumProperty(name='Mode', items=[('CHROMA', 'Chroma', 'Key out pixels close to the key colour'), ('LUMA', 'Luma', 'Key out pixels inside the luma range')], default='CHROMA')
+	key_color: bpy.props.FloatVectorProperty(name='Key Color', subtype='COLOR', size=3, min=0.0, max=1.0, default=(0.0, 1.0, 0.0))
+	tolerance: bpy.props.FloatProperty(name='Tolerance', default=0.1, min=0.0, soft_max=0.5, description='Chroma distance that is fully keyed')
+	softness: bpy.props.FloatProperty(name='Softness', default=0.1, min=0.0, soft_max=0.5, description='Width of the soft edge beyond the tolerance')
+	luma_min: bpy.props.FloatProperty(name='Luma Min', default=0.0, soft_min=0.0, soft_max=1.0)
+	luma_max: bpy.props.FloatProperty(name='Luma Max', default=1.0, soft_min=0.0, soft_max=1.0)
+	luma_softness: bpy.props.FloatProperty(name='Luma Softness', default=0.05, min=0.0, soft_max=0.5)
+	use_despill: bpy.props.BoolProperty(name='Despill', default=False, description='Writes a despilled copy of the image and uses it for the Layer')
+	preview: bpy.props.BoolProperty(name='Preview', default=True, description='Key a low resolution copy for fast tweaking')
+	preview_size: bpy.props.IntProperty(name='Preview Size', default=512, min=64, soft_max=2048)
+
+	@classmethod
+	def poll(cls, context):
+		return context.active_object is not None and context.active_object.MATTEPAINTER_VAR_isLayer
+
+	def _linearise(self, albedo, pixels):
+		# The Key Color is scene linear, byte sRGB plates are compared after the same conversion the shader applies
+		if not albedo.is_float and albedo.colorspace_settings.name == 'sRGB':
+			pixels[:, :, :3] = mattepainter_pixels.srgb_to_linear(pixels[:, :, :3])
+		return pixels
+
+	def _get_preview_pixels(self, albedo):
+		# Reading an 8K plate dominates the preview, so only the subsampled copy is cached between redos.
+		# invoke starts every run with a fresh read, edits made since then change the key through the handler's counter.
+		cache_key = (albedo.name, tuple(albedo.size), image_versions.get(albedo.name, 0), self.preview_size)
+		if key_mask_cache.get('key') != cache_key:
+			key_mask_cache.clear()
+			preview, step = mattepainter_pixels.subsample(mattepainter_pixels.read_image_pixels(albedo), self.preview_size)
+			key_mask_cache['key'] = cache_key
+			key_mask_cache['preview'] = (self._linearise(albedo, np.ascontiguousarray(preview)), step)
+		return key_mask_cache['preview']
+
+	def invoke(self, context, event):
+		key_mask_cache.clear()
+		return self.execute(context)
+
+	def execute(self, context):
+		active_object = bpy.context.active_object
+		nodes = active_object.data.materials[0].node_tree.nodes
+		node_mask = nodes.get('transparency_mask')
+		node_albedo = nodes.get('albedo')
+		if node_mask is None:
+			self.report({"WARNING"}, "Layer has no mask to key into.")
+			return {'CANCELLED'}
+		albedo = node_albedo.image
+		mask = node_mask.image
+		if albedo.source not in ['FILE', 'GENERATED']:
+			self.report({"WARNING"}, "Keying only supports still images.")
+			return {'CANCELLED'}
+		if tuple(albedo.size) != tuple(mask.size):
+			self.report({"WARNING"}, "Mask and image resolutions do not match.")
+			return {'CANCELLED'}
+
+		if self.preview:
+			source, step = self._get_preview_pixels(albedo)
+		else:
+			# Committing reads the full plate once and drops the preview cache, nothing full size outlives the operator
+			key_mask_cache.clear()
+			pixels = mattepainter_pixels.read_image_pixels(albedo)
+			source = self._linearise(albedo, pixels.copy())
+
+		if self.mode == 'CHROMA':
+			alpha = mattepainter_pixels.chroma_key(source, self.key_color, self.tolerance, self.softness, self.luma_min, self.luma_max, self.luma_softness)
+		else:
+			alpha = mattepainter_pixels.luma_key(source, self.luma_min, self.luma_max, self.luma_softness)
+		if self.preview:
+			alpha = mattepainter_pixels.upsample_nearest(alpha, step, mask.size[1], mask.size[0])
+
+		mask_pixels = np.ones((mask.size[1], mask.size[0], 4), dtype=np.float32)
+		mask_pixels[:, :, :3] = alpha[:, :, np.newaxis]
+		mattepainter_pixels.write_image_pixels(mask, mask_pixels)
+
+		# Despill into a copy so the original plate on disk is never overwritten by Save All
+		if self.use_despill and self.mode == 'CHROMA' and not self.preview:
+			despilled_name = albedo.name if albedo.name.startswith('despill_') else 'despill_' + albedo.name
+			despilled = bpy.data.images.get(despilled_name)
+			if despilled is None or tuple(despilled.size) != tuple(albedo.size):
+				despilled = bpy.data.images.new(name=despilled_name, width=albedo.size[0], height=albedo.size[1], alpha=True)
+			mattepainter_pixels.write_image_pixels(despilled, mattepainter_pixels.despill(pixels, self.key_color))
+			node_albedo.image = despilled
+
+		self.report({"INFO"}, "Keyed preview, untick Preview to commit." if self.preview else "Keyed mask.")
+		return {'FINISHED'}
+
+class MATTEPAINTER_OT_splitIslands(bpy.types.Operator):
+	# Splits every island of the Layer's mask into its own Layer, cropped to the island (image, mask and plane).
+	bl_idname = "mattepainter.split_islands"
+	bl_label = "Split Islands"
+	bl_options = {"REGISTER", "UNDO"}
+	bl_description = "Creates a cropped Layer for each separate island in the Active Layer's mask"
+
+	threshold: bpy.props.FloatProperty(name='Threshold', default=0.01, min=0.0, max=1.0, description='Mask values above this belong to an island')
+	min_pixels: bpy.props.IntProperty(name='Min Pixels', default=64, min=1, description='Ignore islands smaller than this')
+	margin: bpy.props.IntProperty(name='Margin', default=2, min=0, soft_max=64, description='Extra pixels kept around each island')
+	hide_original: bpy.props.BoolProperty(name='Hide Original', default=True)
+
+	@classmethod
+	def poll(cls, context):
+		return context.active_object is not None and context.active_object.MATTEPAINTER_VAR_isLayer
+
+	def execute(self, context):
+		active_object = bpy.context.active_object
+		material = active_object.data.materials[0]
+		nodes = material.node_tree.nodes
+		albedo = nodes.get('albedo').image
+		node_mask = nodes.get('transparency_mask')
+		if albedo.source not in ['FILE', 'GENERATED']:
+			self.report({"WARNING"}, "Split Islands only supports still images.")
+			return {'CANCELLED'}
+		if node_mask is not None and tuple(albedo.size) != tuple(node_mask.image.size):
+			self.report({"WARNING"}, "Mask and image resolutions do not match.")
+			return {'CANCELLED'}
+
+		# Label islands
+		alpha = MATTEPAINTER_FN_getLayerAlpha(nodes)
+		labels, count = mattepainter_pixels.label_components(alpha > self.threshold)
+		bounds, sizes = mattepainter_pixels.component_bounds(labels, count)
+		islands = [i for i in range(count) if sizes[i] >= self.min_pixels]
+		if len(islands) == 0:
+			self.report({"WARNING"}, "No islands found in the mask.")
+			return {'CANCELLED'}
+
+		width, height = albedo.size
+		albedo_pixels = mattepainter_pixels.read_image_pixels(albedo)
+		mask_pixels = mattepainter_pixels.read_image_pixels(node_mask.image) if node_mask is not None else None
+		hidden_value = 0.0 if nodes.get('invert').mute else 1.0
+
+		for number, i in enumerate(islands):
+			x_min, y_min, x_max, y_max = mattepainter_pixels.pad_bounds(bounds[i], self.margin, width, height)
+			outside = labels[y_min:y_max, x_min:x_max] != i + 1
+			name = f'{active_object.name}_island_{number}'
+
+			# Cropped image & mask, other islands inside the box are masked out
+			new_albedo_pixels = albedo_pixels[y_min:y_max, x_min:x_max].copy()
+			if mask_pixels is None:
+				new_albedo_pixels[outside, 3] = 0.0
+			new_albedo = MATTEPAINTER_FN_newImageFromPixels(name, new_albedo_pixels, albedo)
+			new_material = material.copy()
+			new_material.name = name
+			new_nodes = new_material.node_tree.nodes
+			new_nodes.get('albedo').image = new_albedo
+			if mask_pixels is not None:
+				new_mask_pixels = mask_pixels[y_min:y_max, x_min:x_max].copy()
+				new_mask_pixels[outside, :3] = hidden_value
+				new_nodes.get('transparency_mask').image = MATTEPAINTER_FN_newImageFromPixels("mask_" + name, new_mask_pixels, node_mask.image)
+			for node_name in ['albedo_blur', 'mask_blur']:
+				node = new_nodes.get(node_name)
+				if node is not None and node.image is not None:
+					blur_pixels = mattepainter_pixels.read_image_pixels(node.image)[y_min:y_max, x_min:x_max]
+					node.image = MATTEPAINTER_FN_newImageFromPixels(f'{name}_{node_name}', blur_pixels, node.image)
+
+			# Cropped plane
+			new_mesh = active_object.data.copy()
+			new_mesh.materials[0] = new_material
+			MATTEPAINTER_FN_cropLayerGeometry(new_mesh, mattepainter_pixels.pixel_bounds_to_uv((x_min, y_min, x_max, y_max), width, height))
+			new_object = bpy.data.objects.new(name, new_mesh)
+			new_object.matrix_world = active_object.matrix_world.copy()
+			for collection in active_object.users_collection:
+				collection.objects.link(new_object)
+			MATTEPAINTER_FN_setObjectAsLayer(new_object)
+
+		if self.hide_original:
+			active_object.hide_viewport = True
+			active_object.hide_render = True
+		self.report({"INFO"}, f"Split into {len(islands)} Layers.")
+		return {'FINISHED'}
+
+class MATTEPAINTER_OT_autoCrop(bpy.types.Operator):
+	# Crops the Layer's image, mask and plane to the visible area, the result on screen is unchanged.
+	bl_idname = "mattepainter.auto_crop"
+	bl_label = "Auto Crop"
+	bl_options = {"REGISTER", "UNDO"}
+	bl_description = "Crops the Active Layer's image, mask and plane to the visible (mask x alpha) area to save memory and overdraw"
+
+	threshold: bpy.props.FloatProperty(name='Threshold', default=0.0, min=0.0, max=1.0, description='Alpha values above this are kept')
+	margin: bpy.props.IntProperty(name='Margin', default=2, min=0, soft_max=64, description='Extra pixels kept around the visible area for filtering')
+
+	@classmethod
+	def poll(cls, context):
+		return context.active_object is not None and context.active_object.MATTEPAINTER_VAR_isLayer
+
+	def execute(self, context):
+		active_object = bpy.context.active_object
+		material = active_object.data.materials[0]
+		nodes = material.node_tree.nodes
+		albedo = nodes.get('albedo').image
+		node_mask = nodes.get('transparency_mask')
+		if albedo.source not in ['FILE', 'GENERATED']:
+			self.report({"WARNING"}, "Auto Crop only supports still images.")
+			return {'CANCELLED'}
+		if material.users > 1:
+			self.report({"WARNING"}, "Layer shares its Shader Tree, use Make Unique first.")
+			return {'CANCELLED'}
+		if node_mask is not None and tuple(albedo.size) != tuple(node_mask.image.size):
+			self.report({"WARNING"}, "Mask and image resolutions do not match.")
+			return {'CANCELLED'}
+
+		width, height = albedo.size
+		bounds = mattepainter_pixels.nonzero_bounds(MATTEPAINTER_FN_getLayerAlpha(nodes), self.threshold)
+		if bounds is None:
+			self.report({"WARNING"}, "Layer is fully transparent.")
+			return {'CANCELLED'}
+		x_min, y_min, x_max, y_max = mattepainter_pixels.pad_bounds(bounds, self.margin, width, height)
+		if (x_max - x_min, y_max - y_min) == (width, height):
+			self.report({"INFO"}, "Layer is already cropped.")
+			return {'FINISHED'}
+
+		# Images, including precomputed blur copies which share the plane's UVs.
+		# Crops of file-backed Images are written next to the original, the original file is never overwritten.
+		unsaved = []
+		for node_name in ['albedo', 'albedo_blur', 'transparency_mask', 'mask_blur']:
+			node = nodes.get(node_name)
+			if node is None or node.image is None:
+				continue
+			image = node.image
+			pixels = mattepainter_pixels.read_image_pixels(image)[y_min:y_max, x_min:x_max]
+			node.image = MATTEPAINTER_FN_newImageFromPixels(image.name if node_name == 'transparency_mask' else image.name + "_crop", pixels, image)
+			if not MATTEPAINTER_FN_saveImageBeside(node.image, image, "_crop") and image.source == 'FILE':
+				unsaved.append(node.image.name)
+			if node_name != 'albedo' and image.users == 0:
+				bpy.data.images.remove(image)
+
+		# Plane, duplicated Layers can share the mesh
+		if active_object.data.users > 1:
+			active_object.data = active_object.data.copy()
+		MATTEPAINTER_FN_cropLayerGeometry(active_object.data, mattepainter_pixels.pixel_bounds_to_uv((x_min, y_min, x_max, y_max), width, height))
+
+		saved = 100.0 * (1.0 - ((x_max - x_min) * (y_max - y_min)) / (width * height))
+		if len(unsaved) > 0:
+			self.report({"WARNING"}, f"Cropped to {x_max - x_min}x{y_max - y_min}, these images are not on disk yet, save them with Image > Save As: {', '.join(unsaved)}.")
+			return {'FINISHED'}
+		self.report({"INFO"}, f"Cropped to {x_max - x_min}x{y_max - y_min} ({saved:.0f}% smaller).")
+		return {'FINISHED'}
+
+class MATTEPAINTER_OT_generateCutoutMesh(bpy.types.Operator):
+	# Replaces the Layer's plane with a mesh fitted to the visible area, so transparent pixels are not rendered.
+	bl_idname = "mattepainter.generate_cutout_mesh"
+	bl_label = "Generate Cutout Mesh"
+	bl_options = {"REGISTER", "UNDO"}
+	bl_description = "Replaces the Active Layer's plane with a mesh traced from its mask, reducing transparent overdraw"
+
+	threshold: bpy.props.FloatProperty(name='Threshold', default=0.0, min=0.0, max=1.0, description='Alpha values above this are kept inside the mesh')
+	margin: bpy.props.IntProperty(name='Margin', default=2, min=0, soft_max=64, description='Pixels kept between the visible area and the mesh border')
+	tolerance: bpy.props.FloatProperty(name='Tolerance', default=2.0, min=0.0, soft_max=32.0, description='How far (in pixels) the simplified outline may stray, higher values give fewer triangles')
+	resolution: bpy.props.IntProperty(name='Resolution', default=256, min=16, soft_max=1024, description='Size of the grid the mask is traced at')
+
+	@classmethod
+	def poll(cls, context):
+		return context.active_object is not None and context.active_object.MATTEPAINTER_VAR_isLayer
+
+	def execute(self, context):
+		active_object = bpy.context.active_object
+		mesh = active_object.data
+		nodes = mesh.materials[0].node_tree.nodes
+		node_mask = nodes.get('transparency_mask')
+		if node_mask is not None and tuple(nodes.get('albedo').image.size) != tuple(node_mask.image.size):
+			self.report({"WARNING"}, "Mask and image resolutions do not match.")
+			return {'CANCELLED'}
+
+		loops = mattepainter_pixels.cutout_contours(MATTEPAINTER_FN_getLayerAlpha(nodes), self.threshold, self.margin, self.tolerance, self.resolution)
+		if len(loops) == 0:
+			self.report({"WARNING"}, "Layer is fully transparent.")
+			return {'CANCELLED'}
+
+		# Scanfill handles holes, loops are filled even-odd
+		uvs = np.concatenate(loops)
+		triangles = mathutils.geometry.tessellate_polygon([[Vector((u, v, 0.0)) for u, v in loop] for loop in loops])
+		if len(triangles) == 0:
+			self.report({"WARNING"}, "Could not triangulate the mask outline.")
+			return {'CANCELLED'}
+		triangles = mattepainter_pixels.orient_triangles(uvs, triangles)
+
+		coords, vertex_uvs, affine = MATTEPAINTER_FN_getMeshUVs(mesh)
+		active_object.data = MATTEPAINTER_FN_newMeshFromUVs(mesh.name + "_cutout", affine, uvs, triangles, mesh.materials)
+		if mesh.users == 0:
+			bpy.data.meshes.remove(mesh)
+		self.report({"INFO"}, f"Cutout Mesh: {len(triangles)} triangles.")
+		return {'FINISHED'}
+
+class MATTEPAINTER_OT_analyseBlendModes(bpy.types.Operator):
+	# Picks OPAQUE, CLIP or HASHED blending for every Layer from its alpha content.
+	bl_idname = "mattepainter.analyse_blend_modes"
+	bl_label = "Analyse Blend Modes"
+	bl_options = {"REGISTER", "UNDO"}
+	bl_description = "Classifies every Layer as opaque, binary or soft alpha and sets the cheapest matching blend mode"
+
+	def execute(self, context):
+		counts = {'OPAQUE': 0, 'BINARY': 0, 'SOFT': 0}
+		for material in MATTEPAINTER_FN_getLayerMaterials():
+			counts[MATTEPAINTER_FN_updateBlendMode(material)] += 1
+		self.report({"INFO"}, f"Opaque: {counts['OPAQUE']}, Binary: {counts['BINARY']}, Soft: {counts['SOFT']}.")
+		return {'FINISHED'}
+
 #--------------------------------------------------------------
 # Camera Projection Tools
 #--------------------------------------------------------------		
@@ -710,9 +2072,10 @@ class MATTEPAINTER_OT_setBackgroundImage(bpy.types.Operator, ImportHelper):
 	bl_description = "Select an Image File for Camera Projection"
 
 	filter_glob: bpy.props.StringProperty(
-			default='*.jpg;*.jpeg;*.png;*.tif;*.tiff;*.bmp;',
+			default='*.jpg;*.jpeg;*.png;*.tif;*.tiff;*.bmp;*.exr;*.mp4;*.mov;*.avi;*.mkv;*.webm;',
 			options={'HIDDEN'}
 		)
+	sequence: bpy.props.BoolProperty(name='Image Sequence', default=False, description='Load every numbered file next to the selected one as an Image Sequence')
 
 	def execute(self, context):
 		# Camera Safety Check
@@ -721,13 +2084,18 @@ class MATTEPAINTER_OT_setBackgroundImage(bpy.types.Operator, ImportHelper):
 			self.report({"WARNING"}, "No active scene camera.")
 			return{'CANCELLED'}	
 
-		# Image Loading
+		# Image Loading, movies are detected from their extension
 		image = load_image(self.filepath, check_existing=True)
+		if self.sequence and image.source == 'FILE':
+			image.source = 'SEQUENCE'
 
 		camera.data.show_background_images = True 
 		camera.data.background_images.clear()
 		bg_image = camera.data.background_images.new()
 		bg_image.image = image
+		if image.source in ['SEQUENCE', 'MOVIE']:
+			bg_image.image_user.frame_duration = len(MATTEPAINTER_FN_getSequenceFrames(image)) if image.source == 'SEQUENCE' else image.frame_duration
+			bg_image.image_user.use_auto_refresh = True
 		camera.data.background_images[0].frame_method = 'FIT'
 
 		camera.data.background_images[0].display_depth = 'FRONT'
@@ -787,6 +2155,9 @@ class MATTEPAINTER_OT_projectImage(bpy.types.Operator):
 	bl_description = "Projects the Camera's Background Image onto the selected Object"
 
 	project_resolution: bpy.props.FloatProperty(name='project_resolution', default=0.25)
+	auto_resolution: bpy.props.BoolProperty(name='Auto Resolution', default=False, description='Size the texture from the Object\'s on screen area instead of the scale factor')
+	memory_budget: bpy.props.IntProperty(name='Memory Budget', default=512, min=16, description='Largest memory in MB the projection images may use with Auto Resolution')
+	occlusion: bpy.props.BoolProperty(name='Occlusion', default=True, description='Skip back faces and surfaces hidden from the camera by any visible mesh')
 
 	@classmethod
 	def poll(cls, context):
@@ -817,57 +2188,35 @@ class MATTEPAINTER_OT_projectImage(bpy.types.Operator):
 
 		background_image = camera.data.background_images[0]	
 
-		width = int(background_image.image.size[0] * self.project_resolution)
-		height = int(background_image.image.size[1] * self.project_resolution)
 		previous_mode = context.mode
 
-		# Create Material & Unwrap
-		active_object.data.materials.clear()
-		name = f'{background_image.image.name}_projection'
-		material = bpy.data.materials.new(name=name)
-		material.use_nodes = True
-		if bpy.app.version > (3, 0, 0) and bpy.app.version < (4, 3, 0):
-			material.blend_method = "HASHED"
-			material.shadow_method = "CLIP"
-		active_object.data.materials.append(material)
+		# Unwrap, size the texture from the unwrapped UVs & Create Material
+		MATTEPAINTER_FN_unwrapObject(active_object)
+		width, height, capped = MATTEPAINTER_FN_getProjectionSize(active_object, [camera], self.project_resolution, self.auto_resolution, self.memory_budget)
+		material, projection_image, mask = MATTEPAINTER_FN_setProjectionMaterial(active_object, background_image.image, width, height)
 		nodes = material.node_tree.nodes
-		links = material.node_tree.links
 
-		# Mask Generation
-		mask_name = "mask_" + name
-		mask = MATTEPAINTER_FN_addMask(name=mask_name, width=width, height=height)	
-
-		projection_image = bpy.data.images.new(name=name, width=width, height=height)
-		pixels = [0.0] * (4 * width * height)
-		projection_image.pixels = pixels
-	
-		MATTEPAINTER_FN_setShaders(nodes, links, projection_image, mask=mask)
-
-		# Select Image for Projection
-		node_albedo = nodes.get('albedo')
-		node_albedo.select = True   
-		nodes.active = node_albedo
-	    
-		if not context.mode == 'EDIT':
-			bpy.ops.object.mode_set(mode='EDIT')
-		bpy.ops.mesh.select_all(action='SELECT')	
-		bpy.ops.uv.smart_project(scale_to_bounds=True)
-
-		if not context.mode == 'PAINT_TEXTURE':
-			bpy.ops.object.mode_set(mode='TEXTURE_PAINT')
+		# Rasterise the camera's view of the Background Image into UV space, no paint mode or viewport involved
+		source = background_image.image
+		source_width, source_height = source.size
+		camera_matrix = MATTEPAINTER_FN_getCameraMatrix(bpy.context.scene, camera, source_width, source_height)
+		triangle_uvs, triangle_homogeneous, triangle_depth, facing = MATTEPAINTER_FN_getProjectionTriangles(active_object, camera, camera_matrix, source_width, source_height)
+		source_pixels = mattepainter_pixels.to_rgba(mattepainter_pixels.read_image_pixels(source))
+		if self.occlusion:
+			# Every other visible mesh can hide parts of the target from the camera
+			depth_buffer = MATTEPAINTER_FN_getSceneDepthBuffer(active_object, camera, camera_matrix, triangle_homogeneous, triangle_depth, source_width, source_height)
+			pixels, covered, visibility = mattepainter_pixels.project_triangles(source_pixels, triangle_uvs, triangle_homogeneous, width, height, triangle_depth=triangle_depth, depth_buffer=depth_buffer, triangle_weights=facing)
+		else:
+			pixels, covered, visibility = mattepainter_pixels.project_triangles(source_pixels, triangle_uvs, triangle_homogeneous, width, height)
 
-		# Set to Image Mode for Painting
-		bpy.context.scene.tool_settings.image_paint.mode = 'IMAGE'
-		bpy.context.scene.tool_settings.image_paint.canvas = projection_image
-
-		bpy.ops.wm.tool_set_by_id(name="builtin_brush.Fill")
-		bpy.ops.paint.project_image(image=background_image.image.name)
-		bpy.ops.image.save_all_modified()
+		MATTEPAINTER_FN_writeProjection(material, projection_image, mask, pixels, covered, visibility)
+		MATTEPAINTER_FN_cacheProjection(material, triangle_uvs, triangle_homogeneous, mattepainter_pixels.tile_checksums(source_pixels))
+		MATTEPAINTER_FN_saveProjection(material)
 
 		if MATTEPAINTER_FN_checkForAlpha(background_image.image):
 			nodes.get('combineoriginalalpha').mute = False
 
-		if previous_mode == 'EDIT':
+		if previous_mode == 'EDIT_MESH':
 			bpy.ops.object.mode_set(mode='EDIT')
 		else:
 			bpy.ops.object.mode_set(mode='OBJECT')
@@ -876,8 +2225,354 @@ class MATTEPAINTER_OT_projectImage(bpy.types.Operator):
 		node_mask = nodes.get('transparency_mask')
 		node_mask.select = True   
 		nodes.active = node_mask
+		self.report({"INFO"}, MATTEPAINTER_FN_describeProjectionSize(projection_image, capped))
 		return {'FINISHED'}	
 
+class MATTEPAINTER_OT_reprojectImage(bpy.types.Operator):
+	# Projects the Camera's Background Image again onto an Object that already has a projection, keeping its UVs,
+	# material & images. Only texels sampling source tiles that changed since the last projection are updated.
+	bl_idname = "mattepainter.reproject_image"
+	bl_label = "Reproject Image"
+	bl_options = {"REGISTER", "UNDO"}
+	bl_description = "Updates the active Object's projection from the Camera's edited Background Image, only resampling the parts that changed"
+
+	occlusion: bpy.props.BoolProperty(name='Occlusion', default=True, description='Skip back faces and hidden surfaces when the camera or mesh moved and everything is projected again')
+
+	@classmethod
+	def poll(cls, context):
+		return context.mode in ['PAINT_TEXTURE', 'OBJECT', 'EDIT_MESH']
+
+	def execute(self, context):
+		scene = bpy.context.scene
+		active_object = bpy.context.active_object
+		if active_object is None or active_object.type != 'MESH':
+			self.report({"WARNING"}, "Target Object cannot receive Projections.")
+			return {'CANCELLED'}
+		camera = scene.camera
+		if camera is None:
+			self.report({"WARNING"}, "No active scene camera.")
+			return {'CANCELLED'}
+		if len(camera.data.background_images) == 0 or camera.data.background_images[0].image is None:
+			self.report({"WARNING"}, "No background image assigned to camera.")
+			return {'CANCELLED'}
+		material = MATTEPAINTER_FN_getProjectionMaterial(active_object)
+		if material is None:
+			self.report({"WARNING"}, "Active Object has no projection yet, use Project To Mesh first.")
+			return {'CANCELLED'}
+		nodes = material.node_tree.nodes
+		projection_image = nodes.get('albedo').image
+		mask = nodes.get('transparency_mask').image
+		source = camera.data.background_images[0].image
+		if (source.is_float, source.colorspace_settings.name) != (projection_image.is_float, projection_image.colorspace_settings.name):
+			self.report({"WARNING"}, "Background image color space differs from the projection, use Project To Mesh.")
+			return {'CANCELLED'}
+
+		start = time.time()
+		if active_object.mode == 'EDIT':
+			active_object.update_from_editmode()
+		width, height = projection_image.size
+		source_width, source_height = source.size
+		camera_matrix = MATTEPAINTER_FN_getCameraMatrix(scene, camera, source_width, source_height)
+		triangle_uvs, triangle_homogeneous, triangle_depth, facing = MATTEPAINTER_FN_getProjectionTriangles(active_object, camera, camera_matrix, source_width, source_height)
+		source_pixels = mattepainter_pixels.to_rgba(mattepainter_pixels.read_image_pixels(source))
+		checksums = mattepainter_pixels.tile_checksums(source_pixels)
+
+		cached = projection_cache.get(material.name)
+		unchanged_view = cached is not None and cached['checksums'].shape == checksums.shape and cached['view'].shape == triangle_homogeneous.shape
+		unchanged_view = unchanged_view and np.array_equal(cached['uvs'], triangle_uvs) and np.allclose(cached['view'], triangle_homogeneous, rtol=0.0, atol=1e-4)
+		if not unchanged_view:
+			# Camera, mesh, UVs or plate size changed (or nothing cached since loading the file): resample every texel into the same images
+			if self.occlusion:
+				depth_buffer = MATTEPAINTER_FN_getSceneDepthBuffer(active_object, camera, camera_matrix, triangle_homogeneous, triangle_depth, source_width, source_height)
+				pixels, covered, visibility = mattepainter_pixels.project_triangles(source_pixels, triangle_uvs, triangle_homogeneous, width, height, triangle_depth=triangle_depth, depth_buffer=depth_buffer, triangle_weights=facing)
+			else:
+				pixels, covered, visibility = mattepainter_pixels.project_triangles(source_pixels, triangle_uvs, triangle_homogeneous, width, height)
+			MATTEPAINTER_FN_writeProjection(material, projection_image, mask, pixels, covered, visibility)
+			message = "View changed since the last projection, projected every texel"
+		else:
+			# Same view: resample the previously visible texels over changed tiles, then pad the edges around them again
+			changed = checksums != cached['checksums']
+			pixels = mattepainter_pixels.read_image_pixels(projection_image)
+			visible = mattepainter_pixels.read_image_pixels(nodes.get('visibility').image)[:, :, 0] > 0.0
+			updated = mattepainter_pixels.reproject_triangles(pixels, visible, source_pixels, triangle_uvs, triangle_homogeneous, changed)
+			bounds = mattepainter_pixels.nonzero_bounds(updated)
+			if bounds is not None:
+				x_min, y_min, x_max, y_max = mattepainter_pixels.pad_bounds(bounds, 8, width, height)
+				extended = mattepainter_pixels.extend_edges(pixels[y_min:y_max, x_min:x_max], visible[y_min:y_max, x_min:x_max], 4)[0]
+				# The outer 4 texels lacked neighbours outside the crop, only the inner part is written back
+				inner = mattepainter_pixels.pad_bounds(bounds, 4, width, height)
+				pixels[inner[1]:inner[3], inner[0]:inner[2]] = extended[inner[1] - y_min:inner[3] - y_min, inner[0] - x_min:inner[2] - x_min]
+				mattepainter_pixels.write_image_pixels(projection_image, pixels)
+			message = f"Resampled {int(changed.sum())} of {changed.size} source tiles ({int(updated.sum())} texels)"
+		MATTEPAINTER_FN_cacheProjection(material, triangle_uvs, triangle_homogeneous, checksums)
+		MATTEPAINTER_FN_saveProjection(material)
+
+		if MATTEPAINTER_FN_checkForAlpha(source):
+			nodes.get('combineoriginalalpha').mute = False
+		self.report({"INFO"}, f"{message} in {time.time() - start:.2f}s.")
+		return {'FINISHED'}
+
+class MATTEPAINTER_OT_projectCameras(bpy.types.Operator):
+	# Projects the Background Images of several cameras onto the active Object with a single unwrap.
+	# Every texel blends the cameras that saw it, the one facing the surface most squarely weighs the most.
+	bl_idname = "mattepainter.project_cameras"
+	bl_label = "Project From Cameras"
+	bl_options = {"REGISTER", "UNDO"}
+	bl_description = "Projects the Background Images of the selected cameras (or all cameras) onto the active Object in one texture"
+
+	project_resolution: bpy.props.FloatProperty(name='project_resolution', default=0.25)
+	auto_resolution: bpy.props.BoolProperty(name='Auto Resolution', default=False, description='Size the texture from the Object\'s on screen area instead of the scale factor')
+	memory_budget: bpy.props.IntProperty(name='Memory Budget', default=512, min=16, description='Largest memory in MB the projection images may use with Auto Resolution')
+	occlusion: bpy.props.BoolProperty(name='Occlusion', default=True, description='Skip back faces and surfaces hidden from each camera by any visible mesh')
+	sharpness: bpy.props.FloatProperty(name='Sharpness', default=4.0, min=0.0, soft_max=16.0, description='How strongly the camera facing a surface most squarely wins over the others, 0 averages them')
+
+	@classmethod
+	def poll(cls, context):
+		return context.mode in ['OBJECT', 'EDIT_MESH']
+
+	def execute(self, context):
+		scene = bpy.context.scene
+		active_object = bpy.context.active_object
+		if active_object is None or active_object.type != 'MESH':
+			self.report({"WARNING"}, "Target Object cannot receive Projections.")
+			return {'CANCELLED'}
+		cameras = [obj for obj in context.selected_objects if obj.type == 'CAMERA']
+		if len(cameras) == 0:
+			cameras = [obj for obj in scene.objects if obj.type == 'CAMERA']
+		cameras = [camera for camera in cameras if len(camera.data.background_images) > 0 and camera.data.background_images[0].image is not None]
+		if len(cameras) == 0:
+			self.report({"WARNING"}, "No camera with a background image.")
+			return {'CANCELLED'}
+		images = [camera.data.background_images[0].image for camera in cameras]
+		if len({(image.is_float, image.colorspace_settings.name) for image in images}) > 1:
+			self.report({"WARNING"}, "Background images need to share one color space to be blended.")
+			return {'CANCELLED'}
+
+		start = time.time()
+		previous_mode = context.mode
+
+		MATTEPAINTER_FN_moveObjectToCollection(active_object)
+		MATTEPAINTER_FN_setObjectAsLayer(active_object)
+
+		# One unwrap shared by every camera
+		MATTEPAINTER_FN_unwrapObject(active_object)
+		width, height, capped = MATTEPAINTER_FN_getProjectionSize(active_object, cameras, self.project_resolution, self.auto_resolution, self.memory_budget)
+		material, projection_image, mask = MATTEPAINTER_FN_setProjectionMaterial(active_object, images[0], width, height)
+
+		projections = []
+		for camera, image in zip(cameras, images):
+			source_width, source_height = image.size
+			camera_matrix = MATTEPAINTER_FN_getCameraMatrix(scene, camera, source_width, source_height)
+			triangle_uvs, triangle_homogeneous, triangle_depth, facing = MATTEPAINTER_FN_getProjectionTriangles(active_object, camera, camera_matrix, source_width, source_height)
+			depth_buffer = None
+			if self.occlusion:
+				depth_buffer = MATTEPAINTER_FN_getSceneDepthBuffer(active_object, camera, camera_matrix, triangle_homogeneous, triangle_depth, source_width, source_height)
+			else:
+				facing = None
+			source_pixels = mattepainter_pixels.to_rgba(mattepainter_pixels.read_image_pixels(image))
+			projections.append((source_pixels, triangle_uvs, triangle_homogeneous, triangle_depth, depth_buffer, facing))
+		pixels, covered, visibility = mattepainter_pixels.blend_projections(projections, width, height, self.sharpness)
+		MATTEPAINTER_FN_writeProjection(material, projection_image, mask, pixels, covered, visibility)
+		MATTEPAINTER_FN_saveProjection(material)
+
+		nodes = material.node_tree.nodes
+		if any(MATTEPAINTER_FN_checkForAlpha(image) for image in images):
+			nodes.get('combineoriginalalpha').mute = False
+		if previous_mode == 'EDIT_MESH':
+			bpy.ops.object.mode_set(mode='EDIT')
+		node_mask = nodes.get('transparency_mask')
+		node_mask.select = True
+		nodes.active = node_mask
+		self.report({"INFO"}, f"Projected {len(cameras)} cameras in {time.time() - start:.2f}s, " + MATTEPAINTER_FN_describeProjectionSize(projection_image, capped))
+		return {'FINISHED'}
+
+class MATTEPAINTER_OT_projectSequence(bpy.types.Operator):
+	# Projects every frame of the Camera's Image Sequence or Movie Background Image onto the Object, writing a sequence
+	# of projected textures. UVs, occlusion & source coordinates are worked out once and reused for every frame.
+	bl_idname = "mattepainter.project_sequence"
+	bl_label = "Project Sequence"
+	bl_options = {"REGISTER", "UNDO"}
+	bl_description = "Projects every frame of the Camera's Image Sequence or Movie onto the selected Object as a texture sequence"
+
+	project_resolution: bpy.props.FloatProperty(name='project_resolution', default=0.25)
+	auto_resolution: bpy.props.BoolProperty(name='Auto Resolution', default=False, description='Size the texture from the Object\'s on screen area instead of the scale factor')
+	memory_budget: bpy.props.IntProperty(name='Memory Budget', default=512, min=16, description='Largest memory in MB the projection images may use with Auto Resolution')
+	occlusion: bpy.props.BoolProperty(name='Occlusion', default=True, description='Skip back faces and surfaces hidden from the camera by any visible mesh')
+	directory: bpy.props.StringProperty(name='Directory', default='//projection_frames/', subtype='DIR_PATH', description='Where the projected frames are written')
+	workers: bpy.props.IntProperty(name='Workers', default=0, min=0, description='Frames projected at once, 0 uses every core. Background mode uses processes, the UI uses threads')
+
+	@classmethod
+	def poll(cls, context):
+		return context.mode in ['OBJECT', 'EDIT_MESH']
+
+	def execute(self, context):
+		scene = bpy.context.scene
+		active_object = bpy.context.active_object
+		if active_object is None or active_object.type != 'MESH':
+			self.report({"WARNING"}, "Target Object cannot receive Projections.")
+			return {'CANCELLED'}
+		camera = scene.camera
+		if camera is None:
+			self.report({"WARNING"}, "No active scene camera.")
+			return {'CANCELLED'}
+		if len(camera.data.background_images) == 0 or camera.data.background_images[0].image is None:
+			self.report({"WARNING"}, "No background image assigned to camera.")
+			return {'CANCELLED'}
+		background_image = camera.data.background_images[0]
+		source = background_image.image
+		if source.source not in ['SEQUENCE', 'MOVIE']:
+			self.report({"WARNING"}, "Background image is a still, use Project To Mesh.")
+			return {'CANCELLED'}
+		directory = bpy.path.abspath(self.directory)
+		if directory.startswith('//') or not os.path.isabs(directory):
+			self.report({"WARNING"}, "Save the Blend File or pick an absolute directory for the frames.")
+			return {'CANCELLED'}
+		os.makedirs(directory, exist_ok=True)
+
+		start = time.time()
+		previous_mode = context.mode
+		frames = MATTEPAINTER_FN_extractMovieFrames(source, directory) if source.source == 'MOVIE' else MATTEPAINTER_FN_getSequenceFrames(source)
+		if len(frames) == 0:
+			self.report({"WARNING"}, "No frames found for the background image.")
+			return {'CANCELLED'}
+
+		MATTEPAINTER_FN_moveObjectToCollection(active_object)
+		MATTEPAINTER_FN_setObjectAsLayer(active_object)
+		MATTEPAINTER_FN_unwrapObject(active_object)
+		width, height, capped = MATTEPAINTER_FN_getProjectionSize(active_object, [camera], self.project_resolution, self.auto_resolution, self.memory_budget)
+		material, projection_image, mask = MATTEPAINTER_FN_setProjectionMaterial(active_object, source, width, height)
+		nodes = material.node_tree.nodes
+
+		# The frame cache: one camera view, so coverage, occlusion & where each texel samples the source never change
+		source_width, source_height = source.size
+		camera_matrix = MATTEPAINTER_FN_getCameraMatrix(scene, camera, source_width, source_height)
+		triangle_uvs, triangle_homogeneous, triangle_depth, facing = MATTEPAINTER_FN_getProjectionTriangles(active_object, camera, camera_matrix, source_width, source_height)
+		if self.occlusion:
+			depth_buffer = MATTEPAINTER_FN_getSceneDepthBuffer(active_object, camera, camera_matrix, triangle_homogeneous, triangle_depth, source_width, source_height)
+			samples = mattepainter_pixels.projection_samples(triangle_uvs, triangle_homogeneous, width, height, source_width, source_height, triangle_depth=triangle_depth, depth_buffer=depth_buffer, triangle_weights=facing)
+		else:
+			samples = mattepainter_pixels.projection_samples(triangle_uvs, triangle_homogeneous, width, height, source_width, source_height)
+		MATTEPAINTER_FN_writeProjection(material, projection_image, mask, np.zeros((height, width, 4), dtype=np.float32), samples['covered'], samples['visibility'])
+
+		# Frames are read here (bpy is main thread only) and projected by the pool while the next ones load
+		extension, file_format = ('.exr', 'OPEN_EXR') if source.is_float else ('.png', 'PNG')
+		frame_image = bpy.data.images.new(name=projection_image.name + "_frame", width=width, height=height, float_buffer=source.is_float)
+		frame_image.colorspace_settings.name = source.colorspace_settings.name
+		frame_image.file_format = file_format
+		sources = (MATTEPAINTER_FN_readImageFile(filepath) for filepath in frames)
+		filepaths = []
+		try:
+			for pixels in mattepainter_pixels.project_frames(sources, samples, margin=4, workers=self.workers or None, processes=bpy.app.background):
+				filepaths.append(os.path.join(directory, f"{bpy.path.clean_name(projection_image.name)}_{len(filepaths) + 1:04d}{extension}"))
+				mattepainter_pixels.write_image_pixels(frame_image, pixels)
+				frame_image.filepath_raw = filepaths[-1]
+				frame_image.save()
+		finally:
+			bpy.data.images.remove(frame_image)
+		if not filepaths:
+			self.report({"WARNING"}, "No frames could be projected from the background image.")
+			return {'CANCELLED'}
+
+		# Swap the still projection for the written sequence
+		sequence = bpy.data.images.load(filepaths[0])
+		sequence.source = 'SEQUENCE'
+		sequence.colorspace_settings.name = source.colorspace_settings.name
+		node_albedo = nodes.get('albedo')
+		node_albedo.image = sequence
+		node_albedo.image_user.frame_duration = len(filepaths)
+		node_albedo.image_user.frame_start = background_image.image_user.frame_start
+		node_albedo.image_user.use_auto_refresh = True
+		bpy.data.images.remove(projection_image)
+		MATTEPAINTER_FN_saveProjection(material)
+
+		if previous_mode == 'EDIT_MESH':
+			bpy.ops.object.mode_set(mode='EDIT')
+		node_mask = nodes.get('transparency_mask')
+		node_mask.select = True
+		nodes.active = node_mask
+		self.report({"INFO"}, f"Projected {len(filepaths)} frames in {time.time() - start:.2f}s to {directory}")
+		return {'FINISHED'}
+
+class MATTEPAINTER_OT_bakeProjection(bpy.types.Operator):
+	# Projects the Camera's Background Image onto the active Object by baking on the CPU with Cycles.
+	# Unlike Project Image it needs no viewport or paint mode, so it runs in background mode on render nodes.
+	bl_idname = "mattepainter.bake_projection"
+	bl_label = "Bake Projection"
+	bl_options = {"REGISTER", "UNDO"}
+	bl_description = "Bakes the Camera's Background Image onto the selected Object's UVs with Cycles, works without a viewport"
+
+	project_resolution: bpy.props.FloatProperty(name='project_resolution', default=0.25)
+	auto_resolution: bpy.props.BoolProperty(name='Auto Resolution', default=False, description='Size the texture from the Object\'s on screen area instead of the scale factor')
+	memory_budget: bpy.props.IntProperty(name='Memory Budget', default=512, min=16, description='Largest memory in MB the projection images may use with Auto Resolution')
+	samples: bpy.props.IntProperty(name='Samples', default=4, min=1, max=256, description='Cycles samples per texel, more samples soften aliasing where the mesh is seen at grazing angles')
+	filepath: bpy.props.StringProperty(name='File Path', default='', subtype='FILE_PATH', description='Optional .png or .exr to save the projection to, the mask is saved next to it. Packed into the Blend File otherwise')
+
+	@classmethod
+	def poll(cls, context):
+		return context.mode in ['OBJECT', 'EDIT_MESH']
+
+	def execute(self, context):
+		scene = bpy.context.scene
+		active_object = bpy.context.active_object
+		if active_object is None or active_object.type != 'MESH':
+			self.report({"WARNING"}, "Target Object cannot receive Projections.")
+			return {'CANCELLED'}
+		camera = scene.camera
+		if camera is None:
+			self.report({"WARNING"}, "No active scene camera.")
+			return {'CANCELLED'}
+		if len(camera.data.background_images) == 0 or camera.data.background_images[0].image is None:
+			self.report({"WARNING"}, "No background image assigned to camera.")
+			return {'CANCELLED'}
+		if 'cycles' not in bpy.context.preferences.addons:
+			self.report({"WARNING"}, "Bake Projection needs the Cycles add-on enabled.")
+			return {'CANCELLED'}
+
+		start = time.time()
+		source_image = camera.data.background_images[0].image
+		previous_mode = active_object.mode
+
+		MATTEPAINTER_FN_moveObjectToCollection(active_object)
+		MATTEPAINTER_FN_setObjectAsLayer(active_object)
+		MATTEPAINTER_FN_unwrapObject(active_object)
+		width, height, capped = MATTEPAINTER_FN_getProjectionSize(active_object, [camera], self.project_resolution, self.auto_resolution, self.memory_budget)
+		material, projection_image, mask = MATTEPAINTER_FN_setProjectionMaterial(active_object, source_image, width, height)
+
+		# Window coordinates follow the render aspect, so the render matches the source image while baking
+		render = scene.render
+		previous_settings = (render.engine, scene.cycles.device, scene.cycles.samples, render.resolution_x, render.resolution_y, render.resolution_percentage)
+		render.engine = 'CYCLES'
+		scene.cycles.device = 'CPU'
+		scene.cycles.samples = self.samples
+		render.resolution_x, render.resolution_y = source_image.size
+		render.resolution_percentage = 100
+		try:
+			MATTEPAINTER_FN_bakeWindowProjection(context, active_object, source_image, projection_image, 'COLOR')
+			MATTEPAINTER_FN_bakeWindowProjection(context, active_object, source_image, mask, 'ALPHA')
+		except RuntimeError as error:
+			self.report({"WARNING"}, f"Bake failed: {error}")
+			return {'CANCELLED'}
+		finally:
+			render.engine, scene.cycles.device, scene.cycles.samples, render.resolution_x, render.resolution_y, render.resolution_percentage = previous_settings
+			if previous_mode == 'EDIT':
+				bpy.ops.object.mode_set(mode='EDIT')
+
+		# Write the result, or pack it so a headless run can save it with the Blend File
+		for image, prefix in [(projection_image, ''), (mask, 'mask_')]:
+			if self.filepath != '':
+				directory, filename = os.path.split(bpy.path.abspath(self.filepath))
+				image.filepath_raw = os.path.join(directory, prefix + filename)
+				image.file_format = 'OPEN_EXR' if filename.lower().endswith('.exr') else 'PNG'
+				image.save()
+			else:
+				image.pack()
+
+		node_mask = material.node_tree.nodes.get('transparency_mask')
+		node_mask.select = True
+		material.node_tree.nodes.active = node_mask
+		self.report({"INFO"}, f"Baked in {time.time() - start:.2f}s, " + MATTEPAINTER_FN_describeProjectionSize(projection_image, capped))
+		return {'FINISHED'}
+
 #--------------------------------------------------------------
 # File Management Functions
 #--------------------------------------------------------------		
@@ -935,7 +2630,7 @@ class MATTEPAINTER_OT_makeSequence(bpy.types.Operator):
 		return {'FINISHED'}	
 
 class MATTEPAINTER_OT_saveAllImages(bpy.types.Operator):
-	# Saves all edited Image files.
+	# Saves all edited Image files, PNGs & EXRs are encoded in the background.
 	bl_idname = "mattepainter.save_all_images"
 	bl_label = "Save All"
 	bl_description = "Saves all modified images"
@@ -943,11 +2638,99 @@ class MATTEPAINTER_OT_saveAllImages(bpy.types.Operator):
 
 	def execute(self, context):
 		try:
-			bpy.ops.image.save_all_modified()
-			self.report({"INFO"}, "Images saved successfully.")
-		except:
+			queued, saved = MATTEPAINTER_FN_saveImagesAsync(bpy.data.images)
+		except RuntimeError as error:
+			self.report({"WARNING"}, f"Save failed: {error}")
+			return {'CANCELLED'}
+		if queued + saved == 0:
 			self.report({"WARNING"}, "Images unchanged, no save necessary.")
 			return {'CANCELLED'}
+		if queued == 0 or bpy.app.background:
+			self.report({"INFO"}, "Images saved successfully.")
+		else:
+			self.report({"INFO"}, f"Saving {queued} images in the background.")
+		return {'FINISHED'}
+
+class MATTEPAINTER_OT_flattenLayers(bpy.types.Operator):
+	# Composites every visible Layer from the active camera on the CPU, no render needed.
+	bl_idname = "mattepainter.flatten_layers"
+	bl_label = "Flatten"
+	bl_description = "Composites all visible Layers into one image at render resolution from the active camera"
+	bl_options = {"REGISTER"}
+
+	scale: bpy.props.FloatProperty(name='Scale', default=1.0, min=0.01, max=1.0, description='Fraction of the render resolution')
+	filepath: bpy.props.StringProperty(name='File Path', default='', subtype='FILE_PATH', description='Optional file to save the flattened image to (.png or .exr)')
+
+	def execute(self, context):
+		scene = bpy.context.scene
+		camera = scene.camera
+		if camera is None:
+			self.report({"WARNING"}, "Scene has no active camera.")
+			return {'CANCELLED'}
+		start = time.time()
+		percentage = scene.render.resolution_percentage / 100.0
+		width = max(int(scene.render.resolution_x * percentage * self.scale), 1)
+		height = max(int(scene.render.resolution_y * percentage * self.scale), 1)
+		camera_matrix = MATTEPAINTER_FN_getCameraMatrix(scene, camera, width, height)
+
+		# Back to front
+		layers = []
+		skipped = 0
+		for obj in MATTEPAINTER_FN_getVisibleLayers():
+			uv_to_screen, depth = MATTEPAINTER_FN_getLayerUVToScreen(obj, camera, camera_matrix, width, height)
+			if uv_to_screen is None:
+				skipped += 1
+				continue
+			layers.append((depth, obj, uv_to_screen))
+		layers.sort(key=lambda layer: layer[0], reverse=True)
+		stack = [(mattepainter_pixels.premultiply(MATTEPAINTER_FN_getLayerColor(obj.data.materials[0].node_tree.nodes)), uv_to_screen) for depth, obj, uv_to_screen in layers]
+		canvas = mattepainter_pixels.flatten_layers(width, height, stack)
+
+		# Float buffers hold premultiplied scene linear values
+		name = "MattePainter_Flatten"
+		image = bpy.data.images.get(name)
+		if image is not None and tuple(image.size) != (width, height):
+			bpy.data.images.remove(image)
+			image = None
+		if image is None:
+			image = bpy.data.images.new(name=name, width=width, height=height, alpha=True, float_buffer=True)
+		mattepainter_pixels.write_image_pixels(image, canvas)
+		if self.filepath != '':
+			image.filepath_raw = bpy.path.abspath(self.filepath)
+			image.file_format = 'OPEN_EXR' if self.filepath.lower().endswith('.exr') else 'PNG'
+			image.save()
+
+		message = f"Flattened {len(layers)} Layers in {time.time() - start:.2f}s."
+		if skipped > 0:
+			message += f" Skipped {skipped} behind the camera."
+		self.report({"INFO"}, message)
+		return {'FINISHED'}
+
+class MATTEPAINTER_OT_toggleLivePreview(bpy.types.Operator):
+	# Keeps a low resolution flatten of the Layers up to date in the Image Editor.
+	bl_idname = "mattepainter.toggle_live_preview"
+	bl_label = "Live Preview"
+	bl_description = "Toggles a reduced resolution composite of all Layers that updates as Layers change"
+	bl_options = {"REGISTER"}
+
+	def execute(self, context):
+		scene = bpy.context.scene
+		scene.MATTEPAINTER_VAR_livePreview = not scene.MATTEPAINTER_VAR_livePreview
+		if not scene.MATTEPAINTER_VAR_livePreview:
+			preview_cache.clear()
+			preview_state['order'] = None
+			return {'FINISHED'}
+		if scene.camera is None:
+			scene.MATTEPAINTER_VAR_livePreview = False
+			self.report({"WARNING"}, "Scene has no active camera.")
+			return {'CANCELLED'}
+		MATTEPAINTER_FN_updatePreview(scene)
+
+		# Show it in any open Image Editor
+		image = bpy.data.images.get(PREVIEW_IMAGE_NAME)
+		for area in bpy.context.screen.areas if bpy.context.screen else []:
+			if area.type == 'IMAGE_EDITOR':
+				area.spaces.active.image = image
 		return {'FINISHED'}
 
 class MATTEPAINTER_OT_clearUnused(bpy.types.Operator):
@@ -1078,6 +2861,234 @@ class MATTEPAINTER_OT_toggleHSV(bpy.types.Operator):
 		node_HSV.mute = 1-node_HSV.mute
 		return {'FINISHED'}	
 
+class MATTEPAINTER_OT_precomputeBlur(bpy.types.Operator):
+	# Blurs the Layer's image and mask on the CPU, the Blur slider then cross-fades to them instead of jittering UVs.
+	bl_idname = "mattepainter.precompute_blur"
+	bl_label = "Precompute Blur"
+	bl_options = {"REGISTER", "UNDO"}
+	bl_description = "Precomputes blurred copies of the Layer's image and mask so blur renders clean at low sample counts"
+
+	radius: bpy.props.FloatProperty(name='Radius', default=8.0, min=0.5, soft_max=128.0, description='Blur radius in pixels when Blur is at 1')
+
+	@classmethod
+	def poll(cls, context):
+		return context.active_object is not None and context.active_object.MATTEPAINTER_VAR_isLayer
+
+	def execute(self, context):
+		active_object = bpy.context.active_object
+		material = active_object.data.materials[0]
+		nodes = material.node_tree.nodes
+		links = material.node_tree.links
+		albedo = nodes.get('albedo').image
+		node_mask = nodes.get('transparency_mask')
+		if albedo.source not in ['FILE', 'GENERATED']:
+			self.report({"WARNING"}, "Precompute Blur only supports still images.")
+			return {'CANCELLED'}
+
+		MATTEPAINTER_FN_addBlurNodes(nodes, links)
+		sources = [(albedo, nodes.get('albedo_blur'))]
+		if node_mask is not None:
+			sources.append((node_mask.image, nodes.get('mask_blur')))
+		for image, node_blur in sources:
+			blurred = mattepainter_pixels.blur_pixels(mattepainter_pixels.read_image_pixels(image), self.radius)
+			old_image = node_blur.image
+			width, height = image.size
+			new_image = bpy.data.images.new(name=image.name + "_blur", width=width, height=height, alpha=True, float_buffer=image.is_float)
+			new_image.colorspace_settings.name = image.colorspace_settings.name
+			mattepainter_pixels.write_image_pixels(new_image, blurred)
+			node_blur.image = new_image
+			if old_image is not None and old_image.users == 0:
+				bpy.data.images.remove(old_image)
+
+		# Hand over from the noise blur
+		nodes.get('blur_mix').inputs['Fac'].default_value = 0.0
+		amount = nodes.get('blur_amount').outputs['Value']
+		if amount.default_value == 0.0:
+			amount.default_value = 1.0
+		self.report({"INFO"}, f"Precomputed blur at {self.radius:.1f}px.")
+		return {'FINISHED'}
+
+class MATTEPAINTER_OT_bakeGrade(bpy.types.Operator):
+	# Bakes Curves & HSV into a new image and mutes the live grade nodes.
+	bl_idname = "mattepainter.bake_grade"
+	bl_label = "Bake Grade"
+	bl_options = {"REGISTER", "UNDO"}
+	bl_description = "Applies the Curves and HSV grade to the Layer's image pixels and mutes the grade nodes"
+
+	@classmethod
+	def poll(cls, context):
+		return context.active_object is not None and context.active_object.MATTEPAINTER_VAR_isLayer
+
+	def execute(self, context):
+		active_object = bpy.context.active_object
+		material = active_object.data.materials[0]
+		nodes = material.node_tree.nodes
+		node_curves = nodes.get('curves')
+		node_HSV = nodes.get('HSV')
+		albedo = nodes.get('albedo').image
+		if albedo.source not in ['FILE', 'GENERATED']:
+			self.report({"WARNING"}, "Bake Grade only supports still images.")
+			return {'CANCELLED'}
+		if node_curves.mute and node_HSV.mute:
+			self.report({"WARNING"}, "Curves and HSV are disabled, nothing to bake.")
+			return {'CANCELLED'}
+
+		# The shader grades scene linear values, byte images are stored with their color space applied
+		node_images = [node for node in [nodes.get('albedo'), nodes.get('albedo_blur')] if node is not None and node.image is not None]
+		for node in node_images:
+			colorspace = node.image.colorspace_settings.name
+			if not node.image.is_float and colorspace not in ['sRGB', 'Non-Color', 'Linear', 'Linear Rec.709', 'Raw']:
+				self.report({"WARNING"}, f"Unsupported color space: {colorspace}.")
+				return {'CANCELLED'}
+
+		curve_luts, curve_slopes = (None, None) if node_curves.mute else MATTEPAINTER_FN_getCurveLUTs(node_curves)
+		hsv = None
+		if not node_HSV.mute:
+			hsv = tuple(node_HSV.inputs[name].default_value for name in ['Hue', 'Saturation', 'Value', 'Fac'])
+
+		for node in node_images:
+			source = node.image
+			pixels = mattepainter_pixels.read_image_pixels(source)
+			if not source.is_float and source.colorspace_settings.name == 'sRGB':
+				pixels[:, :, :3] = mattepainter_pixels.srgb_to_linear(pixels[:, :, :3])
+			graded = mattepainter_pixels.bake_grade(pixels, curve_luts, node_curves.inputs['Fac'].default_value, hsv, curve_slopes)
+
+			# Float buffers are linear, no precision is lost to 8 bit quantisation
+			width, height = source.size
+			image = bpy.data.images.new(name=source.name + "_graded", width=width, height=height, alpha=True, float_buffer=True)
+			image.alpha_mode = source.alpha_mode
+			mattepainter_pixels.write_image_pixels(image, graded)
+			node.image = image
+		node_curves.mute = True
+		node_HSV.mute = True
+		self.report({"INFO"}, f"Baked grade into {node_images[0].image.name}.")
+		return {'FINISHED'}
+
+class MATTEPAINTER_OT_batchGrade(bpy.types.Operator):
+	# Grades every selected Layer at once, all of them land in a single undo step.
+	# Relative mode composes with each Layer's grade: Hue is offset from 0.5, Opacity, Saturation & Value multiply.
+	bl_idname = "mattepainter.batch_grade"
+	bl_label = "Batch Grade"
+	bl_options = {"REGISTER", "UNDO"}
+	bl_description = "Sets or adjusts Opacity, HSV and Curves on all selected Layers"
+
+	mode: bpy.props.EnumProperty(name='Mode', items=[('RELATIVE', 'Relative', 'Adjust each Layer\'s current grade'), ('ABSOLUTE', 'Absolute', 'Give every Layer the same values')], default='RELATIVE')
+	use_opacity: bpy.props.BoolProperty(name='Opacity', default=False)
+	opacity: bpy.props.FloatProperty(name='Opacity', default=1.0, min=0.0, soft_max=1.0, max=2.0)
+	use_hsv: bpy.props.BoolProperty(name='HSV', default=True)
+	hue: bpy.props.FloatProperty(name='Hue', default=0.5, min=0.0, max=1.0)
+	saturation: bpy.props.FloatProperty(name='Saturation', default=1.0, min=0.0, max=2.0)
+	value: bpy.props.FloatProperty(name='Value', default=1.0, min=0.0, max=2.0)
+	use_curves: bpy.props.BoolProperty(name='Curves', default=False, description='Absolute copies the Active Layer\'s Curves, Relative offsets the combined curve')
+	curves_offset: bpy.props.FloatProperty(name='Curves Offset', default=0.0, min=-1.0, max=1.0)
+
+	@classmethod
+	def poll(cls, context):
+		return len(MATTEPAINTER_FN_getSelectedLayerMaterials(context)) > 0
+
+	def invoke(self, context, event):
+		return context.window_manager.invoke_props_dialog(self)
+
+	def execute(self, context):
+		active_object = context.active_object
+		active_curves = None
+		if self.use_curves and self.mode == 'ABSOLUTE':
+			if active_object is None or not active_object.MATTEPAINTER_VAR_isLayer:
+				self.report({"WARNING"}, "Absolute Curves are copied from the Active Layer, select one.")
+				return {'CANCELLED'}
+			active_curves = MATTEPAINTER_FN_getGrade(active_object.data.materials[0].node_tree.nodes)['curves']
+
+		materials = MATTEPAINTER_FN_getSelectedLayerMaterials(context)
+		for material in materials:
+			nodes = material.node_tree.nodes
+			node_opacity = nodes.get('opacity').inputs['Fac']
+			node_HSV = nodes.get('HSV')
+			if self.use_opacity:
+				node_opacity.default_value = min(max(node_opacity.default_value * self.opacity if self.mode == 'RELATIVE' else self.opacity, 0.0), 1.0)
+			if self.use_hsv:
+				node_HSV.mute = False
+				if self.mode == 'RELATIVE':
+					node_HSV.inputs['Hue'].default_value = (node_HSV.inputs['Hue'].default_value + self.hue - 0.5) % 1.0
+					node_HSV.inputs['Saturation'].default_value = min(node_HSV.inputs['Saturation'].default_value * self.saturation, 2.0)
+					node_HSV.inputs['Value'].default_value = min(node_HSV.inputs['Value'].default_value * self.value, 2.0)
+				else:
+					node_HSV.inputs['Hue'].default_value = self.hue
+					node_HSV.inputs['Saturation'].default_value = self.saturation
+					node_HSV.inputs['Value'].default_value = self.value
+			if self.use_curves:
+				grade = MATTEPAINTER_FN_getGrade(nodes)
+				if self.mode == 'RELATIVE':
+					combined = grade['curves'][4][3]
+					for point in combined:
+						point[1] = min(max(point[1] + self.curves_offset, 0.0), 1.0)
+					grade['curves'][0] = False
+				else:
+					grade['curves'] = active_curves
+				MATTEPAINTER_FN_setGrade(nodes, grade)
+		self.report({"INFO"}, f"Graded {len(materials)} Layers.")
+		return {'FINISHED'}
+
+class MATTEPAINTER_OT_saveGradePreset(bpy.types.Operator):
+	# Stores the Active Layer's Opacity, Curves & HSV under a name in the Scene's preset library.
+	bl_idname = "mattepainter.save_grade_preset"
+	bl_label = "Save Grade Preset"
+	bl_options = {"REGISTER", "UNDO"}
+	bl_description = "Saves the Active Layer's grade as a preset"
+
+	name: bpy.props.StringProperty(name='Name', default='Grade')
+
+	@classmethod
+	def poll(cls, context):
+		return context.active_object is not None and context.active_object.MATTEPAINTER_VAR_isLayer
+
+	def invoke(self, context, event):
+		return context.window_manager.invoke_props_dialog(self)
+
+	def execute(self, context):
+		if self.name.strip() == '':
+			self.report({"WARNING"}, "Presets need a name.")
+			return {'CANCELLED'}
+		presets = MATTEPAINTER_FN_getGradePresets(context.scene)
+		presets[self.name.strip()] = MATTEPAINTER_FN_getGrade(context.active_object.data.materials[0].node_tree.nodes)
+		MATTEPAINTER_FN_setGradePresets(context.scene, presets)
+		context.scene.MATTEPAINTER_VAR_gradePreset = self.name.strip()
+		return {'FINISHED'}
+
+class MATTEPAINTER_OT_applyGradePreset(bpy.types.Operator):
+	bl_idname = "mattepainter.apply_grade_preset"
+	bl_label = "Apply Grade Preset"
+	bl_options = {"REGISTER", "UNDO"}
+	bl_description = "Applies the chosen grade preset to all selected Layers"
+
+	@classmethod
+	def poll(cls, context):
+		return len(MATTEPAINTER_FN_getSelectedLayerMaterials(context)) > 0
+
+	def execute(self, context):
+		grade = MATTEPAINTER_FN_getGradePresets(context.scene).get(context.scene.MATTEPAINTER_VAR_gradePreset)
+		if grade is None:
+			self.report({"WARNING"}, "No grade preset chosen.")
+			return {'CANCELLED'}
+		materials = MATTEPAINTER_FN_getSelectedLayerMaterials(context)
+		for material in materials:
+			MATTEPAINTER_FN_setGrade(material.node_tree.nodes, grade)
+		self.report({"INFO"}, f"Applied {context.scene.MATTEPAINTER_VAR_gradePreset} to {len(materials)} Layers.")
+		return {'FINISHED'}
+
+class MATTEPAINTER_OT_removeGradePreset(bpy.types.Operator):
+	bl_idname = "mattepainter.remove_grade_preset"
+	bl_label = "Remove Grade Preset"
+	bl_options = {"REGISTER", "UNDO"}
+	bl_description = "Removes the chosen grade preset from the library"
+
+	def execute(self, context):
+		presets = MATTEPAINTER_FN_getGradePresets(context.scene)
+		if presets.pop(context.scene.MATTEPAINTER_VAR_gradePreset, None) is None:
+			self.report({"WARNING"}, "No grade preset chosen.")
+			return {'CANCELLED'}
+		MATTEPAINTER_FN_setGradePresets(context.scene, presets)
+		return {'FINISHED'}
+
 #--------------------------------------------------------------
 # Interface
 #--------------------------------------------------------------
@@ -1161,6 +3172,29 @@ class MATTEPAINTER_PT_panelLayers(bpy.types.Panel):
 						opBlendOriginal = row.operator(MATTEPAINTER_OT_layerBlendOriginalAlpha.bl_idname, text="", emboss=False if layer_nodes.get('combineoriginalalpha').mute else True, depress=False , icon='OVERLAY')
 						opShowMask.MATTEPAINTER_VAR_layerIndex = i
 
+class MATTEPAINTER_PT_panelMaskTools(bpy.types.Panel):
+	bl_label = "Mask Tools"
+	bl_idname = "MATTEPAINTER_PT_panelMaskTools"
+	bl_space_type = 'VIEW_3D'
+	bl_region_type = 'UI'
+	bl_category = 'MattePainter'
+	bl_parent_id = 'MATTEPAINTER_PT_panelMain'
+	bl_options = {'DEFAULT_CLOSED'}
+
+	def draw(self, context):
+		layout = self.layout
+		row = layout.row()
+		row.operator(MATTEPAINTER_OT_refineEdge.bl_idname, text="Refine Edge", icon="SMOOTHCURVE")
+		row.operator(MATTEPAINTER_OT_keyMask.bl_idname, text="Key", icon="EYEDROPPER")
+		row = layout.row()
+		row.operator(MATTEPAINTER_OT_splitIslands.bl_idname, text="Split Islands", icon="MOD_EXPLODE")
+		row.operator(MATTEPAINTER_OT_autoCrop.bl_idname, text="Auto Crop", icon="FULLSCREEN_EXIT")
+		row = layout.row()
+		row.operator(MATTEPAINTER_OT_generateCutoutMesh.bl_idname, text="Generate Cutout Mesh", icon="MOD_TRIANGULATE")
+		row = layout.row()
+		row.prop(context.scene, "MATTEPAINTER_VAR_autoBlendMode", text="Auto Blend Mode")
+		row.operator(MATTEPAINTER_OT_analyseBlendModes.bl_idname, text="Analyse", icon="NODE_MATERIAL")
+
 class MATTEPAINTER_PT_panelCameraProjection(bpy.types.Panel):
 	bl_label = "Camera Projection"
 	bl_idname = "MATTEPAINTER_PT_panelCameraProjection"
@@ -1177,10 +3211,23 @@ class MATTEPAINTER_PT_panelCameraProjection(bpy.types.Panel):
 		row.operator(MATTEPAINTER_OT_matchBackgroundImageResolution.bl_idname, text='Match Scene', icon='RESTRICT_VIEW_OFF')
 		row = layout.row()
 		button_project_image = row.operator(MATTEPAINTER_OT_projectImage.bl_idname, text='Project To Mesh', icon='DISK_DRIVE')
+		row.operator(MATTEPAINTER_OT_reprojectImage.bl_idname, text='Reproject', icon='FILE_REFRESH')
 		row.operator(MATTEPAINTER_OT_clearBackgroundImages.bl_idname, text='Close Image', icon='CANCEL')		
 		row = layout.row()
-		row.prop(context.scene, 'MATTEPAINTER_VAR_projectResolution', text='Scale Factor')
-		button_project_image.project_resolution = context.scene.MATTEPAINTER_VAR_projectResolution
+		button_project_cameras = row.operator(MATTEPAINTER_OT_projectCameras.bl_idname, text='Project From Cameras', icon='OUTLINER_OB_CAMERA')
+		button_bake_projection = row.operator(MATTEPAINTER_OT_bakeProjection.bl_idname, text='Bake Projection', icon='RENDER_STILL')
+		row = layout.row()
+		button_project_sequence = row.operator(MATTEPAINTER_OT_projectSequence.bl_idname, text='Project Sequence', icon='RENDER_ANIMATION')
+		row = layout.row()
+		row.prop(context.scene, 'MATTEPAINTER_VAR_autoProjectResolution', text='Auto Resolution')
+		if context.scene.MATTEPAINTER_VAR_autoProjectResolution:
+			row.prop(context.scene, 'MATTEPAINTER_VAR_projectMemoryBudget', text='Budget (MB)')
+		else:
+			row.prop(context.scene, 'MATTEPAINTER_VAR_projectResolution', text='Scale Factor')
+		for button in [button_project_image, button_project_cameras, button_bake_projection, button_project_sequence]:
+			button.project_resolution = context.scene.MATTEPAINTER_VAR_projectResolution
+			button.auto_resolution = context.scene.MATTEPAINTER_VAR_autoProjectResolution
+			button.memory_budget = context.scene.MATTEPAINTER_VAR_projectMemoryBudget
 
 class MATTEPAINTER_PT_panelFileManagement(bpy.types.Panel):
 	bl_label = "File Management"
@@ -1196,6 +3243,14 @@ class MATTEPAINTER_PT_panelFileManagement(bpy.types.Panel):
 		row = layout.row()
 		row.operator(MATTEPAINTER_OT_saveAllImages.bl_idname, text="Save All", icon='DISK_DRIVE')
 		row.operator(MATTEPAINTER_OT_clearUnused.bl_idname, text="Clear Unused", icon='TRASH')
+		if len(save_state['jobs']) > 0:
+			layout.label(text=f"Saving {sum(not future.done() for name, future, filepath in save_state['jobs'])} images...", icon='FILE_REFRESH')
+		elif save_state['message'] != '':
+			layout.label(text=save_state['message'], icon='ERROR' if save_state['failed'] else 'CHECKMARK')
+		row = layout.row()
+		row.operator(MATTEPAINTER_OT_flattenLayers.bl_idname, text="Flatten", icon='IMAGE_DATA')
+		row.operator(MATTEPAINTER_OT_toggleLivePreview.bl_idname, text="Live Preview", icon='RESTRICT_VIEW_OFF', depress=bpy.context.scene.MATTEPAINTER_VAR_livePreview)
+		row.prop(bpy.context.scene, 'MATTEPAINTER_VAR_previewScale', text="Scale")
 
 		# Make Sequence 
 		if not bpy.context.active_object == None and bpy.context.active_object.MATTEPAINTER_VAR_isLayer:
@@ -1232,7 +3287,11 @@ class MATTEPAINTER_PT_panelColorGrade(bpy.types.Panel):
 			box.scale_x = 1.0
 			box.scale_y = 1.0					
 			box.prop(layer_nodes[r"opacity"].inputs['Fac'], 'default_value', text=r"Opacity", emboss=True, slider=True)
-			box.prop(layer_nodes[r"blur_mix"].inputs['Fac'], 'default_value', text=r"Blur", emboss=True, slider=True)			
+			if layer_nodes.get('blur_amount') is not None:
+				box.prop(layer_nodes[r"blur_amount"].outputs['Value'], 'default_value', text=r"Blur", emboss=True, slider=True)
+			else:
+				box.prop(layer_nodes[r"blur_mix"].inputs['Fac'], 'default_value', text=r"Blur", emboss=True, slider=True)			
+			box.operator(MATTEPAINTER_OT_precomputeBlur.bl_idname, text="Precompute Blur", icon="MOD_SMOOTH")
 			opToggleCurves = box.operator(MATTEPAINTER_OT_toggleCurves.bl_idname, text="Curves",  emboss=False if layer_nodes.get('curves').mute else True, depress=True, icon='NORMALIZE_FCURVES')
 			sn_layout = box
 			sn_layout.template_curve_mapping(bpy.context.active_object.data.materials[0].node_tree.nodes[r"curves"], 'mapping', type='COLOR')
@@ -1240,17 +3299,55 @@ class MATTEPAINTER_PT_panelColorGrade(bpy.types.Panel):
 			box.prop(layer_nodes[r"HSV"].inputs['Hue'], 'default_value', text=r"Hue", emboss=True, slider=True)
 			box.prop(layer_nodes[r"HSV"].inputs['Saturation'], 'default_value', text=r"Saturation", emboss=True, slider=True)
 			box.prop(layer_nodes[r"HSV"].inputs['Value'], 'default_value', text=r"Value", emboss=True, slider=True)
+			box.operator(MATTEPAINTER_OT_bakeGrade.bl_idname, text="Bake Grade", icon="RENDER_STILL")
+
+			# Selected Layers & Presets
+			box = layout.box()
+			box.operator(MATTEPAINTER_OT_batchGrade.bl_idname, text="Batch Grade Selected", icon="MODIFIER")
+			row = box.row(align=True)
+			row.prop(context.scene, "MATTEPAINTER_VAR_gradePreset", text="")
+			row.operator(MATTEPAINTER_OT_saveGradePreset.bl_idname, text="", icon="ADD")
+			row.operator(MATTEPAINTER_OT_removeGradePreset.bl_idname, text="", icon="REMOVE")
+			box.operator(MATTEPAINTER_OT_applyGradePreset.bl_idname, text="Apply Preset to Selected", icon="CHECKMARK")
+
+			# Scopes, computed from a timer and cached, drawing only shows the last result
+			row = layout.row()
+			row.prop(context.scene, "MATTEPAINTER_VAR_showScopes", text="Scopes")
+			if context.scene.MATTEPAINTER_VAR_showScopes:
+				row.prop(context.scene, "MATTEPAINTER_VAR_scopeMode", expand=True)
+				if MATTEPAINTER_FN_getScopeKey(context.scene, bpy.context.active_object) != scope_state['key']:
+					MATTEPAINTER_FN_requestScope()
+				collection = scope_previews.get('collection')
+				if collection is not None and collection.get('scope') is not None and scope_state['key'] is not None:
+					layout.template_icon(icon_value=collection['scope'].icon_id, scale=8.0)
+			row = layout.row()
+			row.prop(context.scene, "MATTEPAINTER_VAR_autoLiteShaders", text="Lite Shader When Neutral")
 
 addon_keymaps = []
+key_mask_cache = {}
+blend_mode_cache = {}
+layer_update_state = {'last_update': 0.0, 'scheduled': False, 'images': set(), 'materials': set(), 'layer_materials': None}
+preview_cache = {}
+preview_state = {'last_update': 0.0, 'scheduled': False, 'images': set(), 'order': None, 'size': None}
+PREVIEW_IMAGE_NAME = "MattePainter_Preview"
+scope_cache = {}
+scope_state = {'last_request': 0.0, 'scheduled': False, 'key': None, 'versions': {}}
+scope_previews = {}
+grade_preset_items = []
+image_versions = {}
+curve_lut_cache = {}
+projection_cache = {}
+save_state = {'executor': None, 'jobs': [], 'files': {}, 'digests': {}, 'start': 0.0, 'scheduled': False, 'message': '', 'failed': False}
 
 #--------------------------------------------------------------
 # Register 
 #--------------------------------------------------------------
 
-classes_interface = (MATTEPAINTER_PT_panelMain, MATTEPAINTER_PT_panelLayers, MATTEPAINTER_PT_panelCameraProjection, MATTEPAINTER_PT_panelFileManagement, MATTEPAINTER_PT_panelColorGrade)
-classes_functionality = (MATTEPAINTER_OT_newLayerFromFile, MATTEPAINTER_OT_newEmptyPaintLayer, MATTEPAINTER_OT_newLayerFromClipboard, MATTEPAINTER_OT_paintMask, MATTEPAINTER_OT_makeUnique, MATTEPAINTER_OT_makeSequence, MATTEPAINTER_OT_saveAllImages, MATTEPAINTER_OT_clearUnused, MATTEPAINTER_OT_layerSelect, MATTEPAINTER_OT_layerVisibility, MATTEPAINTER_OT_layerVisibilityActive, MATTEPAINTER_OT_layerLock, MATTEPAINTER_OT_layerInvertMask, MATTEPAINTER_OT_layerInvertMaskActive, MATTEPAINTER_OT_layerShowMask, MATTEPAINTER_OT_layerBlendOriginalAlpha, MATTEPAINTER_OT_layerUseEmit, MATTEPAINTER_OT_moveToCamera)
-classes_projection = (MATTEPAINTER_OT_setBackgroundImage, MATTEPAINTER_OT_matchBackgroundImageResolution, MATTEPAINTER_OT_clearBackgroundImages, MATTEPAINTER_OT_projectImage)
-classes_colorgrading = (MATTEPAINTER_OT_toggleCurves, MATTEPAINTER_OT_toggleHSV)
+classes_interface = (MATTEPAINTER_PT_panelMain, MATTEPAINTER_PT_panelLayers, MATTEPAINTER_PT_panelMaskTools, MATTEPAINTER_PT_panelCameraProjection, MATTEPAINTER_PT_panelFileManagement, MATTEPAINTER_PT_panelColorGrade)
+classes_functionality = (MATTEPAINTER_OT_newLayerFromFile, MATTEPAINTER_OT_newEmptyPaintLayer, MATTEPAINTER_OT_newLayerFromClipboard, MATTEPAINTER_OT_paintMask, MATTEPAINTER_OT_makeUnique, MATTEPAINTER_OT_makeSequence, MATTEPAINTER_OT_saveAllImages, MATTEPAINTER_OT_flattenLayers, MATTEPAINTER_OT_toggleLivePreview, MATTEPAINTER_OT_clearUnused, MATTEPAINTER_OT_layerSelect, MATTEPAINTER_OT_layerVisibility, MATTEPAINTER_OT_layerVisibilityActive, MATTEPAINTER_OT_layerLock, MATTEPAINTER_OT_layerInvertMask, MATTEPAINTER_OT_layerInvertMaskActive, MATTEPAINTER_OT_layerShowMask, MATTEPAINTER_OT_layerBlendOriginalAlpha, MATTEPAINTER_OT_layerUseEmit, MATTEPAINTER_OT_moveToCamera)
+classes_projection = (MATTEPAINTER_OT_setBackgroundImage, MATTEPAINTER_OT_matchBackgroundImageResolution, MATTEPAINTER_OT_clearBackgroundImages, MATTEPAINTER_OT_projectImage, MATTEPAINTER_OT_reprojectImage, MATTEPAINTER_OT_projectCameras, MATTEPAINTER_OT_projectSequence, MATTEPAINTER_OT_bakeProjection)
+classes_mask_tools = (MATTEPAINTER_OT_refineEdge, MATTEPAINTER_OT_keyMask, MATTEPAINTER_OT_splitIslands, MATTEPAINTER_OT_autoCrop, MATTEPAINTER_OT_generateCutoutMesh, MATTEPAINTER_OT_analyseBlendModes)
+classes_colorgrading = (MATTEPAINTER_OT_toggleCurves, MATTEPAINTER_OT_toggleHSV, MATTEPAINTER_OT_precomputeBlur, MATTEPAINTER_OT_bakeGrade, MATTEPAINTER_OT_batchGrade, MATTEPAINTER_OT_saveGradePreset, MATTEPAINTER_OT_applyGradePreset, MATTEPAINTER_OT_removeGradePreset)
 classes_painting_tools = (MATTEPAINTER_OT_toolBrush, MATTEPAINTER_OT_toolLine, MATTEPAINTER_OT_fillAll)
 
 def register():
@@ -1262,6 +3359,8 @@ def register():
 		bpy.utils.register_class(c)
 	for c in classes_projection:
 		bpy.utils.register_class(c)
+	for c in classes_mask_tools:
+		bpy.utils.register_class(c)
 	for c in classes_colorgrading:
 		bpy.utils.register_class(c)
 	for c in classes_painting_tools:
@@ -1271,6 +3370,20 @@ def register():
 	bpy.types.Object.MATTEPAINTER_VAR_layerIndex = bpy.props.IntProperty(name='MATTEPAINTER_VAR_layerIndex',description='',subtype='NONE',options=set(), default=0)	
 	bpy.types.Object.MATTEPAINTER_VAR_isLayer = bpy.props.BoolProperty(name='MATTEPAINTER_VAR_isLayer', default=False)
 	bpy.types.Scene.MATTEPAINTER_VAR_projectResolution = bpy.props.FloatProperty(name='MATTEPAINTER_VAR_projectResolution', default=0.25, soft_min=0.1, soft_max=1.0, description='Resolution scaling factor for projected texture.')
+	bpy.types.Scene.MATTEPAINTER_VAR_autoProjectResolution = bpy.props.BoolProperty(name='MATTEPAINTER_VAR_autoProjectResolution', default=True, description='Size projected textures from the Object\'s on screen area and the background image resolution')
+	bpy.types.Scene.MATTEPAINTER_VAR_projectMemoryBudget = bpy.props.IntProperty(name='MATTEPAINTER_VAR_projectMemoryBudget', default=512, min=16, description='Largest memory in MB a projection may use with Auto Resolution')
+	bpy.types.Scene.MATTEPAINTER_VAR_autoBlendMode = bpy.props.BoolProperty(name='MATTEPAINTER_VAR_autoBlendMode', default=False, description='Re-analyse Layer alpha after edits and pick OPAQUE, CLIP or HASHED blending')
+	bpy.types.Scene.MATTEPAINTER_VAR_livePreview = bpy.props.BoolProperty(name='MATTEPAINTER_VAR_livePreview', default=False, description='Keep a reduced resolution composite of all Layers up to date')
+	bpy.types.Scene.MATTEPAINTER_VAR_previewScale = bpy.props.FloatProperty(name='MATTEPAINTER_VAR_previewScale', default=0.25, min=0.05, max=1.0, description='Resolution of the live preview relative to the render resolution')
+	bpy.types.Scene.MATTEPAINTER_VAR_showScopes = bpy.props.BoolProperty(name='MATTEPAINTER_VAR_showScopes', default=False, description='Show a histogram or waveform of the graded Active Layer')
+	bpy.types.Scene.MATTEPAINTER_VAR_scopeMode = bpy.props.EnumProperty(name='MATTEPAINTER_VAR_scopeMode', items=[('HISTOGRAM', 'Histogram', ''), ('WAVEFORM', 'Waveform', '')], default='HISTOGRAM')
+	bpy.types.Scene.MATTEPAINTER_VAR_gradePresets = bpy.props.StringProperty(name='MATTEPAINTER_VAR_gradePresets', default='{}', options={'HIDDEN'})
+	bpy.types.Scene.MATTEPAINTER_VAR_gradePreset = bpy.props.EnumProperty(name='Grade Preset', items=MATTEPAINTER_FN_gradePresetItems, description='Grade preset to apply')
+	bpy.types.Scene.MATTEPAINTER_VAR_autoLiteShaders = bpy.props.BoolProperty(name='MATTEPAINTER_VAR_autoLiteShaders', default=False, description='Skip the grading nodes while curves, HSV, blur and bump are at their defaults')
+
+	# Handlers & Previews
+	bpy.app.handlers.depsgraph_update_post.append(MATTEPAINTER_FN_layerUpdateHandler)
+	scope_previews['collection'] = bpy.utils.previews.new()
 
 	# Keymaps
 	wm = bpy.context.window_manager
@@ -1318,6 +3431,8 @@ def unregister():
 		bpy.utils.unregister_class(c)
 	for c in reversed(classes_projection):
 		bpy.utils.unregister_class(c)
+	for c in reversed(classes_mask_tools):
+		bpy.utils.unregister_class(c)
 	for c in reversed(classes_colorgrading):
 		bpy.utils.unregister_class(c)
 	for c in reversed(classes_painting_tools):
@@ -1328,12 +3443,63 @@ def unregister():
 	del bpy.types.Object.MATTEPAINTER_VAR_layerIndex	
 	del bpy.types.Object.MATTEPAINTER_VAR_isLayer
 	del bpy.types.Scene.MATTEPAINTER_VAR_projectResolution
+	del bpy.types.Scene.MATTEPAINTER_VAR_autoProjectResolution
+	del bpy.types.Scene.MATTEPAINTER_VAR_projectMemoryBudget
+	del bpy.types.Scene.MATTEPAINTER_VAR_autoBlendMode
+	del bpy.types.Scene.MATTEPAINTER_VAR_autoLiteShaders
+	del bpy.types.Scene.MATTEPAINTER_VAR_livePreview
+	del bpy.types.Scene.MATTEPAINTER_VAR_previewScale
+	del bpy.types.Scene.MATTEPAINTER_VAR_showScopes
+	del bpy.types.Scene.MATTEPAINTER_VAR_scopeMode
+	del bpy.types.Scene.MATTEPAINTER_VAR_gradePresets
+	del bpy.types.Scene.MATTEPAINTER_VAR_gradePreset
+
+	# Handlers
+	if MATTEPAINTER_FN_layerUpdateHandler in bpy.app.handlers.depsgraph_update_post:
+		bpy.app.handlers.depsgraph_update_post.remove(MATTEPAINTER_FN_layerUpdateHandler)
+	if bpy.app.timers.is_registered(MATTEPAINTER_FN_layerUpdateTimer):
+		bpy.app.timers.unregister(MATTEPAINTER_FN_layerUpdateTimer)
+	if bpy.app.timers.is_registered(MATTEPAINTER_FN_previewTimer):
+		bpy.app.timers.unregister(MATTEPAINTER_FN_previewTimer)
+	if bpy.app.timers.is_registered(MATTEPAINTER_FN_scopeTimer):
+		bpy.app.timers.unregister(MATTEPAINTER_FN_scopeTimer)
+	if bpy.app.timers.is_registered(MATTEPAINTER_FN_saveTimer):
+		bpy.app.timers.unregister(MATTEPAINTER_FN_saveTimer)
+	# Let saves in flight finish, a half written batch is worse than a slow unregister
+	if save_state['executor'] is not None:
+		save_state['executor'].shutdown(wait=True)
+		save_state['executor'] = None
+	if scope_previews.get('collection') is not None:
+		bpy.utils.previews.remove(scope_previews.pop('collection'))
 
 	# Keymaps
 	for km, kmi in addon_keymaps:
 		km.keymap_items.remove(kmi)
 
 	addon_keymaps.clear()
+	key_mask_cache.clear()
+	image_versions.clear()
+	blend_mode_cache.clear()
+	layer_update_state['images'].clear()
+	layer_update_state['materials'].clear()
+	layer_update_state['scheduled'] = False
+	layer_update_state['layer_materials'] = None
+	preview_cache.clear()
+	preview_state['images'].clear()
+	preview_state['scheduled'] = False
+	preview_state['order'] = None
+	scope_cache.clear()
+	curve_lut_cache.clear()
+	projection_cache.clear()
+	save_state['jobs'].clear()
+	save_state['files'].clear()
+	save_state['digests'].clear()
+	save_state['scheduled'] = False
+	save_state['message'] = ''
+	scope_state['key'] = None
+	scope_state['scheduled'] = False
+	scope_state['versions'].clear()
+	grade_preset_items.clear()
 
 if __name__ == "__main__":
 	register()
\ No newline at end of file
@@ -0,0 +1,294 @@
+#--------------------------------------------------------------
+# MattePainter Headless Benchmark
+#--------------------------------------------------------------
+
+# Run from the repository root with:
+# 	blender -b --factory-startup --python benchmark_mattepainter.py -- [options]
+#
+# Options:
+# 	--sizes 1K 4K 8K 16K		Plate sizes to benchmark (default: 1K 4K)
+# 	--repeat N					Runs per benchmark, the median is kept (default: 3)
+# 	--output PATH				Where to write the JSON results (default: benchmark_results.json)
+# 	--baseline PATH				Baseline JSON to compare against (default: benchmark_baseline.json)
+# 	--threshold F				Allowed slowdown before flagging a regression (default: 0.2 = 20%)
+# 	--update-baseline			Overwrite the baseline with the current results
+#
+# Exits with 1 if any benchmark regressed past the threshold, so it can gate CI jobs.
+# Nothing here touches the GPU or needs a window, so it runs on headless render nodes.
+
+#--------------------------------------------------------------
+# Import
+#--------------------------------------------------------------
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import platform
+import statistics
+import numpy as np
+import bpy
+
+REPO_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+if REPO_DIRECTORY not in sys.path:
+	sys.path.append(REPO_DIRECTORY)
+
+import MattePainter
+import mattepainter_pixels
+
+#--------------------------------------------------------------
+# Settings
+#--------------------------------------------------------------
+
+# 16:9 plates, named by their width
+PLATE_SIZES = {
+	'1K': (1024, 576),
+	'4K': (4096, 2304),
+	'8K': (8192, 4608),
+	'16K': (16384, 9216),
+}
+
+BRUSH_COLOR = [0.0, 0.0, 0.0, 1.0]
+
+#--------------------------------------------------------------
+# Miscellaneous Functions
+#--------------------------------------------------------------
+
+def parse_arguments():
+	argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+	parser = argparse.ArgumentParser(prog='benchmark_mattepainter')
+	parser.add_argument('--sizes', nargs='+', default=['1K', '4K'], choices=list(PLATE_SIZES.keys()))
+	parser.add_argument('--repeat', type=int, default=3)
+	parser.add_argument('--output', default=os.path.join(REPO_DIRECTORY, 'benchmark_results.json'))
+	parser.add_argument('--baseline', default=os.path.join(REPO_DIRECTORY, 'benchmark_baseline.json'))
+	parser.add_argument('--threshold', type=float, default=0.2)
+	parser.add_argument('--update-baseline', action='store_true')
+	return parser.parse_args(argv)
+
+def create_synthetic_plate(directory, size_name):
+	# Writes a gradient plate with a soft alpha ramp to disk, so imports go through the real file loader
+	width, height = PLATE_SIZES[size_name]
+	x = np.linspace(0.0, 1.0, width, dtype=np.float32)
+	y = np.linspace(0.0, 1.0, height, dtype=np.float32)
+	pixels = np.empty((height, width, 4), dtype=np.float32)
+	pixels[:, :, 0] = x[np.newaxis, :]
+	pixels[:, :, 1] = y[:, np.newaxis]
+	pixels[:, :, 2] = 0.5
+	pixels[:, :, 3] = np.clip(x[np.newaxis, :] * 2.0, 0.0, 1.0)
+
+	image = bpy.data.images.new(name=f'plate_{size_name}', width=width, height=height, alpha=True)
+	image.pixels.foreach_set(pixels.ravel())
+	filepath = os.path.join(directory, f'plate_{size_name}.png')
+	image.filepath_raw = filepath
+	image.file_format = 'PNG'
+	image.save()
+	bpy.data.images.remove(image)
+	return filepath
+
+def reset_scene():
+	# Removes every layer and image so each run starts from the same state
+	if bpy.context.object is not None and bpy.context.object.mode != 'OBJECT':
+		bpy.ops.object.mode_set(mode='OBJECT')
+	for obj in list(bpy.data.objects):
+		if obj.type != 'CAMERA':
+			bpy.data.objects.remove(obj, do_unlink=True)
+	for material in list(bpy.data.materials):
+		bpy.data.materials.remove(material)
+	for mesh in list(bpy.data.meshes):
+		bpy.data.meshes.remove(mesh)
+	for image in list(bpy.data.images):
+		bpy.data.images.remove(image)
+
+def prepare_scene(size_name):
+	scene = bpy.context.scene
+	width, height = PLATE_SIZES[size_name]
+	scene.render.resolution_x = width
+	scene.render.resolution_y = height
+	scene.render.resolution_percentage = 100
+	scene.cursor.location = (0.0, 0.0, 0.0)
+	if scene.camera is None:
+		camera_data = bpy.data.cameras.new('Camera')
+		camera = bpy.data.objects.new('Camera', camera_data)
+		scene.collection.objects.link(camera)
+		scene.camera = camera
+	scene.camera.location = (0.0, -5.0, 0.0)
+	scene.camera.rotation_euler = (1.5708, 0.0, 0.0)
+
+def import_layer(filepath):
+	bpy.ops.mattepainter.new_layer_from_file(filepath=filepath)
+	return bpy.context.active_object
+
+def get_layer_mask(layer):
+	return layer.data.materials[0].node_tree.nodes.get('transparency_mask').image
+
+#--------------------------------------------------------------
+# Benchmarks
+#--------------------------------------------------------------
+
+# Each benchmark is split into setup (untimed) and run (timed), both receive the plate filepath and size name.
+
+def setup_none(filepath, size_name):
+	return None
+
+def run_new_layer_from_file(state, filepath, size_name):
+	import_layer(filepath)
+
+def run_new_empty_paint_layer(state, filepath, size_name):
+	bpy.ops.mattepainter.new_empty_paint_layer()
+
+def setup_make_unique(filepath, size_name):
+	import_layer(filepath)
+	bpy.ops.object.duplicate()
+	return bpy.context.active_object
+
+def run_make_unique(state, filepath, size_name):
+	bpy.ops.mattepainter.make_unique()
+
+def setup_marquee_fill(filepath, size_name):
+	layer = import_layer(filepath)
+	return get_layer_mask(layer)
+
+def run_marquee_fill(state, filepath, size_name):
+	width, height = state.size
+	mattepainter_pixels.fill_image(state, width // 4, height // 4, (width * 3) // 4, (height * 3) // 4, BRUSH_COLOR)
+
+def setup_project_image(filepath, size_name):
+	image = bpy.data.images.load(filepath, check_existing=True)
+	camera = bpy.context.scene.camera
+	camera.data.show_background_images = True
+	camera.data.background_images.clear()
+	background_image = camera.data.background_images.new()
+	background_image.image = image
+	bpy.ops.mesh.primitive_plane_add(location=(0.0, 0.0, 0.0), rotation=(1.5708, 0.0, 0.0))
+	bpy.ops.object.mode_set(mode='EDIT')
+	bpy.ops.mesh.subdivide(number_cuts=8)
+	bpy.ops.object.mode_set(mode='OBJECT')
+	return bpy.context.active_object
+
+def run_project_image(state, filepath, size_name):
+	bpy.ops.mattepainter.project_image(project_resolution=bpy.context.scene.MATTEPAINTER_VAR_projectResolution)
+
+def setup_reproject_image(filepath, size_name):
+	# Projects once, then paints a block into the background image so the reprojection has tiles to update
+	obj = setup_project_image(filepath, size_name)
+	run_project_image(obj, filepath, size_name)
+	image = bpy.context.scene.camera.data.background_images[0].image
+	width, height = image.size
+	mattepainter_pixels.fill_image(image, width // 3, height // 3, width // 3 + width // 8, height // 3 + height // 8, BRUSH_COLOR)
+	return obj
+
+def run_reproject_image(state, filepath, size_name):
+	bpy.ops.mattepainter.reproject_image()
+
+def run_bake_projection(state, filepath, size_name):
+	bpy.ops.mattepainter.bake_projection(project_resolution=bpy.context.scene.MATTEPAINTER_VAR_projectResolution, samples=1)
+
+def setup_save(filepath, size_name):
+	layer = import_layer(filepath)
+	mask = get_layer_mask(layer)
+	mask.filepath_raw = os.path.join(os.path.dirname(filepath), f'{mask.name}.png')
+	mask.file_format = 'PNG'
+	run_marquee_fill(mask, filepath, size_name)
+	return mask
+
+def run_save(state, filepath, size_name):
+	bpy.ops.mattepainter.save_all_images()
+
+BENCHMARKS = (
+	('newLayerFromFile', setup_none, run_new_layer_from_file),
+	('newEmptyPaintLayer', setup_none, run_new_empty_paint_layer),
+	('makeUnique', setup_make_unique, run_make_unique),
+	('marqueeFill', setup_marquee_fill, run_marquee_fill),
+	('projectImage', setup_project_image, run_project_image),
+	('reprojectImage', setup_reproject_image, run_reproject_image),
+	('bakeProjection', setup_project_image, run_bake_projection),
+	('save', setup_save, run_save),
+)
+
+def run_benchmark(name, setup, run, filepath, size_name, repeat):
+	timings = []
+	for i in range(repeat):
+		reset_scene()
+		prepare_scene(size_name)
+		try:
+			state = setup(filepath, size_name)
+			start = time.perf_counter()
+			run(state, filepath, size_name)
+			timings.append(time.perf_counter() - start)
+		except Exception as error:
+			# Operators that still need a live UI fail in background mode, record it instead of aborting the suite
+			return {'status': 'error', 'error': f'{type(error).__name__}: {error}'}
+	return {'status': 'ok', 'seconds': statistics.median(timings), 'min': min(timings), 'runs': timings}
+
+#--------------------------------------------------------------
+# Results
+#--------------------------------------------------------------
+
+def compare_with_baseline(results, baseline, threshold):
+	# Returns (key, baseline seconds, current seconds, ratio) for every benchmark slower than the threshold allows
+	regressions = []
+	for key, result in results.items():
+		reference = baseline.get(key)
+		if reference is None or result['status'] != 'ok' or reference.get('status') != 'ok':
+			continue
+		ratio = result['seconds'] / max(reference['seconds'], 1e-9)
+		if ratio > 1.0 + threshold:
+			regressions.append((key, reference['seconds'], result['seconds'], ratio))
+	return regressions
+
+def main():
+	arguments = parse_arguments()
+	MattePainter.register()
+
+	results = {}
+	with tempfile.TemporaryDirectory(prefix='mattepainter_benchmark_') as directory:
+		for size_name in arguments.sizes:
+			reset_scene()
+			filepath = create_synthetic_plate(directory, size_name)
+			for name, setup, run in BENCHMARKS:
+				key = f'{name}@{size_name}'
+				results[key] = run_benchmark(name, setup, run, filepath, size_name, arguments.repeat)
+				if results[key]['status'] == 'ok':
+					print(f'{key:<28} {results[key]["seconds"]:10.4f}s')
+				else:
+					print(f'{key:<28} {"ERROR":>10}  {results[key]["error"]}')
+		reset_scene()
+
+	report = {
+		'blender': bpy.app.version_string,
+		'python': platform.python_version(),
+		'platform': platform.platform(),
+		'machine': platform.machine(),
+		'threshold': arguments.threshold,
+		'results': results,
+	}
+	with open(arguments.output, 'w') as file:
+		json.dump(report, file, indent=2, sort_keys=True)
+	print(f'Results written to {arguments.output}')
+
+	MattePainter.unregister()
+
+	if arguments.update_baseline:
+		with open(arguments.baseline, 'w') as file:
+			json.dump(report, file, indent=2, sort_keys=True)
+		print(f'Baseline updated at {arguments.baseline}')
+		return 0
+
+	if not os.path.exists(arguments.baseline):
+		print('No baseline found, run with --update-baseline to create one.')
+		return 0
+
+	with open(arguments.baseline) as file:
+		baseline = json.load(file).get('results', {})
+	regressions = compare_with_baseline(results, baseline, arguments.threshold)
+	for key, before, after, ratio in regressions:
+		print(f'REGRESSION {key}: {before:.4f}s -> {after:.4f}s ({(ratio - 1.0) * 100.0:.1f}% slower)')
+	if regressions:
+		return 1
+	print(f'No regressions above {arguments.threshold * 100.0:.0f}%.')
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
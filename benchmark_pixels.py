@@ -0,0 +1,425 @@
+#--------------------------------------------------------------
+# MattePainter Pixel Engine Benchmark
+#--------------------------------------------------------------
+
+# Micro-benchmarks for mattepainter_pixels, runs in plain CPython (no Blender):
+# 	python benchmark_pixels.py [--sizes 1K 4K] [--repeat 5] [--output PATH] [--baseline PATH] [--threshold 0.2] [--update-baseline]
+#
+# Only timings are recorded here, correctness is covered by tests/test_pixels.py on small arrays.
+# Result and baseline files use the same layout as benchmark_mattepainter.py.
+
+#--------------------------------------------------------------
+# Import
+#--------------------------------------------------------------
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import numpy as np
+
+import mattepainter_pixels
+
+#--------------------------------------------------------------
+# Settings
+#--------------------------------------------------------------
+
+PLATE_SIZES = {
+	'1K': (1024, 576),
+	'4K': (4096, 2304),
+	'8K': (8192, 4608),
+	'16K': (16384, 9216),
+}
+
+BRUSH_COLOR = [0.0, 0.0, 0.0, 1.0]
+REPO_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+#--------------------------------------------------------------
+# Miscellaneous Functions
+#--------------------------------------------------------------
+
+class FakePixels:
+	# Mimics bpy_prop_array's foreach_get/foreach_set on a flat float32 buffer
+	def __init__(self, buffer):
+		self.buffer = buffer
+
+	def foreach_get(self, target):
+		target[:] = self.buffer
+
+	def foreach_set(self, source):
+		self.buffer[:] = source
+
+class FakeImage:
+	# Just enough of bpy.types.Image for the engine's image adapters
+	def __init__(self, width, height, channels=4, fill=1.0):
+		self.size = (width, height)
+		self.channels = channels
+		self.pixels = FakePixels(np.full(width * height * channels, fill, dtype=np.float32))
+		self.updates = 0
+
+	def update(self):
+		self.updates += 1
+
+def synthetic_plate(width, height, seed=0):
+	# Smooth gradient with some noise and a soft alpha ramp
+	generator = np.random.default_rng(seed)
+	x = np.linspace(0.0, 1.0, width, dtype=np.float32)
+	y = np.linspace(0.0, 1.0, height, dtype=np.float32)
+	plate = np.empty((height, width, 4), dtype=np.float32)
+	plate[:, :, 0] = x[np.newaxis, :]
+	plate[:, :, 1] = y[:, np.newaxis]
+	plate[:, :, 2] = generator.random((height, width), dtype=np.float32) * 0.1 + 0.45
+	plate[:, :, 3] = np.clip(x[np.newaxis, :] * 2.0, 0.0, 1.0)
+	return plate
+
+#--------------------------------------------------------------
+# Benchmarks
+#--------------------------------------------------------------
+
+# Each entry is (name, setup, run). setup(width, height) builds untimed state, run(state) is timed.
+
+def setup_fill(width, height):
+	return np.ones((height, width, 4), dtype=np.float32)
+
+def run_fill(state):
+	height, width = state.shape[:2]
+	mattepainter_pixels.fill_pixels(state, width // 4, height // 4, (width * 3) // 4, (height * 3) // 4, BRUSH_COLOR)
+
+def setup_fill_image(width, height):
+	return FakeImage(width, height)
+
+def run_fill_image(state):
+	width, height = state.size
+	mattepainter_pixels.fill_image(state, width - 1, height - 1, -50, -50, BRUSH_COLOR)
+
+def setup_buffer_roundtrip(width, height):
+	return {'buffer': np.arange(width * height * 4, dtype=np.float32), 'width': width, 'height': height}
+
+def run_buffer_roundtrip(state):
+	state['matrix'] = mattepainter_pixels.convert_pixel_buffer_to_matrix(state['buffer'], state['width'], state['height'], 4)
+	state['flat'] = mattepainter_pixels.convert_matrix_to_pixel_buffer(state['matrix'])
+
+def setup_lasso_bounds(width, height):
+	angles = np.linspace(0.0, 2.0 * np.pi, 5000)
+	return np.stack((width * (0.5 + 0.4 * np.cos(angles)), height * (0.5 + 0.4 * np.sin(angles))), axis=1)
+
+def run_lasso_bounds(state):
+	mattepainter_pixels.lasso_bounds(state)
+
+# Rotated & perspective-skewed plane covering roughly a 1000x700 region of the viewport
+SKEWED_PLANE = np.array(((700.0, 180.0, 400.0), (-150.0, 520.0, 200.0), (0.15, 0.1, 1.0)))
+SCREEN_MARQUEE = (450.0, 300.0, 800.0, 550.0)
+
+def setup_homography_fill(width, height):
+	return np.ones((height, width, 4), dtype=np.float32)
+
+def run_homography_fill(state):
+	mattepainter_pixels.fill_homography_rectangle(state, SKEWED_PLANE, *SCREEN_MARQUEE, BRUSH_COLOR)
+
+def setup_polygon_fill(width, height):
+	# A 30 degree rotated marquee and a 2000 point star-shaped lasso, both in texel space
+	marquee = ((width * 0.2, height * 0.3), (width * 0.7, height * 0.3), (width * 0.7, height * 0.7), (width * 0.2, height * 0.7))
+	marquee = mattepainter_pixels.rotate_points(marquee, (width * 0.45, height * 0.5), 30.0)
+	angles = np.linspace(0.0, 2.0 * np.pi, 2000, endpoint=False)
+	radius = 0.3 + 0.1 * np.sin(angles * 7.0)
+	lasso = np.stack((width * (0.5 + radius * np.cos(angles)), height * (0.5 + radius * np.sin(angles))), axis=1)
+	return {'pixels': np.ones((height, width, 4), dtype=np.float32), 'polygons': (marquee, lasso)}
+
+def run_polygon_fill(state):
+	for polygon in state['polygons']:
+		mattepainter_pixels.fill_polygon(state['pixels'], polygon, BRUSH_COLOR)
+
+def setup_refine_mask(width, height):
+	# Rough rectangular mask over the synthetic plate
+	mask = np.ones((height, width, 4), dtype=np.float32)
+	mask[height // 4:(height * 3) // 4, width // 4:(width * 3) // 4, :3] = 0.0
+	return {'albedo': synthetic_plate(width, height), 'mask': mask, 'original': mask[:, :, 0].copy()}
+
+def run_refine_mask(state):
+	mattepainter_pixels.refine_mask(state['albedo'], state['mask'], radius=8, epsilon=1e-3, tile_size=512)
+
+def setup_chroma_key(width, height):
+	# Green backdrop with a grey subject in the middle
+	plate = np.zeros((height, width, 4), dtype=np.float32)
+	plate[:, :, 1] = 0.8
+	plate[height // 4:(height * 3) // 4, width // 4:(width * 3) // 4, :3] = 0.5
+	return {'plate': plate}
+
+def run_chroma_key(state):
+	state['alpha'] = mattepainter_pixels.chroma_key(state['plate'], (0.0, 1.0, 0.0), 0.1, 0.1)
+
+def setup_label_components(width, height):
+	# Grid of discs with a diagonal chain that is only 8-connected
+	y, x = np.mgrid[0:height, 0:width]
+	cell = max(min(width, height) // 8, 16)
+	binary = ((x % cell - cell // 2) ** 2 + (y % cell - cell // 2) ** 2) < (cell // 3) ** 2
+	chain = np.arange(min(width, height) // 2)
+	binary[chain, chain] = True
+	return {'binary': binary, 'cell': cell}
+
+def run_label_components(state):
+	state['labels'], state['count'] = mattepainter_pixels.label_components(state['binary'])
+	state['bounds'], state['sizes'] = mattepainter_pixels.component_bounds(state['labels'], state['count'])
+
+def setup_cutout_contours(width, height):
+	# Soft ring with a hole plus a separate hard-edged block
+	y, x = np.mgrid[0:height, 0:width]
+	radius = np.hypot(x - width * 0.35, y - height * 0.5) / min(width, height)
+	alpha = np.clip((0.3 - radius) * 50.0, 0.0, 1.0) * (radius > 0.1)
+	alpha[int(height * 0.7):int(height * 0.9), int(width * 0.7):int(width * 0.9)] = 1.0
+	return {'alpha': alpha.astype(np.float32)}
+
+def run_cutout_contours(state):
+	state['loops'] = mattepainter_pixels.cutout_contours(state['alpha'], margin=2, tolerance=2.0, max_resolution=256)
+
+def setup_bake_grade(width, height):
+	# Gamma-like curve LUT and a hue/saturation shift over the synthetic plate
+	luts = np.stack([np.linspace(0.0, 1.0, 1024, dtype=np.float32) ** exponent for exponent in (0.8, 1.0, 1.25)])
+	return {'pixels': synthetic_plate(width, height), 'luts': luts, 'hsv': (0.55, 0.8, 1.1, 1.0)}
+
+def run_bake_grade(state):
+	state['graded'] = mattepainter_pixels.bake_grade(state['pixels'], state['luts'], 1.0, state['hsv'], tile_rows=256)
+
+def setup_blur_pixels(width, height):
+	# Opaque red left half next to a fully transparent green right half
+	pixels = np.zeros((height, width, 4), dtype=np.float32)
+	pixels[:, :width // 2] = (1.0, 0.0, 0.0, 1.0)
+	pixels[:, width // 2:] = (0.0, 1.0, 0.0, 0.0)
+	return {'pixels': pixels}
+
+def run_blur_pixels(state):
+	state['blurred'] = mattepainter_pixels.blur_pixels(state['pixels'], 8.0)
+
+def setup_flatten_layers(width, height):
+	# Eight overlapping half-transparent layers, each under a different skewed quad
+	generator = np.random.default_rng(3)
+	layers = []
+	for i in range(8):
+		layer = np.empty((512, 512, 4), dtype=np.float32)
+		layer[:, :] = (generator.random(), generator.random(), generator.random(), 0.5)
+		centre = generator.random(2) * (width, height)
+		quad = centre + (generator.random((4, 2)) - 0.5) * 0.2 * (width, height) + np.array(((-1, -1), (1, -1), (1, 1), (-1, 1))) * 0.25 * min(width, height)
+		layers.append((mattepainter_pixels.premultiply(layer), mattepainter_pixels.compute_homography(mattepainter_pixels.UNIT_SQUARE, quad), quad))
+	return {'layers': layers, 'size': (width, height)}
+
+def run_flatten_layers(state):
+	state['canvas'] = mattepainter_pixels.flatten_layers(*state['size'], [(layer, homography) for layer, homography, quad in state['layers']])
+
+def setup_scopes(width, height):
+	generator = np.random.default_rng(5)
+	return {'pixels': generator.random((height, width, 4), dtype=np.float32)}
+
+def run_scopes(state):
+	# What the Color Grade panel does per refresh: subsample, then histogram and waveform
+	samples = np.ascontiguousarray(mattepainter_pixels.subsample(state['pixels'], 256)[0])
+	state['samples'] = samples
+	state['histogram'] = mattepainter_pixels.histogram(samples, 256)
+	state['waveform'] = mattepainter_pixels.waveform(samples, 256, 128)
+	state['images'] = (mattepainter_pixels.draw_histogram(state['histogram'], 128), mattepainter_pixels.draw_waveform(state['waveform']))
+
+def setup_project_triangles(width, height):
+	# A 128 x 128 quad grid bent away from a perspective camera, projected into a square texture of the plate width
+	generator = np.random.default_rng(6)
+	cells = 128
+	grid = np.stack(np.meshgrid(np.linspace(0.0, 1.0, cells + 1), np.linspace(0.0, 1.0, cells + 1)), axis=-1).reshape(-1, 2)
+	positions = np.concatenate((grid - 0.5, 0.3 * np.sin(grid[:, :1] * 3.0) + 2.0), axis=1)
+	index = np.arange((cells + 1) ** 2).reshape(cells + 1, cells + 1)
+	a, b, c, d = index[:-1, :-1].ravel(), index[:-1, 1:].ravel(), index[1:, 1:].ravel(), index[1:, :-1].ravel()
+	triangles = np.concatenate((np.stack((a, b, c), axis=1), np.stack((a, c, d), axis=1)))
+	camera_matrix = np.array(((2.0, 0.0, 0.0, 0.0), (0.0, 2.0, 0.0, 0.0), (0.0, 0.0, -1.0, -0.2), (0.0, 0.0, 1.0, 0.0)))
+	source = generator.random((height, width, 4), dtype=np.float32)
+	homogeneous = mattepainter_pixels.project_homogeneous(camera_matrix, positions, width, height)
+	return {'source': source, 'uvs': grid[triangles], 'homogeneous': homogeneous[triangles], 'positions': positions, 'camera_matrix': camera_matrix, 'size': width}
+
+def run_project_triangles(state):
+	state['result'] = mattepainter_pixels.project_triangles(state['source'], state['uvs'], state['homogeneous'], state['size'], state['size'])
+
+def setup_project_occluded(width, height):
+	# The bent grid again, with a card halfway to the camera hiding the middle of the frame
+	state = setup_project_triangles(width, height)
+	card = np.array(((-0.2, -0.2, 1.0), (0.2, -0.2, 1.0), (0.2, 0.2, 1.0), (-0.2, 0.2, 1.0)))
+	card_homogeneous = mattepainter_pixels.project_homogeneous(state['camera_matrix'], card, width, height)[[0, 1, 2, 0, 2, 3]].reshape(2, 3, 3)
+	# The grid triangles' view depth is the z of their vertices, the camera looks down +z here
+	state['depth'] = (0.3 * np.sin(state['uvs'][:, :, 0] * 3.0) + 2.0)
+	state['occluder_homogeneous'] = np.concatenate((state['homogeneous'], card_homogeneous))
+	state['occluder_depth'] = np.concatenate((state['depth'], np.ones((2, 3))))
+	return state
+
+def run_project_occluded(state):
+	size = state['size']
+	source_height, source_width = state['source'].shape[:2]
+	depth_buffer = mattepainter_pixels.rasterise_depth(state['occluder_homogeneous'], state['occluder_depth'], source_width, source_height)
+	state['result'] = mattepainter_pixels.project_triangles(state['source'], state['uvs'], state['homogeneous'], size, size, triangle_depth=state['depth'], depth_buffer=depth_buffer)
+
+def setup_blend_projections(width, height):
+	# Three cameras sharing the bent grid: two flat colors at different weights plus the noisy plate
+	state = setup_project_triangles(width, height)
+	count = len(state['uvs'])
+	white = np.ones_like(state['source'])
+	black = np.zeros_like(state['source'])
+	state['projections'] = [
+		(white, state['uvs'], state['homogeneous'], None, None, np.full(count, 1.0)),
+		(black, state['uvs'], state['homogeneous'], None, None, np.full(count, 0.5)),
+		(state['source'], state['uvs'], state['homogeneous'], None, None, np.zeros(count)),
+	]
+	return state
+
+def run_blend_projections(state):
+	state['result'] = mattepainter_pixels.blend_projections(state['projections'], state['size'], state['size'], sharpness=2.0)
+
+def setup_projection_size(width, height):
+	# Unit UV square mapped onto a quarter of the plate by two triangles, plus the bent grid from project_triangles
+	state = setup_project_triangles(width, height)
+	corners_uv = np.array([[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0]])
+	corners_screen = np.array([[0.0, 0.0, 1.0], [width / 2, 0.0, 1.0], [width / 2, height / 2, 1.0], [0.0, height / 2, 1.0]])
+	state['square_uvs'] = corners_uv[[[0, 1, 2], [0, 2, 3]]]
+	state['square_homogeneous'] = corners_screen[[[0, 1, 2], [0, 2, 3]]] * 2.0
+	state['width'], state['height'] = width, height
+	return state
+
+def run_projection_size(state):
+	state['square_texels'] = mattepainter_pixels.projection_texel_count(state['square_uvs'], state['square_homogeneous'], state['width'], state['height'])
+	state['texels'] = mattepainter_pixels.projection_texel_count(state['uvs'], state['homogeneous'], state['size'], state['size'])
+
+def setup_reproject_tiles(width, height):
+	# The bent grid projected once, then a square brush stroke painted over the plate for the reprojection to pick up
+	state = setup_project_triangles(width, height)
+	pixels, covered, visibility = mattepainter_pixels.project_triangles(state['source'], state['uvs'], state['homogeneous'], state['size'], state['size'])
+	state['previous_checksums'] = mattepainter_pixels.tile_checksums(state['source'])
+	state['painted'] = state['source'].copy()
+	state['painted'][height // 3:height // 3 + height // 8, width // 3:width // 3 + width // 8] = (1.0, 0.0, 0.0, 1.0)
+	state['projection'] = pixels
+	state['visible'] = visibility > 0.0
+	return state
+
+def run_reproject_tiles(state):
+	changed = mattepainter_pixels.tile_checksums(state['painted']) != state['previous_checksums']
+	state['pixels'] = state['projection'].copy()
+	state['updated'] = mattepainter_pixels.reproject_triangles(state['pixels'], state['visible'], state['painted'], state['uvs'], state['homogeneous'], changed)
+
+def setup_project_frames(width, height):
+	# Three frames of the bent grid's plate, brightened a little each frame, sharing one view
+	state = setup_project_triangles(width, height)
+	state['frames'] = [np.clip(state['source'] + 0.1 * i, 0.0, 1.0) for i in range(3)]
+	return state
+
+def run_project_frames(state):
+	samples = mattepainter_pixels.projection_samples(state['uvs'], state['homogeneous'], state['size'], state['size'], state['source'].shape[1], state['source'].shape[0])
+	state['samples'] = samples
+	state['result'] = list(mattepainter_pixels.project_frames(state['frames'], samples))
+
+def setup_encode_images(width, height):
+	# A soft mask as Blender hands out byte images (multiples of 1/255) and a noisy float plate with values above 1
+	generator = np.random.default_rng(7)
+	mask = np.ones((height, width, 4), dtype=np.float32)
+	mask[:, :, :3] = np.round(np.clip(np.linspace(-0.5, 1.5, width, dtype=np.float32)[np.newaxis, :, np.newaxis], 0.0, 1.0) * 255.0) / 255.0
+	plate = generator.random((height, width, 4), dtype=np.float32) * 4.0
+	return {'mask': mask, 'plate': plate}
+
+def run_encode_images(state):
+	state['png'] = mattepainter_pixels.encode_png(state['mask'])
+	state['exr'] = mattepainter_pixels.encode_exr(state['plate'])
+
+BENCHMARKS = [
+	('fill_pixels', setup_fill, run_fill),
+	('fill_image', setup_fill_image, run_fill_image),
+	('buffer_roundtrip', setup_buffer_roundtrip, run_buffer_roundtrip),
+	('lasso_bounds', setup_lasso_bounds, run_lasso_bounds),
+	('homography_fill', setup_homography_fill, run_homography_fill),
+	('polygon_fill', setup_polygon_fill, run_polygon_fill),
+	('refine_mask', setup_refine_mask, run_refine_mask),
+	('chroma_key', setup_chroma_key, run_chroma_key),
+	('label_components', setup_label_components, run_label_components),
+	('cutout_contours', setup_cutout_contours, run_cutout_contours),
+	('bake_grade', setup_bake_grade, run_bake_grade),
+	('blur_pixels', setup_blur_pixels, run_blur_pixels),
+	('flatten_layers', setup_flatten_layers, run_flatten_layers),
+	('scopes', setup_scopes, run_scopes),
+	('project_triangles', setup_project_triangles, run_project_triangles),
+	('project_occluded', setup_project_occluded, run_project_occluded),
+	('blend_projections', setup_blend_projections, run_blend_projections),
+	('projection_size', setup_projection_size, run_projection_size),
+	('reproject_tiles', setup_reproject_tiles, run_reproject_tiles),
+	('project_frames', setup_project_frames, run_project_frames),
+	('encode_images', setup_encode_images, run_encode_images),
+]
+
+#--------------------------------------------------------------
+# Runner
+#--------------------------------------------------------------
+
+def parse_arguments(argv):
+	parser = argparse.ArgumentParser(prog='benchmark_pixels')
+	parser.add_argument('--sizes', nargs='+', default=['1K', '4K'], choices=list(PLATE_SIZES.keys()))
+	parser.add_argument('--repeat', type=int, default=5)
+	parser.add_argument('--only', nargs='+', default=None, help='Only run benchmarks with these names')
+	parser.add_argument('--output', default=os.path.join(REPO_DIRECTORY, 'benchmark_pixels_results.json'))
+	parser.add_argument('--baseline', default=os.path.join(REPO_DIRECTORY, 'benchmark_pixels_baseline.json'))
+	parser.add_argument('--threshold', type=float, default=0.2)
+	parser.add_argument('--update-baseline', action='store_true')
+	return parser.parse_args(argv)
+
+def run_benchmark(setup, run, width, height, repeat):
+	# Times `repeat` runs, each on a fresh state
+	timings = []
+	for i in range(repeat):
+		state = setup(width, height)
+		start = time.perf_counter()
+		run(state)
+		timings.append(time.perf_counter() - start)
+	return {'status': 'ok', 'seconds': statistics.median(timings), 'min': min(timings), 'runs': timings}
+
+def compare_with_baseline(results, baseline, threshold):
+	regressions = []
+	for key, result in results.items():
+		reference = baseline.get(key)
+		if reference is None or result['status'] != 'ok' or reference.get('status') != 'ok':
+			continue
+		ratio = result['seconds'] / max(reference['seconds'], 1e-9)
+		if ratio > 1.0 + threshold:
+			regressions.append((key, reference['seconds'], result['seconds'], ratio))
+	return regressions
+
+def main(argv=None):
+	arguments = parse_arguments(sys.argv[1:] if argv is None else argv)
+	results = {}
+	failed = False
+	for size_name in arguments.sizes:
+		width, height = PLATE_SIZES[size_name]
+		for name, setup, run in BENCHMARKS:
+			if arguments.only and name not in arguments.only:
+				continue
+			key = f'{name}@{size_name}'
+			results[key] = run_benchmark(setup, run, width, height, arguments.repeat)
+			print(f'{key:<32} {results[key]["seconds"]:10.4f}s')
+
+	report = {
+		'python': platform.python_version(),
+		'numpy': np.__version__,
+		'platform': platform.platform(),
+		'machine': platform.machine(),
+		'threshold': arguments.threshold,
+		'results': results,
+	}
+	with open(arguments.output, 'w') as file:
+		json.dump(report, file, indent=2, sort_keys=True)
+
+	if arguments.update_baseline:
+		with open(arguments.baseline, 'w') as file:
+			json.dump(report, file, indent=2, sort_keys=True)
+		print(f'Baseline updated at {arguments.baseline}')
+		return 1 if failed else 0
+
+	if os.path.exists(arguments.baseline):
+		with open(arguments.baseline) as file:
+			baseline = json.load(file).get('results', {})
+		for key, before, after, ratio in compare_with_baseline(results, baseline, arguments.threshold):
+			print(f'REGRESSION {key}: {before:.4f}s -> {after:.4f}s ({(ratio - 1.0) * 100.0:.1f}% slower)')
+			failed = True
+	return 1 if failed else 0
+
+if __name__ == "__main__":
+	sys.exit(main())
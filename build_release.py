@@ -0,0 +1,60 @@
+#--------------------------------------------------------------
+# MattePainter Release Builder
+#--------------------------------------------------------------
+
+# Zips an add-on together with the pixel engine it imports, runs in plain CPython (no Blender):
+# 	python build_release.py [--addon MattePainter.py] [--output PATH]
+#
+# Install the zip through Preferences > Add-ons > Install. Blender unpacks both files into the add-ons
+# folder side by side, which installing the add-on's .py on its own does not do.
+
+#--------------------------------------------------------------
+# Import
+#--------------------------------------------------------------
+
+import os
+import sys
+import ast
+import zipfile
+import argparse
+
+#--------------------------------------------------------------
+# Settings
+#--------------------------------------------------------------
+
+REPO_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+ENGINE_FILE = 'mattepainter_pixels.py'
+
+#--------------------------------------------------------------
+# Runner
+#--------------------------------------------------------------
+
+def parse_arguments(argv):
+	parser = argparse.ArgumentParser(prog='build_release')
+	parser.add_argument('--addon', default='MattePainter.py', help='Add-on file to ship, relative to the repo')
+	parser.add_argument('--output', default=None, help='Zip to write, defaults to dist/<name>_<version>.zip')
+	return parser.parse_args(argv)
+
+def read_version(filepath):
+	# bl_info is a plain dict literal, so it can be read without importing bpy
+	with open(filepath) as file:
+		tree = ast.parse(file.read())
+	for node in tree.body:
+		if isinstance(node, ast.Assign) and any(isinstance(target, ast.Name) and target.id == 'bl_info' for target in node.targets):
+			return '.'.join(str(part) for part in ast.literal_eval(node.value)['version'])
+	return '0'
+
+def main(argv=None):
+	arguments = parse_arguments(sys.argv[1:] if argv is None else argv)
+	addon = os.path.join(REPO_DIRECTORY, arguments.addon)
+	name = os.path.splitext(os.path.basename(addon))[0]
+	output = arguments.output or os.path.join(REPO_DIRECTORY, 'dist', f'{name}_{read_version(addon)}.zip')
+	os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+	with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+		archive.write(addon, os.path.basename(addon))
+		archive.write(os.path.join(REPO_DIRECTORY, ENGINE_FILE), ENGINE_FILE)
+	print(f'Wrote {output}')
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
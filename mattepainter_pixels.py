@@ -0,0 +1,1420 @@
+#--------------------------------------------------------------
+# MattePainter Pixel Engine
+#--------------------------------------------------------------
+
+# Pure NumPy pixel operations shared by the MattePainter operators.
+# Nothing in here imports bpy, everything works on plain arrays so it can be
+# benchmarked and iterated on in a regular Python interpreter.
+# Images are stored as (height, width, channels) float32 matrices, row 0 is the
+# bottom of the image to match Blender's pixel order.
+
+#--------------------------------------------------------------
+# Import
+#--------------------------------------------------------------
+
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from collections import deque
+import multiprocessing
+import struct
+import zlib
+import os
+
+#--------------------------------------------------------------
+# Pixel Buffers
+#--------------------------------------------------------------
+
+def convert_pixel_buffer_to_matrix(buffer, width, height, channels=4):
+	# Converts a 1-D pixel buffer into an xy grid with n Colour channels (no copy)
+	return buffer.reshape(height, width, channels)
+
+def convert_matrix_to_pixel_buffer(matrix):
+	# Converts back to 1-D pixel buffer (no copy for contiguous matrices)
+	return matrix.reshape(-1)
+
+def read_image_pixels(image):
+	# Pulls an Image's pixels into a matrix with a single foreach_get call
+	width, height = image.size
+	channels = image.channels if hasattr(image, 'channels') else 4
+	buffer = np.empty(width * height * channels, dtype=np.float32)
+	image.pixels.foreach_get(buffer)
+	return convert_pixel_buffer_to_matrix(buffer, width, height, channels)
+
+def write_image_pixels(image, matrix):
+	# Pushes a matrix back into an Image with a single foreach_set call
+	image.pixels.foreach_set(convert_matrix_to_pixel_buffer(np.ascontiguousarray(matrix, dtype=np.float32)))
+	image.update()
+
+#--------------------------------------------------------------
+# Projection
+#--------------------------------------------------------------
+
+def project_points(matrix, points, region_width, region_height):
+	# Projects (N, 3) points through a 4x4 world->clip matrix into region pixel coordinates.
+	# Returns the (N, 2) screen positions and the clip-space w (<= 0 means behind the viewer).
+	points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+	matrix = np.asarray(matrix, dtype=np.float64)
+	clip = points @ matrix[:3, :3].T + matrix[:3, 3]
+	w = points @ matrix[3, :3] + matrix[3, 3]
+	safe_w = np.where(np.abs(w) > 1e-12, w, 1e-12)
+	screen = np.empty((len(points), 2), dtype=np.float64)
+	screen[:, 0] = (clip[:, 0] / safe_w + 1.0) * 0.5 * region_width
+	screen[:, 1] = (clip[:, 1] / safe_w + 1.0) * 0.5 * region_height
+	return screen, w
+
+def _normalisation_matrix(points):
+	# Moves points to their centroid with an average distance of sqrt(2), keeps the DLT well conditioned
+	centre = points.mean(axis=0)
+	scale = np.sqrt(2.0) / max(np.sqrt(((points - centre) ** 2).sum(axis=1)).mean(), 1e-12)
+	return np.array(((scale, 0.0, -scale * centre[0]), (0.0, scale, -scale * centre[1]), (0.0, 0.0, 1.0)))
+
+def compute_homography(source, target):
+	# Least squares homography (normalised DLT) mapping (N, 2) source points onto target points, N >= 4
+	source = np.asarray(source, dtype=np.float64).reshape(-1, 2)
+	target = np.asarray(target, dtype=np.float64).reshape(-1, 2)
+
+	source_transform = _normalisation_matrix(source)
+	target_transform = _normalisation_matrix(target)
+	s = source @ source_transform[:2, :2].T + source_transform[:2, 2]
+	t = target @ target_transform[:2, :2].T + target_transform[:2, 2]
+
+	rows = np.zeros((2 * len(s), 9), dtype=np.float64)
+	rows[0::2, 0:2] = s
+	rows[0::2, 2] = 1.0
+	rows[0::2, 6:8] = -t[:, 0:1] * s
+	rows[0::2, 8] = -t[:, 0]
+	rows[1::2, 3:5] = s
+	rows[1::2, 5] = 1.0
+	rows[1::2, 6:8] = -t[:, 1:2] * s
+	rows[1::2, 8] = -t[:, 1]
+	homography = np.linalg.svd(rows)[2][-1].reshape(3, 3)
+
+	homography = np.linalg.inv(target_transform) @ homography @ source_transform
+	return homography / homography[2, 2]
+
+def apply_homography(homography, points):
+	# Maps (N, 2) points through a homography, returns the mapped points and their w
+	points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+	mapped = points @ homography[:, :2].T + homography[:, 2]
+	w = mapped[:, 2]
+	safe_w = np.where(np.abs(w) > 1e-12, w, 1e-12)
+	return mapped[:, :2] / safe_w[:, np.newaxis], w
+
+#--------------------------------------------------------------
+# Marquee
+#--------------------------------------------------------------
+
+def orient_marquee(x1, y1, x2, y2, width, height):
+	# Orders the Marquee corners for any drag direction and clamps them to the image
+	x1, x2 = min(x1, x2), max(x1, x2)
+	y1, y2 = min(y1, y2), max(y1, y2)
+	x1 = min(max(x1, 0), width - 1)
+	x2 = min(max(x2, 0), width - 1)
+	y1 = min(max(y1, 0), height - 1)
+	y2 = min(max(y2, 0), height - 1)
+	return int(x1), int(y1), int(x2), int(y2)
+
+def marquee_in_bounds(point_a, point_b, width, height):
+	# False when both corners sit on the same outer side of the image
+	if point_a[0] < 0 and point_b[0] < 0:
+		return False
+	if point_a[0] > width and point_b[0] > width:
+		return False
+	if point_a[1] < 0 and point_b[1] < 0:
+		return False
+	if point_a[1] > height and point_b[1] > height:
+		return False
+	return True
+
+def fill_pixels(pixels, x1, y1, x2, y2, color):
+	# Fills the marquee in place, the colour is broadcast so no marquee sized buffer is allocated
+	height, width = pixels.shape[:2]
+	x1, y1, x2, y2 = orient_marquee(x1, y1, x2, y2, width, height)
+	pixels[y1:y2, x1:x2, :] = np.asarray(color, dtype=pixels.dtype)[:pixels.shape[2]]
+	return pixels
+
+def fill_image(image, x1, y1, x2, y2, color):
+	# Thin adapter for Blender Images (or anything exposing size/pixels.foreach_get/foreach_set)
+	pixels = read_image_pixels(image)
+	fill_pixels(pixels, x1, y1, x2, y2, color)
+	write_image_pixels(image, pixels)
+
+def fill_homography_polygon(pixels, uv_to_screen, points, color):
+	# Fills a screen-space polygon (marquee corners, lasso path) into texture space through a UV -> screen homography.
+	# Lines stay lines under a homography, so the polygon is mapped corner by corner and rasterised in texel space.
+	# Returns False if nothing was filled.
+	height, width = pixels.shape[:2]
+	color = np.asarray(color, dtype=pixels.dtype)[:pixels.shape[2]]
+	uvs, w = apply_homography(np.linalg.inv(uv_to_screen), points)
+	if np.all(w > 0.0):
+		return fill_polygon(pixels, uvs * (width, height), color)
+
+	# Polygon crosses the plane's horizon, test every texel centre in screen space instead
+	u = (np.arange(width, dtype=np.float64) + 0.5) / width
+	v = (np.arange(height, dtype=np.float64) + 0.5) / height
+	h = uv_to_screen
+	texel_w = h[2, 0] * u[np.newaxis, :] + h[2, 1] * v[:, np.newaxis] + h[2, 2]
+	screen_x = (h[0, 0] * u[np.newaxis, :] + h[0, 1] * v[:, np.newaxis] + h[0, 2]) / texel_w
+	screen_y = (h[1, 0] * u[np.newaxis, :] + h[1, 1] * v[:, np.newaxis] + h[1, 2]) / texel_w
+	inside = (texel_w > 0.0) & points_in_polygon(screen_x, screen_y, points)
+	if not inside.any():
+		return False
+	pixels[inside] = color
+	return True
+
+def fill_homography_rectangle(pixels, uv_to_screen, x1, y1, x2, y2, color):
+	# Screen-space marquee variant of fill_homography_polygon
+	return fill_homography_polygon(pixels, uv_to_screen, ((x1, y1), (x2, y1), (x2, y2), (x1, y2)), color)
+
+#--------------------------------------------------------------
+# Polygons
+#--------------------------------------------------------------
+
+def rotate_points(points, origin=(0.0, 0.0), angle=0.0):
+	# Rotates (N, 2) points around origin by angle (degrees) in one matrix multiply
+	angle = np.radians(angle)
+	rotation = np.array(((np.cos(angle), -np.sin(angle)), (np.sin(angle), np.cos(angle))))
+	origin = np.asarray(origin, dtype=np.float64)
+	return (np.asarray(points, dtype=np.float64).reshape(-1, 2) - origin) @ rotation.T + origin
+
+def points_in_polygon(x, y, polygon):
+	# Even-odd test for arrays of sample positions, vectorised over the samples (loops over the polygon's edges only)
+	polygon = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+	inside = np.zeros(np.broadcast(x, y).shape, dtype=bool)
+	for (x0, y0), (x1, y1) in zip(polygon, np.roll(polygon, -1, axis=0)):
+		if y0 == y1:
+			continue
+		crosses = (y0 <= y) != (y1 <= y)
+		inside ^= crosses & (x > x0 + (y - y0) * (x1 - x0) / (y1 - y0))
+	return inside
+
+def polygon_mask(points, width, height):
+	# Scanline rasteriser for an arbitrary (N, 2) texel-space polygon, even-odd rule, sampled at texel centres.
+	# Only the clamped bounding box is touched, returns (x_min, y_min, mask) or None when the polygon misses the image.
+	points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+	x_min = max(int(np.floor(points[:, 0].min())), 0)
+	x_max = min(int(np.ceil(points[:, 0].max())), width)
+	y_min = max(int(np.floor(points[:, 1].min())), 0)
+	y_max = min(int(np.ceil(points[:, 1].max())), height)
+	if x_min >= x_max or y_min >= y_max or len(points) < 3:
+		return None
+
+	# Non-horizontal edges and the texel rows whose centres they cross, half-open so shared vertices count once
+	start = points
+	end = np.roll(points, -1, axis=0)
+	keep = start[:, 1] != end[:, 1]
+	start, end = start[keep], end[keep]
+	low = np.minimum(start[:, 1], end[:, 1])
+	high = np.maximum(start[:, 1], end[:, 1])
+	first_row = np.maximum(np.ceil(low - 0.5), y_min).astype(np.int64)
+	last_row = np.minimum(np.ceil(high - 0.5), y_max).astype(np.int64)
+	counts = np.maximum(last_row - first_row, 0)
+
+	# One crossing per (edge, row), expanded without Python loops
+	edges = np.repeat(np.arange(len(counts)), counts)
+	offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+	rows = first_row[edges] + offsets
+	slope = (end[:, 0] - start[:, 0]) / (end[:, 1] - start[:, 1])
+	crossing_x = start[edges, 0] + (rows + 0.5 - start[edges, 1]) * slope[edges]
+
+	# Toggle parity at the first texel centre right of each crossing, then a running sum per row.
+	# uint8 wraps at 256 which keeps the parity intact.
+	columns = np.clip(np.floor(crossing_x - 0.5).astype(np.int64) + 1, x_min, x_max) - x_min
+	toggles = np.zeros((y_max - y_min, x_max - x_min + 1), dtype=np.uint8)
+	np.add.at(toggles, (rows - y_min, columns), 1)
+	mask = (np.cumsum(toggles, axis=1, dtype=np.uint8)[:, :-1] & 1).astype(bool)
+	return x_min, y_min, mask
+
+def fill_polygon(pixels, points, color):
+	# Fills a texel-space polygon in place, returns False if nothing was filled
+	height, width = pixels.shape[:2]
+	rasterised = polygon_mask(points, width, height)
+	if rasterised is None:
+		return False
+	x_min, y_min, mask = rasterised
+	if not mask.any():
+		return False
+	pixels[y_min:y_min + mask.shape[0], x_min:x_min + mask.shape[1]][mask] = np.asarray(color, dtype=pixels.dtype)[:pixels.shape[2]]
+	return True
+
+#--------------------------------------------------------------
+# Lasso
+#--------------------------------------------------------------
+
+def lasso_bounds(points):
+	# Integer bounding box (min_x, max_x, min_y, max_y) of a lasso path
+	points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+	min_x, min_y = np.floor(points.min(axis=0)).astype(int)
+	max_x, max_y = np.floor(points.max(axis=0)).astype(int)
+	return int(min_x), int(max_x), int(min_y), int(max_y)
+
+#--------------------------------------------------------------
+# Filters
+#--------------------------------------------------------------
+
+def luminance(pixels):
+	# Rec. 709 luma of an RGB(A) matrix
+	return pixels[:, :, 0] * 0.2126 + pixels[:, :, 1] * 0.7152 + pixels[:, :, 2] * 0.0722
+
+def _running_sum(values, radius):
+	# Windowed sums along axis 0 from a padded 1-D summed-area table, two slices and one subtraction.
+	# The table is padded with zeros before and its last value after, so border windows are cropped.
+	count = values.shape[0]
+	table = np.empty((count + 1 + 2 * radius,) + values.shape[1:], dtype=np.float64)
+	table[:radius + 1] = 0.0
+	np.cumsum(values, axis=0, out=table[radius + 1:radius + 1 + count])
+	table[radius + 1 + count:] = table[radius + count]
+	return table[2 * radius + 1:] - table[:count]
+
+def box_filter(values, radius):
+	# Mean over a (2r+1)^2 window via separable summed-area tables, cost is independent of the radius.
+	# Windows are cropped at the borders and normalised by the texels they actually cover.
+	height, width = values.shape
+	sums = _running_sum(_running_sum(values, radius).T, radius).T
+	rows = np.arange(height)
+	columns = np.arange(width)
+	sums /= (np.minimum(rows + radius + 1, height) - np.maximum(rows - radius, 0))[:, np.newaxis]
+	sums /= (np.minimum(columns + radius + 1, width) - np.maximum(columns - radius, 0))[np.newaxis, :]
+	return sums.astype(np.float32)
+
+def gaussian_radius_to_box(radius, passes=3):
+	# Box radius whose repeated passes match a gaussian with sigma = radius, a (2r+1) box has variance r(r+1)/3
+	return max(int(round((np.sqrt(1.0 + 12.0 * radius * radius / passes) - 1.0) / 2.0)), 1)
+
+def gaussian_blur(values, radius, passes=3):
+	# Approximate gaussian from repeated separable box filters, linear time whatever the radius
+	box_radius = gaussian_radius_to_box(radius, passes)
+	for i in range(passes):
+		values = box_filter(values, box_radius)
+	return values
+
+def downsample_box(pixels, factor):
+	# Averages factor x factor blocks, edges are padded by repetition so partial blocks are not darkened
+	height, width = pixels.shape[:2]
+	pad_y = -height % factor
+	pad_x = -width % factor
+	if pad_y or pad_x:
+		pixels = np.pad(pixels, ((0, pad_y), (0, pad_x)) + ((0, 0),) * (pixels.ndim - 2), mode='edge')
+	blocks = pixels.reshape((pixels.shape[0] // factor, factor, pixels.shape[1] // factor, factor) + pixels.shape[2:])
+	return blocks.mean(axis=(1, 3), dtype=np.float32)
+
+def _upsample_axis(values, factor, count):
+	# Linear upsampling along axis 0 from block centres. With an integer factor each output phase has one fixed
+	# weight, so every phase is two slices of the edge-padded input instead of a gather.
+	# Edge padding clamps past the first and last block centres
+	padded = np.concatenate((values[:1], values, values[-1:]))
+	result = np.empty((count,) + values.shape[1:], dtype=np.float32)
+	for phase in range(factor):
+		length = len(range(phase, count, factor))
+		offset = (phase + 0.5) / factor - 0.5
+		low = 1 if offset >= 0.0 else 0
+		weight = offset if offset >= 0.0 else 1.0 + offset
+		lower = padded[low:low + length]
+		upper = padded[low + 1:low + 1 + length]
+		result[phase::factor] = lower + (upper - lower) * weight
+	return result
+
+def upsample_bilinear(values, factor, height, width):
+	# Inverse of downsample_box: bilinear from block centres back to (height, width), separable
+	rows = _upsample_axis(values, factor, height)
+	return _upsample_axis(rows.swapaxes(0, 1), factor, width).swapaxes(0, 1)
+
+def blur_pixels(pixels, radius, workers=None):
+	# Blurs a (height, width, 4) matrix with premultiplied alpha so transparent colors do not bleed into the edges.
+	# Wide blurs are band limited, so the filter runs on a box-downsampled copy (one mip level per 3px of radius)
+	# and is upsampled bilinearly. The variance added by both resampling steps is taken off the gaussian.
+	height, width = pixels.shape[:2]
+	factor = max(int(radius // 3), 1)
+	premultiplied = np.empty(pixels.shape, dtype=np.float32)
+	premultiplied[:, :, 3] = pixels[:, :, 3]
+	premultiplied[:, :, :3] = pixels[:, :, :3] * pixels[:, :, 3:4]
+	if factor > 1:
+		premultiplied = downsample_box(premultiplied, factor)
+		radius = np.sqrt(max(radius * radius - (factor * factor - 1) / 12.0 - factor * factor / 6.0, 0.25)) / factor
+	result = np.empty(premultiplied.shape, dtype=np.float32)
+
+	def _blur_channel(channel):
+		result[:, :, channel] = gaussian_blur(premultiplied[:, :, channel], radius)
+
+	with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+		list(executor.map(_blur_channel, range(4)))
+	if factor > 1:
+		result = upsample_bilinear(result, factor, height, width)
+	blurred_alpha = result[:, :, 3:4]
+	np.divide(result[:, :, :3], blurred_alpha, out=result[:, :, :3], where=blurred_alpha > 1e-6)
+	return result
+
+def guided_filter(guide, source, radius, epsilon):
+	# Grey-guided filter (He et al.), snaps the source's soft edges to edges in the guide
+	mean_guide = box_filter(guide, radius)
+	mean_source = box_filter(source, radius)
+	variance = box_filter(guide * guide, radius) - mean_guide * mean_guide
+	covariance = box_filter(guide * source, radius) - mean_guide * mean_source
+	a = covariance / (variance + epsilon)
+	b = mean_source - a * mean_guide
+	return box_filter(a, radius) * guide + box_filter(b, radius)
+
+def _tiles(width, height, tile_size):
+	for y in range(0, height, tile_size):
+		for x in range(0, width, tile_size):
+			yield x, y, min(x + tile_size, width), min(y + tile_size, height)
+
+def guided_filter_tiled(guide, source, radius, epsilon, tile_size=1024, workers=None):
+	# Runs guided_filter tile by tile with a 2r apron (box of a box), results match the untiled filter.
+	# Tiles run on a thread pool, NumPy releases the GIL for the heavy array work.
+	height, width = source.shape
+	apron = 2 * radius
+	result = np.empty((height, width), dtype=np.float32)
+
+	def _filter_tile(bounds):
+		x0, y0, x1, y1 = bounds
+		ax0, ay0 = max(x0 - apron, 0), max(y0 - apron, 0)
+		ax1, ay1 = min(x1 + apron, width), min(y1 + apron, height)
+		filtered = guided_filter(guide[ay0:ay1, ax0:ax1], source[ay0:ay1, ax0:ax1], radius, epsilon)
+		result[y0:y1, x0:x1] = filtered[y0 - ay0:y1 - ay0, x0 - ax0:x1 - ax0]
+
+	with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+		list(executor.map(_filter_tile, _tiles(width, height, tile_size)))
+	return result
+
+def refine_mask(albedo, mask, radius=8, epsilon=1e-3, tile_size=1024):
+	# Edge-aware refinement of a layer mask guided by the plate, writes the result into the mask's RGB
+	guide = luminance(albedo).astype(np.float32)
+	refined = guided_filter_tiled(guide, mask[:, :, 0].astype(np.float32), radius, epsilon, tile_size)
+	np.clip(refined, 0.0, 1.0, out=refined)
+	mask[:, :, :3] = refined[:, :, np.newaxis]
+	return mask
+
+#--------------------------------------------------------------
+# Keying
+#--------------------------------------------------------------
+
+def smoothstep(edge0, edge1, values):
+	# Hermite ramp from 0 at edge0 to 1 at edge1, a hard step when both edges match
+	if edge1 <= edge0:
+		return (values >= edge0).astype(np.float32)
+	t = np.clip((values - edge0) / (edge1 - edge0), 0.0, 1.0)
+	return t * t * (3.0 - 2.0 * t)
+
+def luma_range(luma, luma_min, luma_max, softness):
+	# 1 inside [luma_min, luma_max] with soft shoulders of the given width, 0 outside
+	return smoothstep(luma_min - softness, luma_min, luma) * (1.0 - smoothstep(luma_max, luma_max + softness, luma))
+
+def chromaticity(pixels):
+	# Brightness independent rgb chromaticity, r + g + b = 1 (black maps to grey)
+	rgb = np.asarray(pixels, dtype=np.float32)[..., :3]
+	total = rgb.sum(axis=-1, keepdims=True)
+	return np.where(total > 1e-6, rgb / np.maximum(total, 1e-6), np.float32(1.0 / 3.0))
+
+def chroma_key(pixels, key_color, tolerance, softness, luma_min=0.0, luma_max=1.0, luma_softness=0.0):
+	# Opacity from the chromaticity distance to the key colour, so lit and shaded parts of a backdrop key alike.
+	# Pixels outside the luma range are never keyed (keeps shadows and highlights that share the hue).
+	distance = np.sqrt(((chromaticity(pixels) - chromaticity(key_color)) ** 2).sum(axis=-1))
+	keyed = (1.0 - smoothstep(tolerance, tolerance + softness, distance)) * luma_range(luminance(pixels), luma_min, luma_max, luma_softness)
+	return (1.0 - keyed).astype(np.float32)
+
+def luma_key(pixels, luma_min, luma_max, softness):
+	# Keys out everything inside the luma range (skies, blown highlights)
+	return (1.0 - luma_range(luminance(pixels), luma_min, luma_max, softness)).astype(np.float32)
+
+def despill(pixels, key_color, amount=1.0):
+	# Limits the key colour's dominant channel to the average of the other two, in place
+	channel = int(np.argmax(np.asarray(key_color)[:3]))
+	others = [c for c in range(3) if c != channel]
+	limit = (pixels[:, :, others[0]] + pixels[:, :, others[1]]) * 0.5
+	spill = np.maximum(pixels[:, :, channel] - limit, 0.0)
+	pixels[:, :, channel] -= spill * amount
+	return pixels
+
+def subsample(pixels, max_size):
+	# Strided view so the longest side is at most max_size, returns the view and the step used
+	step = max(1, int(np.ceil(max(pixels.shape[:2]) / max_size)))
+	return pixels[::step, ::step], step
+
+def upsample_nearest(values, step, height, width):
+	# Inverse of subsample for previews, repeats every value into a step x step block and crops
+	return np.repeat(np.repeat(values, step, axis=0), step, axis=1)[:height, :width]
+
+#--------------------------------------------------------------
+# Connected Components
+#--------------------------------------------------------------
+
+def _find_root(parents, index):
+	# Union-find lookup with path halving
+	while parents[index] != index:
+		parents[index] = parents[parents[index]]
+		index = parents[index]
+	return index
+
+def label_components(binary, connectivity=8):
+	# Two-pass union-find labelling over horizontal runs instead of pixels.
+	# Pass one extracts runs per row and unions runs that touch in the next row, pass two paints root labels back.
+	# Returns (labels, count) where labels is an int32 image, 0 is background and islands are 1..count in scan order.
+	binary = np.asarray(binary, dtype=bool)
+	height, width = binary.shape
+	labels = np.zeros((height, width), dtype=np.int32)
+
+	# Runs, ordered by row then column: [start, end) per row
+	padded = np.zeros((height, width + 2), dtype=np.int8)
+	padded[:, 1:-1] = binary
+	edges = np.diff(padded, axis=1)
+	run_rows, run_starts = np.nonzero(edges == 1)
+	run_ends = np.nonzero(edges == -1)[1]
+	run_count = len(run_rows)
+	if run_count == 0:
+		return labels, 0
+
+	# Runs in row r + 1 touching each run in row r form a contiguous range, found with two binary searches
+	stride = width + 2
+	reach = 1 if connectivity == 8 else 0
+	start_keys = run_rows * stride + run_starts
+	end_keys = run_rows * stride + run_ends
+	next_row = (run_rows + 1) * stride
+	first = np.searchsorted(end_keys, next_row + run_starts - reach, side='right')
+	last = np.searchsorted(start_keys, next_row + run_ends + reach, side='left')
+	counts = np.maximum(last - first, 0)
+	above = np.repeat(np.arange(run_count), counts)
+	below = np.repeat(first, counts) + (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+
+	# Union-find over the run graph, far fewer nodes than pixels
+	parents = list(range(run_count))
+	for a, b in zip(above.tolist(), below.tolist()):
+		root_a = _find_root(parents, a)
+		root_b = _find_root(parents, b)
+		if root_a != root_b:
+			parents[max(root_a, root_b)] = min(root_a, root_b)
+	roots = np.array([_find_root(parents, i) for i in range(run_count)], dtype=np.int64)
+	unique_roots, run_labels = np.unique(roots, return_inverse=True)
+
+	# Pixels of all runs in row-major order are exactly the True pixels in row-major order
+	labels[binary] = np.repeat(run_labels.astype(np.int32) + 1, run_ends - run_starts)
+	return labels, len(unique_roots)
+
+def component_bounds(labels, count):
+	# Per-label (x_min, y_min, x_max, y_max) with exclusive max, and pixel counts, for labels 1..count
+	rows, columns = np.nonzero(labels)
+	values = labels[rows, columns] - 1
+	x_min = np.full(count, labels.shape[1], dtype=np.int64)
+	y_min = np.full(count, labels.shape[0], dtype=np.int64)
+	x_max = np.zeros(count, dtype=np.int64)
+	y_max = np.zeros(count, dtype=np.int64)
+	np.minimum.at(x_min, values, columns)
+	np.minimum.at(y_min, values, rows)
+	np.maximum.at(x_max, values, columns + 1)
+	np.maximum.at(y_max, values, rows + 1)
+	sizes = np.bincount(values, minlength=count)
+	return np.stack((x_min, y_min, x_max, y_max), axis=1), sizes
+
+#--------------------------------------------------------------
+# Geometry
+#--------------------------------------------------------------
+
+def fit_uv_to_position(uvs, positions):
+	# Least squares affine map from (N, 2) UVs to (N, 3) positions, returned as (3, 3) rows [u axis, v axis, origin]
+	uvs = np.asarray(uvs, dtype=np.float64).reshape(-1, 2)
+	positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+	design = np.column_stack((uvs, np.ones(len(uvs))))
+	return np.linalg.lstsq(design, positions, rcond=None)[0]
+
+def uv_to_position(affine, uvs):
+	# Evaluates a fit_uv_to_position map for (N, 2) UVs
+	uvs = np.asarray(uvs, dtype=np.float64).reshape(-1, 2)
+	return uvs @ affine[:2] + affine[2]
+
+def crop_uvs(uvs, uv_bounds):
+	# Where UVs of a cropped layer land in the original layer's UV space, uv_bounds is (u_min, v_min, u_max, v_max)
+	u_min, v_min, u_max, v_max = uv_bounds
+	uvs = np.asarray(uvs, dtype=np.float64).reshape(-1, 2)
+	return np.column_stack((u_min + uvs[:, 0] * (u_max - u_min), v_min + uvs[:, 1] * (v_max - v_min)))
+
+def pixel_bounds_to_uv(bounds, width, height):
+	# (x_min, y_min, x_max, y_max) pixel box with exclusive max to the matching UV rectangle
+	x_min, y_min, x_max, y_max = bounds
+	return x_min / width, y_min / height, x_max / width, y_max / height
+
+def nonzero_bounds(values, threshold=0.0):
+	# (x_min, y_min, x_max, y_max) box with exclusive max around values above threshold, None when there are none
+	inside = values > threshold
+	columns = np.flatnonzero(inside.any(axis=0))
+	if len(columns) == 0:
+		return None
+	rows = np.flatnonzero(inside.any(axis=1))
+	return int(columns[0]), int(rows[0]), int(columns[-1]) + 1, int(rows[-1]) + 1
+
+def pad_bounds(bounds, margin, width, height):
+	# Grows a pixel box by margin on every side, clamped to the image
+	x_min, y_min, x_max, y_max = bounds
+	return max(int(x_min) - margin, 0), max(int(y_min) - margin, 0), min(int(x_max) + margin, width), min(int(y_max) + margin, height)
+
+#--------------------------------------------------------------
+# Contours
+#--------------------------------------------------------------
+
+# Marching squares segments per case, corners are bottom-left 1, bottom-right 2, top-right 4, top-left 8.
+# Edges are bottom 0, right 1, top 2, left 3. Segments keep the inside on their left, saddles (5, 10) are split.
+_SEGMENT_FROM = np.array([-1, 0, 1, 1, 2, 0, 2, 2, 3, 0, 1, 1, 3, 0, 3, -1])
+_SEGMENT_TO = np.array([-1, 3, 0, 3, 1, 3, 0, 3, 2, 2, 0, 2, 1, 1, 0, -1])
+_SADDLE_FROM = np.array([-1, -1, -1, -1, -1, 2, -1, -1, -1, -1, 3, -1, -1, -1, -1, -1])
+_SADDLE_TO = np.array([-1, -1, -1, -1, -1, 1, -1, -1, -1, -1, 2, -1, -1, -1, -1, -1])
+
+def block_max(values, step):
+	# Downsamples a (height, width) matrix by taking the max of every step x step block, so coverage is never lost
+	height, width = values.shape
+	blocks_y = -(-height // step)
+	blocks_x = -(-width // step)
+	padded = np.zeros((blocks_y * step, blocks_x * step), dtype=values.dtype)
+	padded[:height, :width] = values
+	return padded.reshape(blocks_y, step, blocks_x, step).max(axis=(1, 3))
+
+def dilate(binary, radius):
+	# Square dilation of a binary matrix via the running sums used by box_filter
+	if radius <= 0:
+		return binary
+	return _running_sum(_running_sum(binary.astype(np.float64), radius).T, radius).T > 0.5
+
+def trace_contours(binary):
+	# Marching squares over a binary grid, returns closed (N, 2) loops in grid coordinates (cell centres at integers).
+	# Outer boundaries run counter-clockwise and holes clockwise.
+	binary = np.asarray(binary, dtype=bool)
+	padded = np.zeros((binary.shape[0] + 2, binary.shape[1] + 2), dtype=bool)
+	padded[1:-1, 1:-1] = binary
+	height, width = padded.shape
+	cases = padded[:-1, :-1] * 1 + padded[:-1, 1:] * 2 + padded[1:, 1:] * 4 + padded[1:, :-1] * 8
+	cell_y, cell_x = np.nonzero((cases != 0) & (cases != 15))
+	if len(cell_y) == 0:
+		return []
+	cases = cases[cell_y, cell_x]
+
+	# Every crossing point is the midpoint of a corner edge, horizontal edges first then vertical ones
+	vertical = height * width
+	edges = np.stack((cell_y * width + cell_x, vertical + cell_y * width + cell_x + 1, (cell_y + 1) * width + cell_x, vertical + cell_y * width + cell_x), axis=1)
+	rows = np.arange(len(cases))
+	starts = edges[rows, _SEGMENT_FROM[cases]]
+	ends = edges[rows, _SEGMENT_TO[cases]]
+	saddles = _SADDLE_FROM[cases] >= 0
+	starts = np.concatenate((starts, edges[rows[saddles], _SADDLE_FROM[cases[saddles]]]))
+	ends = np.concatenate((ends, edges[rows[saddles], _SADDLE_TO[cases[saddles]]]))
+
+	# Each crossing has exactly one outgoing segment, so loops are found by following successors
+	successors = np.full(2 * vertical, -1, dtype=np.int64)
+	successors[starts] = ends
+	successors = successors.tolist()
+	visited = set()
+	loops = []
+	for start in starts.tolist():
+		if start in visited:
+			continue
+		loop = []
+		current = start
+		while current not in visited:
+			visited.add(current)
+			loop.append(current)
+			current = successors[current]
+		loop = np.array(loop, dtype=np.int64)
+		is_vertical = loop >= vertical
+		local = np.where(is_vertical, loop - vertical, loop)
+		points = np.stack((local % width + np.where(is_vertical, 0.0, 0.5), local // width + np.where(is_vertical, 0.5, 0.0)), axis=1)
+		loops.append(points - 1.0)
+	return loops
+
+def simplify_polygon(points, tolerance):
+	# Douglas-Peucker on a closed loop, split at the point furthest from the first one
+	points = np.asarray(points, dtype=np.float64)
+	if len(points) < 4:
+		return points
+	closed = np.vstack((points, points[:1]))
+	keep = np.zeros(len(closed), dtype=bool)
+	furthest = int(np.argmax(np.hypot(*(points - points[0]).T)))
+	keep[[0, furthest]] = True
+	stack = [(0, furthest), (furthest, len(points))]
+	while stack:
+		a, b = stack.pop()
+		if b - a < 2:
+			continue
+		direction = closed[b] - closed[a]
+		offsets = closed[a + 1:b] - closed[a]
+		length = np.hypot(*direction)
+		if length == 0.0:
+			distances = np.hypot(*offsets.T)
+		else:
+			distances = np.abs(direction[0] * offsets[:, 1] - direction[1] * offsets[:, 0]) / length
+		index = int(np.argmax(distances))
+		if distances[index] > tolerance:
+			middle = a + 1 + index
+			keep[middle] = True
+			stack.append((a, middle))
+			stack.append((middle, b))
+	return points[keep[:-1]]
+
+def polygon_area(points):
+	# Signed shoelace area, positive for counter-clockwise loops
+	x, y = np.asarray(points, dtype=np.float64).T
+	return 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+
+def cutout_contours(alpha, threshold=0.0, margin=2, tolerance=1.0, max_resolution=256):
+	# Simplified outlines around alpha > threshold as UV loops, ready to triangulate.
+	# The grid is traced at max_resolution at most, then dilated so neither the block size, the diagonal
+	# marching squares cuts nor the simplification tolerance can eat into visible pixels.
+	height, width = alpha.shape
+	step = max(int(np.ceil(max(width, height) / max_resolution)), 1)
+	grid = block_max(alpha, step) > threshold
+	grid = dilate(grid, int(np.ceil((margin + tolerance) / step)) + 1)
+	loops = []
+	for loop in trace_contours(grid):
+		loop = simplify_polygon(loop, tolerance / step)
+		loop = (loop + 0.5) * step
+		loop[:, 0] = np.clip(loop[:, 0], 0.0, width) / width
+		loop[:, 1] = np.clip(loop[:, 1], 0.0, height) / height
+		# Clamping to the image can stack points on the border, drop the repeats
+		repeated = np.all(loop == np.roll(loop, 1, axis=0), axis=1)
+		loop = loop[~repeated]
+		if len(loop) >= 3 and abs(polygon_area(loop)) > 1e-9:
+			loops.append(loop)
+	return loops
+
+def orient_triangles(uvs, triangles):
+	# Flips triangles to run counter-clockwise in UV space, so the faces point the same way as the layer's plane
+	uvs = np.asarray(uvs, dtype=np.float64)
+	triangles = np.array(triangles, dtype=np.int64).reshape(-1, 3)
+	a, b, c = uvs[triangles[:, 0]], uvs[triangles[:, 1]], uvs[triangles[:, 2]]
+	clockwise = ((b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])) < 0.0
+	triangles[clockwise] = triangles[clockwise][:, ::-1]
+	return triangles
+
+#--------------------------------------------------------------
+# Alpha Analysis
+#--------------------------------------------------------------
+
+def alpha_histogram(alpha):
+	# 256 bin histogram of an alpha matrix quantised to 8 bits
+	levels = np.empty(alpha.shape, dtype=np.float32)
+	np.multiply(alpha, 255.0, out=levels)
+	np.add(levels, 0.5, out=levels)
+	np.clip(levels, 0.0, 255.0, out=levels)
+	return np.bincount(levels.astype(np.uint8).ravel(), minlength=256)
+
+def classify_alpha(alpha, tolerance=1):
+	# 'OPAQUE' when every value is 1, 'BINARY' when values are only 0 or 1, 'SOFT' otherwise.
+	# tolerance is in 8 bit levels, so compression noise near 0 and 1 does not count as soft.
+	histogram = alpha_histogram(alpha)
+	if histogram[:255 - tolerance].sum() == 0:
+		return 'OPAQUE'
+	if histogram[tolerance + 1:255 - tolerance].sum() == 0:
+		return 'BINARY'
+	return 'SOFT'
+
+#--------------------------------------------------------------
+# Grading
+#--------------------------------------------------------------
+
+def srgb_to_linear(values):
+	# Piecewise sRGB transfer function, what Blender applies to sRGB textures before shading
+	values = np.asarray(values, dtype=np.float32)
+	return np.where(values <= 0.04045, values / 12.92, ((np.maximum(values, 0.04045) + 0.055) / 1.055) ** 2.4).astype(np.float32)
+
+def linear_to_srgb(values):
+	# Inverse of srgb_to_linear, for showing scene linear values the way a display would
+	values = np.maximum(np.asarray(values, dtype=np.float32), 0.0)
+	return np.where(values <= 0.0031308, values * 12.92, 1.055 * values ** (1.0 / 2.4) - 0.055).astype(np.float32)
+
+def apply_curve_luts(rgb, luts, fac=1.0, slopes=None):
+	# Per-channel 1D LUTs sampled evenly over [0, 1], linearly interpolated with a direct index lookup.
+	# slopes is (3, 2), each channel's slope below 0 and above 1: inputs outside the range continue along them
+	# like the extrapolated ends of a Curves node, so float values above 1 are not clipped. Without slopes they are clamped.
+	last = luts.shape[1] - 1
+	graded = np.empty_like(rgb)
+	for channel in range(3):
+		values = rgb[..., channel]
+		position = np.clip(values, 0.0, 1.0) * last
+		index = np.minimum(position.astype(np.int32), last - 1)
+		lut = luts[channel]
+		graded[..., channel] = lut[index] + (position - index) * np.diff(lut)[index]
+		if slopes is not None:
+			graded[..., channel] += np.minimum(values, 0.0) * slopes[channel][0] + np.maximum(values - 1.0, 0.0) * slopes[channel][1]
+	if fac != 1.0:
+		graded = rgb + (graded - rgb) * fac
+	return graded
+
+def rgb_to_hsv(rgb):
+	r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+	maximum = np.maximum(np.maximum(r, g), b)
+	delta = maximum - np.minimum(np.minimum(r, g), b)
+	hsv = np.zeros_like(rgb)
+	hsv[..., 2] = maximum
+	np.divide(delta, maximum, out=hsv[..., 1], where=maximum > 0.0)
+	inverse = np.zeros_like(delta)
+	np.divide(1.0, delta, out=inverse, where=delta > 0.0)
+	hue = np.where(maximum == r, (g - b) * inverse, np.where(maximum == g, (b - r) * inverse + 2.0, (r - g) * inverse + 4.0))
+	hsv[..., 0] = (hue * (1.0 / 6.0)) % 1.0
+	return hsv
+
+def hsv_to_rgb(hsv):
+	# Branch-free form, each channel is v - v * s * clamp(min(k, 4 - k)) with k offset per channel
+	sector = (hsv[..., 0] % 1.0) * 6.0
+	value = hsv[..., 2]
+	chroma = value * hsv[..., 1]
+	rgb = np.empty_like(hsv)
+	for channel, offset in enumerate((5.0, 3.0, 1.0)):
+		k = (sector + offset) % 6.0
+		rgb[..., channel] = value - chroma * np.clip(np.minimum(k, 4.0 - k), 0.0, 1.0)
+	return rgb
+
+def apply_hsv(rgb, hue=0.5, saturation=1.0, value=1.0, fac=1.0):
+	# Matches the Hue/Saturation/Value node: hue 0.5 is neutral, saturation is clamped, value scales
+	hsv = rgb_to_hsv(rgb)
+	hsv[..., 0] += hue + 0.5
+	np.clip(hsv[..., 1] * saturation, 0.0, 1.0, out=hsv[..., 1])
+	hsv[..., 2] *= value
+	graded = np.maximum(hsv_to_rgb(hsv), 0.0)
+	if fac != 1.0:
+		graded = rgb + (graded - rgb) * fac
+	return graded
+
+def bake_grade(pixels, curve_luts=None, curve_fac=1.0, hsv=None, curve_slopes=None, tile_rows=256, workers=None):
+	# Applies curves then HSV (the node order) to the RGB of a (height, width, 4) matrix in row strips on a thread pool.
+	# hsv is (hue, saturation, value, fac) or None, curve_slopes as in apply_curve_luts, alpha is copied through untouched.
+	height = pixels.shape[0]
+	result = np.empty_like(pixels, dtype=np.float32)
+	result[..., 3] = pixels[..., 3]
+
+	def _grade_strip(y):
+		rgb = pixels[y:y + tile_rows, :, :3].astype(np.float32)
+		if curve_luts is not None:
+			rgb = apply_curve_luts(rgb, curve_luts, curve_fac, curve_slopes)
+		if hsv is not None:
+			rgb = apply_hsv(rgb, *hsv)
+		result[y:y + tile_rows, :, :3] = rgb
+
+	with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+		list(executor.map(_grade_strip, range(0, height, tile_rows)))
+	return result
+
+#--------------------------------------------------------------
+# Compositing
+#--------------------------------------------------------------
+
+UNIT_SQUARE = np.array(((0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0)))
+
+def premultiply(pixels):
+	result = pixels.astype(np.float32)
+	result[..., :3] *= result[..., 3:4]
+	return result
+
+def sample_bilinear(pixels, x, y):
+	# Bilinear lookup at continuous texel coordinates (texel centres at integers), clamped to the edges.
+	# Gathers go through flat indices into a (height * width, channels) view, much cheaper than 2-D fancy indexing.
+	height, width = pixels.shape[:2]
+	flat = pixels.reshape(height * width, -1)
+	x = np.clip(x, 0.0, width - 1)
+	y = np.clip(y, 0.0, height - 1)
+	x0 = x.astype(np.int64)
+	y0 = y.astype(np.int64)
+	x_step = (x0 < width - 1).astype(np.int64)
+	y_step = np.where(y0 < height - 1, width, 0)
+	fx = (x - x0).astype(np.float32)[:, np.newaxis]
+	fy = (y - y0).astype(np.float32)[:, np.newaxis]
+	index = y0 * width + x0
+	bottom_left = np.take(flat, index, axis=0)
+	bottom = bottom_left + (np.take(flat, index + x_step, axis=0) - bottom_left) * fx
+	index += y_step
+	top_left = np.take(flat, index, axis=0)
+	top = top_left + (np.take(flat, index + x_step, axis=0) - top_left) * fx
+	return bottom + (top - bottom) * fy
+
+def screen_bounds(uv_to_screen, width, height):
+	# Pixel box (exclusive max) covered by the unit UV square on a width x height canvas, None if off screen or behind
+	corners, w = apply_homography(uv_to_screen, UNIT_SQUARE)
+	if np.any(w <= 0.0):
+		return None
+	x_min = max(int(np.floor(corners[:, 0].min())), 0)
+	y_min = max(int(np.floor(corners[:, 1].min())), 0)
+	x_max = min(int(np.ceil(corners[:, 0].max())), width)
+	y_max = min(int(np.ceil(corners[:, 1].max())), height)
+	if x_min >= x_max or y_min >= y_max:
+		return None
+	return x_min, y_min, x_max, y_max
+
+def warp_layer(layer, uv_to_screen, width, height, tile_rows=128, workers=None):
+	# Inverse maps every canvas pixel centre inside the layer's screen box back to UV and samples the premultiplied layer.
+	# Returns (bounds, warped) where warped covers only the box, or None when the layer is not on the canvas.
+	bounds = screen_bounds(uv_to_screen, width, height)
+	if bounds is None:
+		return None
+	x_min, y_min, x_max, y_max = bounds
+	layer_height, layer_width = layer.shape[:2]
+	screen_to_uv = np.linalg.inv(uv_to_screen)
+	warped = np.zeros((y_max - y_min, x_max - x_min, layer.shape[2]), dtype=np.float32)
+	columns = np.arange(x_min, x_max, dtype=np.float64) + 0.5
+
+	def _warp_strip(y):
+		# The homography is evaluated separably: per-column and per-row terms are broadcast, not multiplied out per pixel
+		rows = np.arange(y, min(y + tile_rows, y_max), dtype=np.float64)[:, np.newaxis] + 0.5
+		w = screen_to_uv[2, 0] * columns + screen_to_uv[2, 1] * rows + screen_to_uv[2, 2]
+		safe_w = np.where(np.abs(w) > 1e-12, w, 1e-12)
+		u = (screen_to_uv[0, 0] * columns + screen_to_uv[0, 1] * rows + screen_to_uv[0, 2]) / safe_w
+		v = (screen_to_uv[1, 0] * columns + screen_to_uv[1, 1] * rows + screen_to_uv[1, 2]) / safe_w
+		inside = (w > 0.0) & (u >= 0.0) & (u < 1.0) & (v >= 0.0) & (v < 1.0)
+		if not inside.any():
+			return
+		samples = sample_bilinear(layer, u[inside] * layer_width - 0.5, v[inside] * layer_height - 0.5)
+		warped[y - y_min:y - y_min + len(rows)][inside] = samples
+
+	with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+		list(executor.map(_warp_strip, range(y_min, y_max, tile_rows)))
+	return bounds, warped
+
+def composite_over(canvas, bounds, warped):
+	# Premultiplied over: warped goes on top of the canvas inside bounds
+	x_min, y_min, x_max, y_max = bounds
+	target = canvas[y_min:y_max, x_min:x_max]
+	target *= 1.0 - warped[:, :, 3:4]
+	target += warped
+
+def flatten_layers(width, height, layers, tile_rows=128, workers=None):
+	# Composites (premultiplied layer, uv_to_screen) pairs back to front into a premultiplied canvas
+	canvas = np.zeros((height, width, 4), dtype=np.float32)
+	for layer, uv_to_screen in layers:
+		result = warp_layer(layer, uv_to_screen, width, height, tile_rows, workers)
+		if result is not None:
+			composite_over(canvas, *result)
+	return canvas
+
+#--------------------------------------------------------------
+# Scopes
+#--------------------------------------------------------------
+
+SCOPE_BACKGROUND = (0.1, 0.1, 0.1, 1.0)
+
+def histogram(pixels, bins=256):
+	# (4, bins) counts of R, G, B and luma over [0, 1], values outside are clamped into the end bins
+	rgb = np.clip(pixels[..., :3].reshape(-1, 3), 0.0, 1.0)
+	values = np.concatenate((rgb, (rgb @ np.array((0.2126, 0.7152, 0.0722), dtype=np.float32))[:, np.newaxis]), axis=1)
+	indices = np.minimum((values * bins).astype(np.int64), bins - 1) + np.arange(4) * bins
+	return np.bincount(indices.ravel(), minlength=4 * bins).reshape(4, bins)
+
+def waveform(pixels, columns=256, bins=128):
+	# (bins, columns) counts of luma per image column, the waveform monitor layout
+	height, width = pixels.shape[:2]
+	luma = np.clip(luminance(pixels), 0.0, 1.0)
+	column = (np.arange(width) * columns // width)[np.newaxis, :].repeat(height, axis=0)
+	level = np.minimum((luma * bins).astype(np.int64), bins - 1)
+	return np.bincount((level * columns + column).ravel(), minlength=bins * columns).reshape(bins, columns)
+
+def draw_histogram(counts, height=128):
+	# RGB bars drawn additively over a dark background with luma as a grey outline, square root scaled
+	bins = counts.shape[1]
+	image = np.empty((height, bins, 4), dtype=np.float32)
+	image[:] = SCOPE_BACKGROUND
+	scaled = np.sqrt(counts / max(counts[:3, 1:-1].max(), 1))
+	rows = np.arange(height)[:, np.newaxis]
+	for channel in range(3):
+		image[:, :, channel] += (rows < scaled[channel] * height) * 0.6
+	outline = np.abs(rows - np.minimum(scaled[3] * height, height - 1)) < 1.0
+	image[outline, :3] = 0.9
+	np.clip(image, 0.0, 1.0, out=image)
+	return image
+
+def draw_waveform(counts):
+	# Log scaled density of a waveform, one row per luma bin
+	density = np.log1p(counts) / max(np.log1p(counts.max()), 1e-6)
+	image = np.empty(counts.shape + (4,), dtype=np.float32)
+	image[:] = SCOPE_BACKGROUND
+	image[:, :, :3] += density[:, :, np.newaxis] * np.array((0.5, 0.9, 0.5), dtype=np.float32)
+	np.clip(image, 0.0, 1.0, out=image)
+	return image
+
+#--------------------------------------------------------------
+# Texture Projection
+#--------------------------------------------------------------
+
+def project_homogeneous(matrix, points, width, height):
+	# (N, 3) world points through a 4x4 world->clip matrix into homogeneous source texel coordinates (x * w, y * w, w).
+	# Unlike screen positions these interpolate linearly across a triangle, dividing afterwards keeps perspective exact.
+	points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+	matrix = np.asarray(matrix, dtype=np.float64)
+	clip = points @ matrix[:, :3].T + matrix[:, 3]
+	homogeneous = np.empty((len(points), 3), dtype=np.float64)
+	homogeneous[:, 0] = (clip[:, 0] + clip[:, 3]) * 0.5 * width - 0.5 * clip[:, 3]
+	homogeneous[:, 1] = (clip[:, 1] + clip[:, 3]) * 0.5 * height - 0.5 * clip[:, 3]
+	homogeneous[:, 2] = clip[:, 3]
+	return homogeneous
+
+def _ragged_arange(counts):
+	# Concatenation of arange(count) for every count, without a Python loop
+	total = int(counts.sum())
+	starts = np.cumsum(counts) - counts
+	return np.arange(total, dtype=np.int64) - np.repeat(starts, counts)
+
+def _triangle_spans(texel_positions, width, height):
+	# Exact texel runs covered by each triangle, one per texel row, as (triangle, row, first column, column count).
+	# Edges are half open (a texel centre on a shared edge belongs to one triangle only), so neighbours neither overlap nor leave gaps.
+	lower = np.ceil(texel_positions[:, :, 1].min(axis=1) - 0.5).astype(np.int64)
+	upper = np.ceil(texel_positions[:, :, 1].max(axis=1) - 0.5).astype(np.int64) - 1
+	y_min = np.maximum(lower, 0)
+	y_count = np.maximum(np.minimum(upper, height - 1) - y_min + 1, 0)
+	triangle = np.repeat(np.arange(len(texel_positions)), y_count)
+	row = y_min[triangle] + _ragged_arange(y_count)
+	centre = row + 0.5
+
+	x_low = np.full(len(triangle), np.inf)
+	x_high = np.full(len(triangle), -np.inf)
+	for a, b in [(0, 1), (1, 2), (2, 0)]:
+		# Shared edges are walked in the same direction from both sides, so both get bit identical crossings
+		start = texel_positions[triangle, a]
+		end = texel_positions[triangle, b]
+		flip = (start[:, 1] > end[:, 1])[:, np.newaxis]
+		start, end = np.where(flip, end, start), np.where(flip, start, end)
+		crosses = (start[:, 1] <= centre) != (end[:, 1] <= centre)
+		height_difference = np.where(crosses, end[:, 1] - start[:, 1], 1.0)
+		x = start[:, 0] + (centre - start[:, 1]) * (end[:, 0] - start[:, 0]) / height_difference
+		x_low = np.where(crosses, np.minimum(x_low, x), x_low)
+		x_high = np.where(crosses, np.maximum(x_high, x), x_high)
+	valid = np.isfinite(x_low)
+	first = np.maximum(np.ceil(np.where(valid, x_low, 0.0) - 0.5).astype(np.int64), 0)
+	last = np.minimum(np.ceil(np.where(valid, x_high, 0.0) - 0.5).astype(np.int64) - 1, width - 1)
+	count = np.where(valid, np.maximum(last - first + 1, 0), 0)
+	keep = count > 0
+	return triangle[keep], row[keep], first[keep], count[keep]
+
+def _affine_spans(positions, values, width, height):
+	# Rasterises (T, 3, 2) texel space triangles into row spans and fits each triangle's (T, 3, K) vertex values affinely,
+	# so a value anywhere on a span is start + column offset * step. Degenerate triangles are dropped.
+	# Returns (first flat texel, column count, start values, steps, source triangle) per span.
+	corners = np.concatenate((positions, np.ones(positions.shape[:2] + (1,))), axis=2)
+	keep = np.abs(np.linalg.det(corners)) > 1e-9 if len(corners) else np.zeros(0, dtype=bool)
+	coefficients = np.linalg.solve(corners[keep], values[keep]) if keep.any() else np.zeros((0, 3, values.shape[2]))
+	triangle, row, first_column, column_count = _triangle_spans(positions[keep], width, height)
+	span_start = coefficients[triangle, 0] * (first_column + 0.5)[:, np.newaxis] + coefficients[triangle, 1] * (row + 0.5)[:, np.newaxis] + coefficients[triangle, 2]
+	return row * width + first_column, column_count, span_start, coefficients[triangle, 0], np.flatnonzero(keep)[triangle]
+
+def _span_chunks(column_count, chunk_texels):
+	# Splits spans on span boundaries so a chunk holds about chunk_texels texels, big triangles span many chunks
+	if len(column_count) == 0:
+		return []
+	ends = np.cumsum(column_count)
+	boundaries = np.searchsorted(ends, np.arange(chunk_texels, int(ends[-1]), chunk_texels), side='left') + 1
+	return [(start, end) for start, end in zip(np.concatenate(([0], boundaries)), np.concatenate((boundaries, [len(column_count)]))) if start < end]
+
+def _expand_spans(span_index, column_count, span_start, span_step, start, end):
+	# Flat texel indices and per texel values of spans[start:end]
+	counts = column_count[start:end]
+	offset = _ragged_arange(counts)
+	index = np.repeat(span_index[start:end], counts) + offset
+	values = [np.repeat(span_start[start:end, i], counts) + offset * np.repeat(span_step[start:end, i], counts) for i in range(span_start.shape[1])]
+	return index, values
+
+def rasterise_depth(triangle_homogeneous, triangle_depth, width, height, chunk_texels=1 << 20):
+	# Z-buffer over the source frame: nearest view depth of (T, 3) vertex depths at every source texel, inf where empty.
+	# depth / w and 1 / w are affine in screen space for perspective and orthographic cameras alike.
+	# Triangles crossing the camera plane are skipped, they cannot be projected without clipping.
+	homogeneous = np.asarray(triangle_homogeneous, dtype=np.float64).reshape(-1, 3, 3)
+	depth = np.asarray(triangle_depth, dtype=np.float64).reshape(-1, 3)
+	buffer = np.full(width * height, np.inf, dtype=np.float64)
+	in_front = (homogeneous[:, :, 2] > 1e-9).all(axis=1)
+	homogeneous = homogeneous[in_front]
+	depth = depth[in_front]
+	inverse_w = 1.0 / homogeneous[:, :, 2]
+	positions = homogeneous[:, :, :2] * inverse_w[:, :, np.newaxis] + 0.5
+	values = np.stack((depth * inverse_w, inverse_w), axis=2)
+	span_index, column_count, span_start, span_step, triangle = _affine_spans(positions, values, width, height)
+	for start, end in _span_chunks(column_count, chunk_texels):
+		index, (depth_over_w, inverse_w) = _expand_spans(span_index, column_count, span_start, span_step, start, end)
+		np.minimum.at(buffer, index, depth_over_w / inverse_w)
+	return buffer.reshape(height, width)
+
+def _depth_test(depth_buffer, x, y, depth, bias):
+	# Passes texels no further than the farthest of the 2 x 2 buffer texels around them, which tolerates the
+	# depth slope across one texel at grazing angles without letting occluded surfaces through.
+	height, width = depth_buffer.shape
+	x0 = np.clip(np.floor(x).astype(np.int64), 0, width - 1)
+	y0 = np.clip(np.floor(y).astype(np.int64), 0, height - 1)
+	x1 = np.minimum(x0 + 1, width - 1)
+	y1 = np.minimum(y0 + 1, height - 1)
+	nearest = np.maximum(np.maximum(depth_buffer[y0, x0], depth_buffer[y0, x1]), np.maximum(depth_buffer[y1, x0], depth_buffer[y1, x1]))
+	return depth <= nearest * (1.0 + bias) + 1e-6
+
+def _projection_spans(triangle_uvs, triangle_homogeneous, width, height, triangle_depth=None, triangle_weights=None):
+	# Spans of one camera's projection: homogeneous source coordinates (and depth) per texel, plus each span's weight
+	positions = np.asarray(triangle_uvs, dtype=np.float64).reshape(-1, 3, 2) * (width, height)
+	values = np.asarray(triangle_homogeneous, dtype=np.float64).reshape(-1, 3, 3)
+	if triangle_depth is not None:
+		values = np.concatenate((values, np.asarray(triangle_depth, dtype=np.float64).reshape(-1, 3, 1)), axis=2)
+	weights = np.ones(len(positions), dtype=np.float32) if triangle_weights is None else np.asarray(triangle_weights, dtype=np.float32)
+	span_index, column_count, span_start, span_step, triangle = _affine_spans(positions, values, width, height)
+	return span_index, column_count, span_start, span_step, weights[triangle]
+
+def _locate_spans(spans, start, end, source_width, source_height, depth_buffer, depth_bias):
+	# Texels of spans[start:end]: all flat indices, then the seen ones with their source coordinates and weights
+	span_index, column_count, span_start, span_step, span_weight = spans
+	index, h = _expand_spans(span_index, column_count, span_start, span_step, start, end)
+	w = h[2]
+	safe_w = np.where(np.abs(w) > 1e-12, w, 1e-12)
+	source_x = h[0] / safe_w
+	source_y = h[1] / safe_w
+	weight = np.repeat(span_weight[start:end], column_count[start:end])
+	seen = (w > 0.0) & (weight > 0.0) & (source_x >= -0.5) & (source_x <= source_width - 0.5) & (source_y >= -0.5) & (source_y <= source_height - 0.5)
+	if depth_buffer is not None:
+		seen[seen] = _depth_test(depth_buffer, source_x[seen], source_y[seen], h[3][seen], depth_bias)
+	return index, index[seen], source_x[seen], source_y[seen], weight[seen]
+
+def _sample_spans(spans, start, end, source, depth_buffer, depth_bias):
+	# Texels of spans[start:end]: all flat indices, then the seen ones with their source samples and weights
+	index, seen_index, source_x, source_y, weight = _locate_spans(spans, start, end, source.shape[1], source.shape[0], depth_buffer, depth_bias)
+	return index, seen_index, sample_bilinear(source, source_x, source_y), weight
+
+def project_triangles(source, triangle_uvs, triangle_homogeneous, width, height, triangle_depth=None, depth_buffer=None, triangle_weights=None, depth_bias=1e-3, chunk_texels=1 << 20, workers=None):
+	# Rasterises (T, 3, 2) UV triangles into a width x height texture, sampling source at the barycentric
+	# interpolation of each triangle's (T, 3, 3) homogeneous source coordinates.
+	# With a depth_buffer from rasterise_depth and (T, 3) view depths, texels hidden behind other geometry are skipped.
+	# triangle_weights (T,), for example facing ratios, scale the visibility, a weight of 0 skips the triangle.
+	# Returns (pixels, covered, visibility): covered texels lie inside a triangle, visibility is above 0 where a texel
+	# was seen by the camera inside the source frame. Texels that were not seen are left at zero.
+	pixels = np.zeros((height, width, source.shape[2]), dtype=np.float32)
+	covered = np.zeros((height, width), dtype=bool)
+	visibility = np.zeros((height, width), dtype=np.float32)
+	spans = _projection_spans(triangle_uvs, triangle_homogeneous, width, height, triangle_depth if depth_buffer is not None else None, triangle_weights)
+	flat_pixels = pixels.reshape(height * width, -1)
+	flat_covered = covered.reshape(-1)
+	flat_visibility = visibility.reshape(-1)
+
+	def _rasterise(chunk):
+		index, seen_index, samples, weight = _sample_spans(spans, chunk[0], chunk[1], source, depth_buffer, depth_bias)
+		flat_covered[index] = True
+		flat_pixels[seen_index] = samples
+		flat_visibility[seen_index] = weight
+
+	with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+		list(executor.map(_rasterise, _span_chunks(spans[1], chunk_texels)))
+	return pixels, covered, visibility
+
+def blend_projections(projections, width, height, sharpness=4.0, depth_bias=1e-3, tile_rows=64, workers=None):
+	# Projects several cameras into one texture. projections holds one tuple per camera:
+	# (source, triangle_uvs, triangle_homogeneous, triangle_depth, depth_buffer, triangle_weights), see project_triangles.
+	# Each texel is the average of every camera that saw it, weighted by visibility ** sharpness so the camera
+	# facing a surface most squarely dominates. Work runs on a thread pool over bands of tile_rows texture rows,
+	# every band runs all cameras so bands never write to the same texels.
+	# Returns (pixels, covered, visibility) like project_triangles, visibility being the best camera's weight.
+	channels = projections[0][0].shape[2] if projections else 4
+	total = np.zeros((height * width, channels), dtype=np.float32)
+	total_weight = np.zeros(height * width, dtype=np.float32)
+	covered = np.zeros(height * width, dtype=bool)
+	visibility = np.zeros(height * width, dtype=np.float32)
+
+	# Spans sorted by row, so each band is one contiguous slice per camera
+	cameras = []
+	for source, triangle_uvs, triangle_homogeneous, triangle_depth, depth_buffer, triangle_weights in projections:
+		spans = _projection_spans(triangle_uvs, triangle_homogeneous, width, height, triangle_depth if depth_buffer is not None else None, triangle_weights)
+		order = np.argsort(spans[0] // width, kind='stable')
+		spans = tuple(array[order] for array in spans)
+		cameras.append((source, depth_buffer, spans, spans[0] // width))
+
+	def _blend_band(first_row):
+		for source, depth_buffer, spans, rows in cameras:
+			start, end = np.searchsorted(rows, (first_row, first_row + tile_rows))
+			if start >= end:
+				continue
+			index, seen_index, samples, weight = _sample_spans(spans, start, end, source, depth_buffer, depth_bias)
+			covered[index] = True
+			visibility[seen_index] = np.maximum(visibility[seen_index], weight)
+			weight = weight ** sharpness
+			total[seen_index] += samples * weight[:, np.newaxis]
+			total_weight[seen_index] += weight
+
+	with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+		list(executor.map(_blend_band, range(0, height, tile_rows)))
+	seen = total_weight > 0.0
+	total[seen] /= total_weight[seen][:, np.newaxis]
+	return total.reshape(height, width, channels), covered.reshape(height, width), visibility.reshape(height, width)
+
+def to_rgba(pixels):
+	# Grey, RGB or RGBA matrices as RGBA, missing alpha is opaque
+	channels = pixels.shape[2]
+	if channels == 4:
+		return pixels
+	rgba = np.ones(pixels.shape[:2] + (4,), dtype=np.float32)
+	rgba[:, :, :3] = pixels[:, :, :3] if channels >= 3 else pixels[:, :, :1]
+	return rgba
+
+def extend_edges(pixels, filled, margin):
+	# Grows filled regions outwards by margin texels, each new texel takes the mean of its filled 4-neighbours.
+	# Keeps bilinear filtering and mip maps from pulling in the empty background along UV seams.
+	pixels = pixels.copy()
+	filled = filled.copy()
+	for i in range(margin):
+		total = np.zeros(pixels.shape, dtype=np.float32)
+		count = np.zeros(filled.shape, dtype=np.float32)
+		for axis, step in [(0, 1), (0, -1), (1, 1), (1, -1)]:
+			source = [slice(None), slice(None)]
+			target = [slice(None), slice(None)]
+			source[axis] = slice(None, -1) if step == 1 else slice(1, None)
+			target[axis] = slice(1, None) if step == 1 else slice(None, -1)
+			neighbour = filled[tuple(source)]
+			total[tuple(target)] += pixels[tuple(source)] * neighbour[..., np.newaxis]
+			count[tuple(target)] += neighbour
+		grow = ~filled & (count > 0)
+		if not grow.any():
+			break
+		pixels[grow] = total[grow] / count[grow][:, np.newaxis]
+		filled |= grow
+	return pixels, filled
+
+def projection_texel_count(triangle_uvs, triangle_homogeneous, source_width, source_height, coverage=0.9):
+	# Texels a unit UV square needs so that coverage of the object's on screen area gets at least one texel per
+	# source pixel. Each triangle needs (screen area / UV area) texels per unit of UV, the result is the
+	# screen area weighted percentile of that density. Triangles behind the camera are ignored.
+	uvs = np.asarray(triangle_uvs, dtype=np.float64).reshape(-1, 3, 2)
+	homogeneous = np.asarray(triangle_homogeneous, dtype=np.float64).reshape(-1, 3, 3)
+	in_front = (homogeneous[:, :, 2] > 1e-9).all(axis=1)
+	screen = homogeneous[in_front, :, :2] / homogeneous[in_front, :, 2:3]
+	screen[:, :, 0] = np.clip(screen[:, :, 0], -0.5, source_width - 0.5)
+	screen[:, :, 1] = np.clip(screen[:, :, 1], -0.5, source_height - 0.5)
+	uvs = uvs[in_front]
+
+	def _area(points):
+		edge_1 = points[:, 1] - points[:, 0]
+		edge_2 = points[:, 2] - points[:, 0]
+		return 0.5 * np.abs(edge_1[:, 0] * edge_2[:, 1] - edge_1[:, 1] * edge_2[:, 0])
+
+	screen_area = _area(screen)
+	uv_area = _area(uvs)
+	keep = (uv_area > 1e-12) & (screen_area > 0.0)
+	if not keep.any():
+		return 0.0
+	density = screen_area[keep] / uv_area[keep]
+	order = np.argsort(density)
+	cumulative = np.cumsum(screen_area[keep][order])
+	return float(density[order][min(np.searchsorted(cumulative, coverage * cumulative[-1]), len(order) - 1)])
+
+def fit_texture_size(texels, aspect, bytes_per_texel, max_bytes, max_size=16384):
+	# Width & height holding texels at the given aspect, scaled down to fit max_bytes and max_size texels per side.
+	# Returns (width, height, capped), capped is True when the budget or size limit cut the resolution.
+	width = np.sqrt(max(texels, 1.0) * aspect)
+	height = width / aspect
+	scale = min(1.0, np.sqrt(max_bytes / max(width * height * bytes_per_texel, 1e-9)), max_size / max(width, height))
+	return max(int(round(width * scale)), 1), max(int(round(height * scale)), 1), bool(scale < 1.0)
+
+#--------------------------------------------------------------
+# Incremental Projection
+#--------------------------------------------------------------
+
+def tile_checksums(pixels, tile_size=64, workers=None):
+	# One 64 bit checksum per tile_size square tile of a (height, width, channels) matrix, shaped (tiles high, tiles wide).
+	# Sums the raw float bits times a fixed odd multiplier per position in the tile (wrapping), so a changed value or two
+	# values swapping places changes the tile's checksum. Tiles on the right & top edges are zero padded.
+	height, width, channels = pixels.shape
+	tiles_y = -(-height // tile_size)
+	tiles_x = -(-width // tile_size)
+	weights = np.random.default_rng(0x6d617474).integers(1, 1 << 62, size=(tile_size, 1, tile_size, channels), dtype=np.uint64) | np.uint64(1)
+	checksums = np.zeros((tiles_y, tiles_x), dtype=np.uint64)
+
+	def _checksum_band(tile_y):
+		rows = np.ascontiguousarray(pixels[tile_y * tile_size:(tile_y + 1) * tile_size], dtype=np.float32).view(np.uint32)
+		band = np.zeros((tile_size, tiles_x * tile_size, channels), dtype=np.uint64)
+		band[:len(rows), :width] = rows
+		checksums[tile_y] = (band.reshape(tile_size, tiles_x, tile_size, channels) * weights).sum(axis=(0, 2, 3))
+
+	with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+		list(executor.map(_checksum_band, range(tiles_y)))
+	return checksums
+
+def _footprint_changed(changed_tiles, tile_size, width, height, x, y):
+	# True where the 2 x 2 source texels a bilinear sample at (x, y) reads touch a changed tile
+	x0 = np.clip(np.floor(x).astype(np.int64), 0, width - 1)
+	y0 = np.clip(np.floor(y).astype(np.int64), 0, height - 1)
+	x1 = np.minimum(x0 + 1, width - 1) // tile_size
+	y1 = np.minimum(y0 + 1, height - 1) // tile_size
+	x0 //= tile_size
+	y0 //= tile_size
+	return changed_tiles[y0, x0] | changed_tiles[y0, x1] | changed_tiles[y1, x0] | changed_tiles[y1, x1]
+
+def reproject_triangles(pixels, visible, source, triangle_uvs, triangle_homogeneous, changed_tiles, tile_size=64, chunk_texels=1 << 20, workers=None):
+	# Updates an earlier project_triangles result in place after the source changed but the camera & mesh did not.
+	# Only texels that were visible before and whose bilinear footprint touches one of the (tiles high, tiles wide)
+	# changed_tiles are sampled again, occlusion is inherited from visible. Triangles whose source box misses every
+	# changed tile are not rasterised at all. Returns the (height, width) bool mask of updated texels.
+	height, width = visible.shape
+	source_height, source_width = source.shape[:2]
+	updated = np.zeros((height, width), dtype=bool)
+	if not changed_tiles.any():
+		return updated
+	uvs = np.asarray(triangle_uvs, dtype=np.float64).reshape(-1, 3, 2)
+	homogeneous = np.asarray(triangle_homogeneous, dtype=np.float64).reshape(-1, 3, 3)
+
+	# Changed tiles in each triangle's source box through a summed area table, triangles crossing the camera plane are kept
+	in_front = (homogeneous[:, :, 2] > 1e-9).all(axis=1)
+	screen = homogeneous[:, :, :2] / np.where(in_front[:, np.newaxis], homogeneous[:, :, 2], 1.0)[:, :, np.newaxis]
+	x_min = np.clip(np.floor(screen[:, :, 0].min(axis=1)), 0, source_width - 1).astype(np.int64) // tile_size
+	y_min = np.clip(np.floor(screen[:, :, 1].min(axis=1)), 0, source_height - 1).astype(np.int64) // tile_size
+	x_max = np.clip(np.floor(screen[:, :, 0].max(axis=1)) + 1, 0, source_width - 1).astype(np.int64) // tile_size
+	y_max = np.clip(np.floor(screen[:, :, 1].max(axis=1)) + 1, 0, source_height - 1).astype(np.int64) // tile_size
+	table = np.zeros((changed_tiles.shape[0] + 1, changed_tiles.shape[1] + 1), dtype=np.int64)
+	table[1:, 1:] = changed_tiles.cumsum(axis=0).cumsum(axis=1)
+	count = table[y_max + 1, x_max + 1] - table[y_min, x_max + 1] - table[y_max + 1, x_min] + table[y_min, x_min]
+	keep = ~in_front | (count > 0)
+
+	spans = _projection_spans(uvs[keep], homogeneous[keep], width, height)
+	flat_pixels = pixels.reshape(height * width, -1)
+	flat_visible = visible.reshape(-1)
+	flat_updated = updated.reshape(-1)
+
+	def _resample(chunk):
+		span_index, column_count, span_start, span_step = spans[:4]
+		index, h = _expand_spans(span_index, column_count, span_start, span_step, chunk[0], chunk[1])
+		seen = flat_visible[index] & (h[2] > 0.0)
+		index = index[seen]
+		source_x = h[0][seen] / h[2][seen]
+		source_y = h[1][seen] / h[2][seen]
+		changed = _footprint_changed(changed_tiles, tile_size, source_width, source_height, source_x, source_y)
+		index = index[changed]
+		flat_pixels[index] = sample_bilinear(source, source_x[changed], source_y[changed])
+		flat_updated[index] = True
+
+	with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+		list(executor.map(_resample, _span_chunks(spans[1], chunk_texels)))
+	return updated
+
+#--------------------------------------------------------------
+# Sequence Projection
+#--------------------------------------------------------------
+
+def projection_samples(triangle_uvs, triangle_homogeneous, width, height, source_width, source_height, triangle_depth=None, depth_buffer=None, triangle_weights=None, depth_bias=1e-3, chunk_texels=1 << 20, workers=None):
+	# Everything project_triangles works out before sampling, for reusing one camera's view over many source frames.
+	# Returns a dict with the (height, width) covered & visibility of project_triangles, and the flat 'index' of every
+	# seen texel with its 'x', 'y' source coordinates (float32, a quarter of a millitexel off at 16K at worst).
+	covered = np.zeros(width * height, dtype=bool)
+	visibility = np.zeros(width * height, dtype=np.float32)
+	spans = _projection_spans(triangle_uvs, triangle_homogeneous, width, height, triangle_depth if depth_buffer is not None else None, triangle_weights)
+
+	def _locate(chunk):
+		index, seen_index, source_x, source_y, weight = _locate_spans(spans, chunk[0], chunk[1], source_width, source_height, depth_buffer, depth_bias)
+		covered[index] = True
+		visibility[seen_index] = weight
+		return seen_index, source_x.astype(np.float32), source_y.astype(np.float32)
+
+	with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+		chunks = list(executor.map(_locate, _span_chunks(spans[1], chunk_texels)))
+	samples = {'covered': covered.reshape(height, width), 'visibility': visibility.reshape(height, width)}
+	for i, key in enumerate(['index', 'x', 'y']):
+		samples[key] = np.concatenate([chunk[i] for chunk in chunks]) if chunks else np.zeros(0, dtype=np.int64 if i == 0 else np.float32)
+	return samples
+
+def sample_projection(source, samples, margin=0, chunk_texels=1 << 20):
+	# Projects one source frame through projection_samples, unseen texels stay at zero.
+	# A margin pads the covered texels outwards like extend_edges, so seams do not filter in black.
+	height, width = samples['covered'].shape
+	pixels = np.zeros((height * width, source.shape[2]), dtype=np.float32)
+	for start in range(0, len(samples['index']), chunk_texels):
+		end = start + chunk_texels
+		pixels[samples['index'][start:end]] = sample_bilinear(source, samples['x'][start:end], samples['y'][start:end])
+	pixels = pixels.reshape(height, width, -1)
+	if margin > 0:
+		pixels = extend_edges(pixels, samples['covered'], margin)[0]
+	return pixels
+
+_frame_worker = {}
+
+def _init_frame_worker(samples, margin):
+	# Process pool initializer, the samples are sent once per worker instead of once per frame
+	_frame_worker['samples'] = samples
+	_frame_worker['margin'] = margin
+
+def _project_frame(source):
+	return sample_projection(source, _frame_worker['samples'], _frame_worker['margin'])
+
+def project_frames(frames, samples, margin=0, workers=None, processes=False):
+	# Generator projecting an iterable of source frames through the same projection_samples, yielding textures in order.
+	# processes=True spreads frames over spawned processes instead of threads, for headless runs with many cores.
+	# At most two frames per worker are in flight, so long sequences are never held in memory at once.
+	workers = workers or os.cpu_count()
+	if processes:
+		executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=_init_frame_worker, initargs=(samples, margin))
+		task = _project_frame
+	else:
+		executor = ThreadPoolExecutor(max_workers=workers)
+		task = lambda source: sample_projection(source, samples, margin)
+	with executor:
+		pending = deque()
+		for source in frames:
+			pending.append(executor.submit(task, source))
+			if len(pending) >= workers * 2:
+				yield pending.popleft().result()
+		while pending:
+			yield pending.popleft().result()
+
+#--------------------------------------------------------------
+# Image Files
+#--------------------------------------------------------------
+
+# Encoders for saving image snapshots off the main thread, where Image.save() cannot be called.
+# zlib releases the GIL while compressing, so a thread pool encodes several images at once.
+
+def encode_png(pixels, level=6):
+	# 8 bit PNG of a (height, width, channels) matrix in 0-1: grey, grey & alpha, RGB or RGBA by channel count.
+	# Rows are flipped (PNG starts at the top) and Sub filtered, which keeps flat masks tiny.
+	height, width, channels = pixels.shape
+	data = np.round(np.clip(pixels[::-1], 0.0, 1.0) * 255.0).astype(np.uint8).reshape(height, width * channels)
+	rows = np.empty((height, width * channels + 1), dtype=np.uint8)
+	rows[:, 0] = 1
+	rows[:, 1:channels + 1] = data[:, :channels]
+	rows[:, channels + 1:] = data[:, channels:] - data[:, :-channels]
+
+	def _chunk(kind, body):
+		return struct.pack('>I', len(body)) + kind + body + struct.pack('>I', zlib.crc32(kind + body))
+
+	color_type = {1: 0, 2: 4, 3: 2, 4: 6}[channels]
+	header = struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0)
+	return b'\x89PNG\r\n\x1a\n' + _chunk(b'IHDR', header) + _chunk(b'IDAT', zlib.compress(rows.tobytes(), level)) + _chunk(b'IEND', b'')
+
+def encode_exr(pixels, level=6):
+	# Scanline OpenEXR of a (height, width, channels) matrix as 32 bit float, ZIP compressed in blocks of 16 rows.
+	# Channels are named R, G, B, A (Y for grey) and values are written unchanged, like Blender saves float buffers.
+	height, width, channels = pixels.shape
+	names = {1: ['Y'], 2: ['Y', 'A'], 3: ['R', 'G', 'B'], 4: ['R', 'G', 'B', 'A']}[channels]
+	order = sorted(range(channels), key=lambda i: names[i])
+	planar = np.ascontiguousarray(pixels[::-1][:, :, order].transpose(0, 2, 1), dtype='<f4')
+
+	def _attribute(name, kind, value):
+		return name.encode() + b'\0' + kind.encode() + b'\0' + struct.pack('<i', len(value)) + value
+
+	channel_list = b''.join(names[i].encode() + b'\0' + struct.pack('<iB3xii', 2, 0, 1, 1) for i in order) + b'\0'
+	window = struct.pack('<4i', 0, 0, width - 1, height - 1)
+	header = b''.join([
+		struct.pack('<ii', 20000630, 2),
+		_attribute('channels', 'chlist', channel_list),
+		_attribute('compression', 'compression', b'\x03'),
+		_attribute('dataWindow', 'box2i', window),
+		_attribute('displayWindow', 'box2i', window),
+		_attribute('lineOrder', 'lineOrder', b'\x00'),
+		_attribute('pixelAspectRatio', 'float', struct.pack('<f', 1.0)),
+		_attribute('screenWindowCenter', 'v2f', struct.pack('<ff', 0.0, 0.0)),
+		_attribute('screenWindowWidth', 'float', struct.pack('<f', 1.0)),
+		b'\0',
+	])
+
+	# ZIP blocks: bytes split into even & odd halves, then delta coded, stored raw when that is not smaller
+	chunks = []
+	for y in range(0, height, 16):
+		raw = planar[y:y + 16].tobytes()
+		data = np.frombuffer(raw, dtype=np.uint8)
+		interleaved = np.concatenate((data[0::2], data[1::2]))
+		predicted = interleaved.copy()
+		predicted[1:] = interleaved[1:] - interleaved[:-1] + np.uint8(128)
+		compressed = zlib.compress(predicted.tobytes(), level)
+		if len(compressed) >= len(raw):
+			compressed = raw
+		chunks.append(struct.pack('<ii', y, len(compressed)) + compressed)
+	offsets = np.cumsum([len(header) + 8 * len(chunks)] + [len(chunk) for chunk in chunks[:-1]]).astype('<u8')
+	return header + offsets.tobytes() + b''.join(chunks)
+
+def write_image_file(filepath, pixels, file_format, level=6):
+	# Encodes a matrix as 'PNG' or 'OPEN_EXR' and swaps it in for filepath only once fully written,
+	# so a failed or interrupted save never leaves a truncated file behind. Returns the bytes written.
+	data = encode_png(pixels, level) if file_format == 'PNG' else encode_exr(pixels, level)
+	directory = os.path.dirname(filepath)
+	if directory != '':
+		os.makedirs(directory, exist_ok=True)
+	temporary = filepath + '.tmp'
+	with open(temporary, 'wb') as file:
+		file.write(data)
+	os.replace(temporary, filepath)
+	return len(data)
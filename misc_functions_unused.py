@@ -712,8 +712,9 @@ class MATTEPAINTER_OT_clearUnused(bpy.types.Operator):
 
 class MATTEPAINTER_OT_bakeProjection(bpy.types.Operator):
 	# Bakes the Emit information from a texture into a new Image.
-	bl_idname = "mattepainter.clear_unused"
-	bl_label = "Purges unused Data Blocks."
+	# Implemented in MattePainter.py, kept here for reference only.
+	bl_idname = "mattepainter.bake_projection"
+	bl_label = "Bake Projection"
 	bl_description = "Bakes a Window-Based UV projection into a new Texture for 3D Projections."
 	bl_options = {"REGISTER", "UNDO"}
 
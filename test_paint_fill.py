@@ -22,7 +22,8 @@ import bpy_extras
 from mathutils import Vector
 from math import floor
 import time 
-import numpy as np 
+
+import mattepainter_pixels
 
 # Draw Functions
 import blf
@@ -87,51 +88,7 @@ class selectionMarquee2D(bpy.types.Operator):
 		return (x_mu, y_mu)	
 
 	def _out_of_bounds_check(self):
-		if self.pixel_coords_down[0] < 0 and self.pixel_coords_up[0] < 0:
-			return False
-		if self.pixel_coords_down[0] > self.image.size[0] and self.pixel_coords_up[0] > self.image.size[0]:
-			return False
-		if self.pixel_coords_down[1] < 0 and self.pixel_coords_up[1] < 0:
-			return False
-		if self.pixel_coords_down[1] > self.image.size[1] and self.pixel_coords_up[1] > self.image.size[1]:
-			return False
-		return True
-
-	def _orient_marquee(self, x1, y1, x2, y2, image):
-		# Orients the Marquee for each potential mouse position
-		# Also runs a boundary check
-		self.x_orient = 'left_to_right' if x1 < x2 else 'right_to_left'
-		self.y_orient = 'bottom_to_top' if y1 < y2 else 'top_to_bottom'	
-
-		if self.x_orient == 'left_to_right':
-			x1 = max(x1, 0)
-			x2 = min(x2, image.size[0] - 1)
-		else:
-			x1 = min(x1, image.size[0] - 1)
-			x2 = max(x2, 0)
-		if self.y_orient == 'bottom_to_top':
-			y1 = max(y1, 0)
-			y2 = min(y2, image.size[1] - 1)
-		else:
-			y1 = min(y1, image.size[1] - 1)
-			y2 = max(y2, 0)
-
-		if x1 > x2:
-			x1, x2 = x2, x1
-		if y1 > y2:
-			y1, y2 = y2, y1
-
-		return x1, y1, x2, y2
-
-	def _convert_pixel_buffer_to_matrix(self, buffer, width, height, channels):
-		# Converts a 1-D pixel buffer into an xy grid with n Colour channels
-		buffer = buffer.reshape(height, width, channels)
-		return buffer
-
-	def _convert_matrix_to_pixel_buffer(self, buffer):
-		# Converts back to 1-D pixel buffer
-		buffer = buffer.flatten()
-		return buffer
+		return mattepainter_pixels.marquee_in_bounds(self.pixel_coords_down, self.pixel_coords_up, self.image.size[0], self.image.size[1])
 
 	def _get_color(self, use_bg=False):
 		# Grabs active Paint Brush colour 
@@ -152,31 +109,8 @@ class selectionMarquee2D(bpy.types.Operator):
 		return image
 
 	def _fill_pixels(self, x1, y1, x2, y2, brush_color):
-		# Fills the marquee pixels and inserts them into the Image Matrix
-		
-		pixels_to_paint = np.ones(4 * self.image.size[0] * self.image.size[1], dtype=np.float32)
-
-		# Orient Marquee
-		x1, y1, x2, y2 = self._orient_marquee(x1, y1, x2, y2, self.image)
-
-		self.image.pixels.foreach_get(pixels_to_paint)	
-		
-		marquee_height = int(y2 - y1)
-		marquee_width = int(x2 - x1)
-
-		pixels_to_paint = self._convert_pixel_buffer_to_matrix(pixels_to_paint, self.image.size[0], self.image.size[1], 4)
-
-		marquee_fill = np.zeros(4 * marquee_width * marquee_height)
-		marquee_fill = self._convert_pixel_buffer_to_matrix(marquee_fill, marquee_width, marquee_height, 4)		
-
-		marquee_fill[:][:] = brush_color
-
-		pixels_to_paint[y1:y2, x1:x2, :] = marquee_fill	
-
-		pixels_to_paint = self._convert_matrix_to_pixel_buffer(pixels_to_paint)
-
-		self.image.pixels.foreach_set(pixels_to_paint)
-		self.image.update()
+		# Fills the marquee pixels via the pixel engine
+		mattepainter_pixels.fill_image(self.image, x1, y1, x2, y2, brush_color)
 
 	def _get_2d_mouse_coords(self, context, event):
 		# Calculates current pixel at mouseover point
@@ -19,13 +19,13 @@ bl_info = {
 
 import bpy
 import bpy_extras
-from bpy_extras import view3d_utils
-import math
 from mathutils import Vector
 from math import floor
 import time 
 import numpy as np 
 
+import mattepainter_pixels
+
 # Draw Functions
 import blf
 import gpu
@@ -87,81 +87,12 @@ class selectionMarquee3D(bpy.types.Operator):
 	bl_options = {"REGISTER", "UNDO"}
 	bl_description = "Fills pixels using a Marquee-style selection"
 
-	def _raycast(self, raycast_data):
-		mouse_x, context_x, mouse_y, context_y = raycast_data
-		mouse_position = Vector(((mouse_x) - context_x, mouse_y - context_y))
-		region = bpy.context.region 
-		region_data = bpy.context.region_data 
-		ray_vector = view3d_utils.region_2d_to_vector_3d(region, region_data, mouse_position)
-		ray_origin = view3d_utils.region_2d_to_origin_3d(region, region_data, mouse_position)
-		direction = ray_origin + (ray_vector * 1000)
-		direction -= ray_origin
-		result, location, normal, index, obj, matrix = bpy.context.scene.ray_cast(bpy.context.view_layer.depsgraph, ray_origin, direction)		
-
-		return result, location, normal, index, obj, matrix	
-
 	def _calculate_center(self, x_min, x_max, y_min, y_max):
 		x_mu = int((x_min + x_max) / 2)
 		y_mu = int((y_min + y_max) / 2)
 
 		return (x_mu, y_mu)	
 
-	def _out_of_bounds_check(self):
-		if self.mouse_positions[0][0] < self.top_left_2d[0] and self.mouse_positions[1][0] < self.top_left_2d[0]:
-			return True
-		if self.mouse_positions[0][0] > self.bottom_right_2d[0] and self.mouse_positions[1][0] > self.bottom_right_2d[0]:
-			return True
-		if self.mouse_positions[0][1] < self.bottom_right_2d[1] and self.mouse_positions[1][1] < self.bottom_right_2d[1]:
-			return True
-		if self.mouse_positions[0][1] > self.top_left_2d[1] and self.mouse_positions[1][1] > self.top_left_2d[1]:
-			return True
-		return False
-
-	def _orient_marquee_3d(self, x1, y1, x2, y2):
-		self.x_orient = 'left_to_right' if x1 < x2 else 'right_to_left'
-		self.y_orient = 'bottom_to_top' if y1 < y2 else 'top_to_bottom'	
-
-		if self.x_orient == 'left_to_right':
-			x1 = max(x1, 0)
-			x2 = min(x2, self.width_2d + self.top_left_2d[0] - 1) # need to add screen offset
-		else:
-			x1 = min(x1, self.width_2d + self.top_left_2d[0] - 1)
-			x2 = max(x2, 0)
-
-		if self.y_orient == 'bottom_to_top':
-			y1 = max(y1, 0)
-			y2 = min(y2, self.height_2d + self.bottom_right_2d[1] - 1)
-		else:
-			y1 = min(y1, self.height_2d + self.bottom_right_2d[1] - 1)
-			y2 = max(y2, 0)
-
-		if x1 > x2:
-			x1, x2 = x2, x1
-		if y1 > y2:
-			y1, y2 = y2, y1
-
-		return x1, y1, x2, y2
-
-	def _convert_pixel_buffer_to_matrix(self, buffer, width, height, channels):
-		# Converts a 1-D pixel buffer into an xy grid with n Colour channels
-		buffer = buffer.reshape(height, width, channels)
-		return buffer
-
-	def _convert_matrix_to_pixel_buffer(self, buffer):
-		# Converts back to 1-D pixel buffer
-		buffer = buffer.flatten()
-		return buffer
-
-	def rotate_matrix_around_point(self, point, origin=(0,0), angle=0):
-		angle = math.radians(angle)
-		px, py = point 
-		ox, oy = origin 
-
-		xr = ox + math.cos(angle) * (px - ox) - math.sin(angle) * (py - oy)
-		yr = oy + math.sin(angle) * (px - ox) + math.cos(angle) * (py - oy)
-
-		return xr, yr
-
 	def _get_color(self, use_bg=False):
 		# Grabs active Paint Brush colour 
 		r = bpy.context.tool_settings.image_paint.brush.color[0] if use_bg==False else bpy.context.tool_settings.image_paint.brush.secondary_color[0]
@@ -179,58 +110,40 @@ class selectionMarquee3D(bpy.types.Operator):
 
 		return image
 
-	def _fill_pixels(self, x1, y1, x2, y2, brush_color):
-		# Fills the marquee pixels and inserts them into the Image Matrix
-		
-		# Create a 1D Pixel Buffer that matches our Image
-		pixels_to_paint = np.ones(4 * self.image.size[0] * self.image.size[1], dtype=np.float32)
-		self.image.pixels.foreach_get(pixels_to_paint)	
-		
-		# Calculate Marquee Size
-		marquee_height = int(y2 - y1)
-		marquee_width = int(x2 - x1)
-
-		# Convert 1D Pixel Buffer into Matrix
-		pixels_to_paint = self._convert_pixel_buffer_to_matrix(pixels_to_paint, self.image.size[0], self.image.size[1], 4)
-
-		# Create our Marquee
-		marquee_fill = np.zeros(4 * marquee_width * marquee_height)
-		marquee_fill = self._convert_pixel_buffer_to_matrix(marquee_fill, marquee_width, marquee_height, 4)		
-
-		# Fill Marquee with Color
-		marquee_fill[:][:] = brush_color
-
-		# Insert Marquee into Pixel Matrix
-		pixels_to_paint[y1:y2, x1:x2, :] = marquee_fill	
-
-		# Convert Back
-		pixels_to_paint = self._convert_matrix_to_pixel_buffer(pixels_to_paint)
-
-		# Update image from modified pixel buffer
-		self.image.pixels.foreach_set(pixels_to_paint)
-		self.image.update()
-
-	def _calculate_pixel_offset(self, x1, y1, x2, y2):
-		# Calculates relative pixel offset (screen-based)
-		x1 = (x1 - self.top_left_2d[0]) / self.width_2d
-		y1 = (y1 - self.bottom_right_2d[1]) / self.height_2d
-		x2 = (x2 - self.top_left_2d[0]) / self.width_2d
-		y2 = (y2 - self.bottom_right_2d[1]) / self.height_2d
+	def _compute_uv_to_screen(self):
+		# Fits the UV -> region homography once per modal session from the plane's projected UV corners
+		# Replaces the per-event raycast and bounding box percentages, so rotated & perspective layers map exactly
+		mesh = self.active_object.data
+		loop_count = len(mesh.loops)
+		coords = np.empty(len(mesh.vertices) * 3, dtype=np.float64)
+		mesh.vertices.foreach_get('co', coords)
+		vertex_indices = np.empty(loop_count, dtype=np.int64)
+		mesh.loops.foreach_get('vertex_index', vertex_indices)
+		uvs = np.empty(loop_count * 2, dtype=np.float64)
+		mesh.uv_layers.active.data.foreach_get('uv', uvs)
+
+		matrix = np.array(self.region3d.perspective_matrix @ self.active_object.matrix_world)
+		screen, w = mattepainter_pixels.project_points(matrix, coords.reshape(-1, 3)[vertex_indices], self.region.width, self.region.height)
+		if np.any(w <= 0.0):
+			return None
+		return mattepainter_pixels.compute_homography(uvs.reshape(-1, 2), screen)
+
+	def _get_texel_coords(self, coords):
+		# Maps region coordinates to texel coordinates through the cached homography (3x3 multiply, no raycast)
+		uv, w = mattepainter_pixels.apply_homography(self.screen_to_uv, [coords])
+		return int(uv[0][0] * self.image.size[0]), int(uv[0][1] * self.image.size[1])
 
-		return x1, y1, x2, y2
-
-	def _convert_pixel_offset_to_2d_positions(self, x1, y1, x2, y2):
-		# converts 2d percentage offset to actual pixel values
-		x1 = int(x1 * self.image.size[0])
-		y1 = int(y1 * self.image.size[1])
-		x2 = int(x2 * self.image.size[0])
-		y2 = int(y2 * self.image.size[1])
-		return x1, y1, x2, y2
+	def _fill_pixels(self, x1, y1, x2, y2, brush_color):
+		# Fills the texels covered by the screen-space marquee, returns False if the marquee missed the plane
+		pixels = mattepainter_pixels.read_image_pixels(self.image)
+		if not mattepainter_pixels.fill_homography_rectangle(pixels, self.uv_to_screen, x1, y1, x2, y2, brush_color):
+			return False
+		mattepainter_pixels.write_image_pixels(self.image, pixels)
+		return True
 
 	def _get_2d_mouse_coords(self, context, event):
-		# returns pixel coords of event
-		coords = ((event.mouse_x) - context.area.regions.data.x, event.mouse_y - context.area.regions.data.y)		
-		return coords
+		# returns region coords of event, same space as location_3d_to_region_2d and the POST_PIXEL draw
+		return (event.mouse_region_x, event.mouse_region_y)
 
 	def _refresh_viewport(self):
 		# manually refreshes the viewport
@@ -244,14 +157,8 @@ class selectionMarquee3D(bpy.types.Operator):
 		context.area.tag_redraw()		
 
 		if event.type == 'MOUSEMOVE' and self.mouse_down:
-
-			mouse_current_position = Vector(((event.mouse_x) - context.area.regions.data.x, event.mouse_y - context.area.regions.data.y)) 
-			self.mouse_positions[1] = mouse_current_position
-
-			marquee_width = self.mouse_positions[1][0] - self.mouse_positions[0][0]
-			marquee_height = self.mouse_positions[0][1] - self.mouse_positions[1][1]
-
-			self.pixel_coords_current = self._get_2d_mouse_coords(context, event)		
+			self.mouse_positions[1] = self._get_2d_mouse_coords(context, event)
+			self.pixel_coords_current = self._get_texel_coords(self.mouse_positions[1])
 
 		elif event.type == 'LEFTMOUSE' and event.value == 'RELEASE':	
 			self.mouse_positions[1] = self._get_2d_mouse_coords(context, event)
@@ -259,36 +166,19 @@ class selectionMarquee3D(bpy.types.Operator):
 			x1, y1 = self.mouse_positions[0]
 			x2, y2 = self.mouse_positions[1]
 
-			# Orient Marquee			
-			x1, y1, x2, y2 = self._orient_marquee_3d(x1, y1, x2, y2)
-
-			# Out of Bounds Check
-			if self._out_of_bounds_check() == True:
-				bpy.types.SpaceView3D.draw_handler_remove(self._handle, 'WINDOW')	
-				bpy.ops.object.origin_set(type='ORIGIN_GEOMETRY', center='BOUNDS')
-				print('cancelled')
-				return{'CANCELLED'}		
-
-			# Calculate pixel offset relative to Plane
-			x1, y1, x2, y2 = self._calculate_pixel_offset(x1, y1, x2, y2)	
-
-			# Convert offset percentage to real pixel position values
-			x1, y1, x2, y2 = self._convert_pixel_offset_to_2d_positions(x1, y1, x2, y2)
-
-				
-
 			# Pull Brush Colour and Paint
 			brush_color = self._get_color(use_bg=event.ctrl)
-			# use try: exempt to avoid the draw_handler remaining if marquee fails
-			self._fill_pixels(x1, y1, x2, y2, brush_color=brush_color)
-
-			# Refresh viewport (doesn't update automatically)
-			self._refresh_viewport()
+			filled = self._fill_pixels(x1, y1, x2, y2, brush_color=brush_color)
 
-			# Kill draw_handler and reset origin
+			# Kill draw_handler
 			bpy.types.SpaceView3D.draw_handler_remove(self._handle, 'WINDOW')
-			bpy.ops.object.origin_set(type='ORIGIN_GEOMETRY', center='BOUNDS')
 
+			# Out of Bounds Check
+			if not filled:
+				return{'CANCELLED'}
+
+			# Refresh viewport (doesn't update automatically)
+			self._refresh_viewport()
 			return{'FINISHED'}
 
 		elif event.type == 'LEFTMOUSE' and event.value == 'PRESS':
@@ -297,20 +187,10 @@ class selectionMarquee3D(bpy.types.Operator):
 			self.pixel_coords_down = self._get_2d_mouse_coords(context, event)
 			self.mouse_positions.append(self.pixel_coords_down)
 			self.mouse_positions.append(self.pixel_coords_down) # Need to append twice.		
-
-			raycast_data = (event.mouse_x, context.area.regions.data.x, event.mouse_y, context.area.regions.data.y)
-			result, location, normal, index, obj, matrix = self._raycast(raycast_data)
-			print(f'Result: {result}')
-			print(f'Location: {location}')
-			print(f'Normal: {normal}')
-			print(f'Index: {index}')
-			print(f'Obj: {obj}')
-			print(f'Matrix: {matrix}')
+			self.pixel_coords_current = self._get_texel_coords(self.pixel_coords_down)
 
 		elif event.type in {'RIGHTMOUSE', 'ESC'}:
 			bpy.types.SpaceView3D.draw_handler_remove(self._handle, 'WINDOW')	
-			bpy.ops.object.origin_set(type='ORIGIN_GEOMETRY', center='BOUNDS')
-
 			self.mouse_down = False
 			
 			return {'FINISHED'}
@@ -320,14 +200,9 @@ class selectionMarquee3D(bpy.types.Operator):
 	def invoke(self, context, event):	
 		# Mouse / Marquee Setup
 		self.mouse_positions = []		
-		self.marquee_start = (0, 0)
-		self.marquee_end = (0, 0)
 		self.pixel_coords_down = (0, 0)
-		self.pixel_coords_up = (0, 0)
 		self.pixel_coords_current = (0, 0)
 		self.mouse_down = False
-		self.x_orient = ''
-		self.y_orient = ''
 		
 		# Active Object Calls
 		self.active_object = bpy.context.active_object
@@ -335,28 +210,12 @@ class selectionMarquee3D(bpy.types.Operator):
 		self.region = bpy.context.region 
 		self.region3d = bpy.context.space_data.region_3d 			
 
-		# Grab Vertices	
-		bpy.ops.object.mode_set(mode='OBJECT')
-		bpy.ops.object.transform_apply(location=True, rotation=False, scale=False)	
-		bpy.ops.object.mode_set(mode='TEXTURE_PAINT')
-
-		self.object_size = self.active_object.dimensions	
-		self.vertices = self.active_object.data.vertices
-		self.top_left = self.vertices[2].co
-		self.top_left_2d = view3d_utils.location_3d_to_region_2d(self.region, self.region3d, self.top_left)
-		self.bottom_right = self.vertices[1].co
-		self.bottom_right_2d = view3d_utils.location_3d_to_region_2d(self.region, self.region3d, self.bottom_right)
-
-		print(f'Top Left: {self.top_left}')
-		print(f'Top Left 2D: {self.top_left_2d}')
-		print(f'Bottom Right: {self.bottom_right}')
-		print(f'Bottom Right 2D: {self.bottom_right_2d}')
-
-		# Use Vertices to Calculate Screen-Based Area of Object
-		self.width_2d = self.bottom_right_2d[0] - self.top_left_2d[0]
-		self.height_2d = self.top_left_2d[1] - self.bottom_right_2d[1]
-		self.scale_2d = (self.width_2d, self.height_2d)
-		self.center_2d = int(self.width_2d / 2), int(self.height_2d / 2)
+		# Screen <-> UV mapping, computed once for the whole session
+		self.uv_to_screen = self._compute_uv_to_screen()
+		if self.uv_to_screen is None:
+			self.report({"WARNING"}, "Layer is behind the view, cannot map the marquee.")
+			return {'CANCELLED'}
+		self.screen_to_uv = np.linalg.inv(self.uv_to_screen)
 
 		args = (self, context)
 		self._handle = bpy.types.SpaceView3D.draw_handler_add(drawMarqueeCallback, args, 'WINDOW', 'POST_PIXEL')
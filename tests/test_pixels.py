@@ -0,0 +1,578 @@
+#--------------------------------------------------------------
+# MattePainter Pixel Engine Tests
+#--------------------------------------------------------------
+
+# Correctness tests for mattepainter_pixels on small arrays, runs in plain CPython (no Blender):
+# 	python -m pytest -q
+#
+# Timings live in benchmark_pixels.py, which no longer checks results.
+
+#--------------------------------------------------------------
+# Import
+#--------------------------------------------------------------
+
+import os
+import zlib
+import struct
+import numpy as np
+import pytest
+
+import mattepainter_pixels
+
+#--------------------------------------------------------------
+# Settings
+#--------------------------------------------------------------
+
+WIDTH = 128
+HEIGHT = 72
+BRUSH_COLOR = [0.0, 0.0, 0.0, 1.0]
+
+# Rotated & perspective-skewed plane covering roughly a 1000x700 region of the viewport
+SKEWED_PLANE = np.array(((700.0, 180.0, 400.0), (-150.0, 520.0, 200.0), (0.15, 0.1, 1.0)))
+SCREEN_MARQUEE = (450.0, 300.0, 800.0, 550.0)
+
+#--------------------------------------------------------------
+# Miscellaneous Functions
+#--------------------------------------------------------------
+
+class FakePixels:
+	# Mimics bpy_prop_array's foreach_get/foreach_set on a flat float32 buffer
+	def __init__(self, buffer):
+		self.buffer = buffer
+
+	def foreach_get(self, target):
+		target[:] = self.buffer
+
+	def foreach_set(self, source):
+		self.buffer[:] = source
+
+class FakeImage:
+	# Just enough of bpy.types.Image for the engine's image adapters
+	def __init__(self, width, height, channels=4, fill=1.0):
+		self.size = (width, height)
+		self.channels = channels
+		self.pixels = FakePixels(np.full(width * height * channels, fill, dtype=np.float32))
+		self.updates = 0
+
+	def update(self):
+		self.updates += 1
+
+def synthetic_plate(width, height, seed=0):
+	# Smooth gradient with some noise and a soft alpha ramp
+	generator = np.random.default_rng(seed)
+	x = np.linspace(0.0, 1.0, width, dtype=np.float32)
+	y = np.linspace(0.0, 1.0, height, dtype=np.float32)
+	plate = np.empty((height, width, 4), dtype=np.float32)
+	plate[:, :, 0] = x[np.newaxis, :]
+	plate[:, :, 1] = y[:, np.newaxis]
+	plate[:, :, 2] = generator.random((height, width), dtype=np.float32) * 0.1 + 0.45
+	plate[:, :, 3] = np.clip(x[np.newaxis, :] * 2.0, 0.0, 1.0)
+	return plate
+
+def bent_grid(width, height, cells=32, seed=6):
+	# A quad grid bent away from a perspective camera (z = 0.3 sin(3u) + 2 over the unit square), with a random plate
+	generator = np.random.default_rng(seed)
+	grid = np.stack(np.meshgrid(np.linspace(0.0, 1.0, cells + 1), np.linspace(0.0, 1.0, cells + 1)), axis=-1).reshape(-1, 2)
+	positions = np.concatenate((grid - 0.5, 0.3 * np.sin(grid[:, :1] * 3.0) + 2.0), axis=1)
+	index = np.arange((cells + 1) ** 2).reshape(cells + 1, cells + 1)
+	a, b, c, d = index[:-1, :-1].ravel(), index[:-1, 1:].ravel(), index[1:, 1:].ravel(), index[1:, :-1].ravel()
+	triangles = np.concatenate((np.stack((a, b, c), axis=1), np.stack((a, c, d), axis=1)))
+	camera_matrix = np.array(((2.0, 0.0, 0.0, 0.0), (0.0, 2.0, 0.0, 0.0), (0.0, 0.0, -1.0, -0.2), (0.0, 0.0, 1.0, 0.0)))
+	source = generator.random((height, width, 4), dtype=np.float32)
+	homogeneous = mattepainter_pixels.project_homogeneous(camera_matrix, positions, width, height)
+	return {'source': source, 'uvs': grid[triangles], 'homogeneous': homogeneous[triangles], 'camera_matrix': camera_matrix, 'size': width}
+
+def decode_png(data):
+	# Just enough of PNG for encode_png's output: one IDAT, 8 bit RGBA rows with the Sub filter
+	width, height = struct.unpack('>II', data[16:24])
+	length = struct.unpack('>I', data[33:37])[0]
+	rows = np.frombuffer(zlib.decompress(data[41:41 + length]), dtype=np.uint8).reshape(height, width * 4 + 1)
+	assert (rows[:, 0] == 1).all()
+	values = np.cumsum(rows[:, 1:].reshape(height, width, 4), axis=1, dtype=np.uint64) % 256
+	return values[::-1].astype(np.float32) / 255.0
+
+def decode_exr(data, width, height):
+	# Reads the offset table and undoes the ZIP predictor & byte split of every 16 row block, channels come back as ABGR
+	header_end = data.index(b'screenWindowWidth\0float\0') + len('screenWindowWidth\0float\0') + 8 + 1
+	blocks = -(-height // 16)
+	offsets = np.frombuffer(data[header_end:header_end + 8 * blocks], dtype='<u8')
+	planar = []
+	for offset in offsets:
+		y, size = struct.unpack('<ii', data[offset:offset + 8])
+		block = data[offset + 8:offset + 8 + size]
+		raw_size = min(16, height - y) * width * 4 * 4
+		if size < raw_size:
+			predicted = np.frombuffer(zlib.decompress(block), dtype=np.uint8)
+			interleaved = (np.cumsum(np.concatenate(([predicted[0]], predicted[1:].astype(np.int64) - 128))) % 256).astype(np.uint8)
+			block = np.empty(raw_size, dtype=np.uint8)
+			half = (raw_size + 1) // 2
+			block[0::2] = interleaved[:half]
+			block[1::2] = interleaved[half:]
+			block = block.tobytes()
+		planar.append(np.frombuffer(block, dtype='<f4').reshape(-1, 4, width))
+	abgr = np.concatenate(planar).transpose(0, 2, 1)
+	return abgr[::-1][:, :, ::-1]
+
+#--------------------------------------------------------------
+# Pixel Buffers
+#--------------------------------------------------------------
+
+def test_buffer_roundtrip_does_not_copy():
+	buffer = np.arange(WIDTH * HEIGHT * 4, dtype=np.float32)
+	matrix = mattepainter_pixels.convert_pixel_buffer_to_matrix(buffer, WIDTH, HEIGHT, 4)
+	flat = mattepainter_pixels.convert_matrix_to_pixel_buffer(matrix)
+	assert matrix.shape == (HEIGHT, WIDTH, 4)
+	assert matrix[1, 0, 0] == WIDTH * 4
+	assert np.shares_memory(matrix, buffer)
+	assert np.shares_memory(flat, buffer)
+
+def test_image_pixels_roundtrip():
+	image = FakeImage(WIDTH, HEIGHT, fill=0.0)
+	pixels = synthetic_plate(WIDTH, HEIGHT)
+	mattepainter_pixels.write_image_pixels(image, pixels)
+	assert image.updates == 1
+	assert np.array_equal(mattepainter_pixels.read_image_pixels(image), pixels)
+
+#--------------------------------------------------------------
+# Marquee
+#--------------------------------------------------------------
+
+def test_orient_marquee_orders_and_clamps():
+	assert mattepainter_pixels.orient_marquee(90, 50, 10, -5, 64, 48) == (10, 0, 63, 47)
+	assert mattepainter_pixels.orient_marquee(-10, 70, 20, 30, 64, 48) == (0, 30, 20, 47)
+
+def test_marquee_in_bounds():
+	assert mattepainter_pixels.marquee_in_bounds((-5, 10), (20, 30), 64, 48)
+	assert not mattepainter_pixels.marquee_in_bounds((-5, 10), (-1, 30), 64, 48)
+	assert not mattepainter_pixels.marquee_in_bounds((10, 50), (20, 60), 64, 48)
+
+def test_fill_pixels_matches_slice_fill():
+	pixels = np.ones((HEIGHT, WIDTH, 4), dtype=np.float32)
+	mattepainter_pixels.fill_pixels(pixels, WIDTH // 4, HEIGHT // 4, (WIDTH * 3) // 4, (HEIGHT * 3) // 4, BRUSH_COLOR)
+	reference = np.ones((HEIGHT, WIDTH, 4), dtype=np.float32)
+	reference[HEIGHT // 4:(HEIGHT * 3) // 4, WIDTH // 4:(WIDTH * 3) // 4] = BRUSH_COLOR
+	assert np.array_equal(pixels, reference)
+
+def test_fill_image_reversed_marquee():
+	image = FakeImage(WIDTH, HEIGHT)
+	mattepainter_pixels.fill_image(image, WIDTH - 1, HEIGHT - 1, -50, -50, BRUSH_COLOR)
+	pixels = image.pixels.buffer.reshape(HEIGHT, WIDTH, 4)
+	assert np.all(pixels[:HEIGHT - 1, :WIDTH - 1] == BRUSH_COLOR)
+	assert np.all(pixels[HEIGHT - 1, :] == 1.0) and np.all(pixels[:, WIDTH - 1] == 1.0)
+	assert image.updates == 1
+
+def test_homography_fill_matches_per_texel_reference():
+	pixels = np.ones((HEIGHT, WIDTH, 4), dtype=np.float32)
+	assert mattepainter_pixels.fill_homography_rectangle(pixels, SKEWED_PLANE, *SCREEN_MARQUEE, BRUSH_COLOR)
+	x1, y1, x2, y2 = SCREEN_MARQUEE
+	y, x = np.mgrid[0:HEIGHT, 0:WIDTH]
+	screen, w = mattepainter_pixels.apply_homography(SKEWED_PLANE, np.stack(((x.ravel() + 0.5) / WIDTH, (y.ravel() + 0.5) / HEIGHT), axis=1))
+	inside = (w > 0.0) & (screen[:, 0] >= x1) & (screen[:, 0] <= x2) & (screen[:, 1] >= y1) & (screen[:, 1] <= y2)
+	assert inside.any()
+	assert np.array_equal(inside.reshape(HEIGHT, WIDTH), pixels[:, :, 0] == 0.0)
+
+def test_compute_homography_recovers_mapping():
+	target = mattepainter_pixels.apply_homography(SKEWED_PLANE, mattepainter_pixels.UNIT_SQUARE)[0]
+	homography = mattepainter_pixels.compute_homography(mattepainter_pixels.UNIT_SQUARE, target)
+	assert np.allclose(homography, SKEWED_PLANE / SKEWED_PLANE[2, 2])
+
+#--------------------------------------------------------------
+# Polygons
+#--------------------------------------------------------------
+
+def test_polygon_fill_matches_even_odd_reference():
+	# A 30 degree rotated marquee and a star-shaped lasso, both in texel space
+	marquee = ((WIDTH * 0.2, HEIGHT * 0.3), (WIDTH * 0.7, HEIGHT * 0.3), (WIDTH * 0.7, HEIGHT * 0.7), (WIDTH * 0.2, HEIGHT * 0.7))
+	marquee = mattepainter_pixels.rotate_points(marquee, (WIDTH * 0.45, HEIGHT * 0.5), 30.0)
+	angles = np.linspace(0.0, 2.0 * np.pi, 200, endpoint=False)
+	radius = 0.3 + 0.1 * np.sin(angles * 7.0)
+	lasso = np.stack((WIDTH * (0.5 + radius * np.cos(angles)), HEIGHT * (0.5 + radius * np.sin(angles))), axis=1)
+	pixels = np.ones((HEIGHT, WIDTH, 4), dtype=np.float32)
+	for polygon in (marquee, lasso):
+		assert mattepainter_pixels.fill_polygon(pixels, polygon, BRUSH_COLOR)
+	y, x = np.mgrid[0:HEIGHT, 0:WIDTH] + 0.5
+	reference = mattepainter_pixels.points_in_polygon(x, y, marquee) | mattepainter_pixels.points_in_polygon(x, y, lasso)
+	assert np.array_equal(reference, pixels[:, :, 0] == 0.0)
+
+def test_polygon_mask_outside_image():
+	assert mattepainter_pixels.polygon_mask(((-20, -20), (-10, -20), (-10, -10)), WIDTH, HEIGHT) is None
+	pixels = np.ones((HEIGHT, WIDTH, 4), dtype=np.float32)
+	assert not mattepainter_pixels.fill_polygon(pixels, ((-20, -20), (-10, -20), (-10, -10)), BRUSH_COLOR)
+	assert np.all(pixels == 1.0)
+
+def test_lasso_bounds():
+	angles = np.linspace(0.0, 2.0 * np.pi, 500)
+	points = np.stack((WIDTH * (0.5 + 0.4 * np.cos(angles)), HEIGHT * (0.5 + 0.4 * np.sin(angles))), axis=1)
+	reference = (int(points[:, 0].min()), int(points[:, 0].max()), int(points[:, 1].min()), int(points[:, 1].max()))
+	assert mattepainter_pixels.lasso_bounds([tuple(point) for point in points]) == reference
+
+#--------------------------------------------------------------
+# Filters
+#--------------------------------------------------------------
+
+def test_box_filter_matches_cropped_window_mean():
+	values = np.random.default_rng(1).random((20, 30))
+	filtered = mattepainter_pixels.box_filter(values, 3)
+	for y, x in ((0, 0), (10, 15), (19, 29), (5, 27)):
+		assert abs(filtered[y, x] - values[max(y - 3, 0):y + 4, max(x - 3, 0):x + 4].mean()) < 1e-5
+
+def test_refine_mask_tiling_matches_untiled_filter():
+	albedo = synthetic_plate(WIDTH, HEIGHT)
+	mask = np.ones((HEIGHT, WIDTH, 4), dtype=np.float32)
+	mask[HEIGHT // 4:(HEIGHT * 3) // 4, WIDTH // 4:(WIDTH * 3) // 4, :3] = 0.0
+	original = mask[:, :, 0].copy()
+	mattepainter_pixels.refine_mask(albedo, mask, radius=4, epsilon=1e-3, tile_size=32)
+	guide = mattepainter_pixels.luminance(albedo).astype(np.float32)
+	reference = np.clip(mattepainter_pixels.guided_filter(guide, original, 4, 1e-3), 0.0, 1.0)
+	assert np.abs(mask[:, :, 0] - reference).max() < 1e-4
+	assert np.all(mask[:, :, 3] == 1.0)
+
+def test_blur_pixels_keeps_transparent_colour_out():
+	# Opaque red left half next to a fully transparent green right half
+	pixels = np.zeros((HEIGHT, WIDTH, 4), dtype=np.float32)
+	pixels[:, :WIDTH // 2] = (1.0, 0.0, 0.0, 1.0)
+	pixels[:, WIDTH // 2:] = (0.0, 1.0, 0.0, 0.0)
+	blurred = mattepainter_pixels.blur_pixels(pixels, 8.0)
+	visible = blurred[:, :, 3] > 1e-3
+	assert np.all(blurred[visible, 1] < 1e-4)
+	assert abs(blurred[:, :, 3].mean() - 0.5) < 1e-3
+	assert blurred[HEIGHT // 2, WIDTH // 2 - 4, 3] < 1.0 and blurred[HEIGHT // 2, WIDTH // 2 + 4, 3] > 0.0
+
+#--------------------------------------------------------------
+# Keying
+#--------------------------------------------------------------
+
+def test_chroma_key_keys_backdrop_only():
+	# Green backdrop with a grey subject in the middle
+	plate = np.zeros((HEIGHT, WIDTH, 4), dtype=np.float32)
+	plate[:, :, 1] = 0.8
+	plate[HEIGHT // 4:(HEIGHT * 3) // 4, WIDTH // 4:(WIDTH * 3) // 4, :3] = 0.5
+	alpha = mattepainter_pixels.chroma_key(plate, (0.0, 1.0, 0.0), 0.1, 0.1)
+	assert np.all(alpha[HEIGHT // 4:(HEIGHT * 3) // 4, WIDTH // 4:(WIDTH * 3) // 4] == 1.0)
+	assert np.all(alpha[:HEIGHT // 4] == 0.0)
+
+def test_chroma_key_respects_luma_range():
+	# A dark green shadow shares the backdrop's hue but sits below the luma range
+	plate = np.zeros((2, 1, 4), dtype=np.float32)
+	plate[0, 0, 1] = 0.8
+	plate[1, 0, 1] = 0.05
+	alpha = mattepainter_pixels.chroma_key(plate, (0.0, 1.0, 0.0), 0.1, 0.0, luma_min=0.2, luma_max=1.0)
+	assert alpha[0, 0] == 0.0 and alpha[1, 0] == 1.0
+
+#--------------------------------------------------------------
+# Connected Components
+#--------------------------------------------------------------
+
+def test_label_components_merges_touching_pixels():
+	# Grid of discs with a diagonal chain that is only 8-connected
+	y, x = np.mgrid[0:HEIGHT, 0:WIDTH]
+	cell = 16
+	binary = ((x % cell - cell // 2) ** 2 + (y % cell - cell // 2) ** 2) < (cell // 3) ** 2
+	chain = np.arange(HEIGHT // 2)
+	binary[chain, chain] = True
+	labels, count = mattepainter_pixels.label_components(binary)
+	bounds, sizes = mattepainter_pixels.component_bounds(labels, count)
+	assert np.array_equal(labels > 0, binary)
+	assert sizes.sum() == binary.sum()
+	# Pixels touching in any of the 8 directions must share a label
+	for dy, dx in ((0, 1), (1, 0), (1, 1), (1, -1)):
+		a = labels[max(dy, 0):, max(dx, 0):WIDTH + min(dx, 0)]
+		b = labels[:HEIGHT - dy, max(-dx, 0):WIDTH - max(dx, 0)]
+		touching = (a > 0) & (b > 0)
+		assert np.array_equal(a[touching], b[touching])
+	x_min, y_min, x_max, y_max = bounds[labels[cell // 2, cell // 2] - 1]
+	assert x_min == 0 and y_min == 0
+
+def test_label_components_connectivity():
+	binary = np.eye(4, dtype=bool)
+	assert mattepainter_pixels.label_components(binary, connectivity=8)[1] == 1
+	assert mattepainter_pixels.label_components(binary, connectivity=4)[1] == 4
+	assert mattepainter_pixels.label_components(np.zeros((4, 4), dtype=bool))[1] == 0
+
+#--------------------------------------------------------------
+# Contours
+#--------------------------------------------------------------
+
+def test_cutout_contours_cover_visible_pixels():
+	# Soft ring with a hole plus a separate hard-edged block
+	width, height = 256, 144
+	y, x = np.mgrid[0:height, 0:width]
+	radius = np.hypot(x - width * 0.35, y - height * 0.5) / min(width, height)
+	alpha = np.clip((0.3 - radius) * 50.0, 0.0, 1.0) * (radius > 0.1)
+	alpha[int(height * 0.7):int(height * 0.9), int(width * 0.7):int(width * 0.9)] = 1.0
+	loops = mattepainter_pixels.cutout_contours(alpha.astype(np.float32), margin=2, tolerance=2.0, max_resolution=128)
+	# Every visible pixel centre must land inside the outline (even-odd over all loops)
+	rows, columns = np.nonzero(alpha > 0.0)
+	inside = np.zeros(len(rows), dtype=bool)
+	for loop in loops:
+		inside ^= mattepainter_pixels.points_in_polygon((columns + 0.5) / width, (rows + 0.5) / height, loop)
+	assert inside.all()
+	assert len(loops) == 3
+	assert sum(mattepainter_pixels.polygon_area(loop) for loop in loops) < 0.5
+
+def test_trace_contours_orientation():
+	# Outer boundaries run counter-clockwise, holes clockwise
+	binary = np.ones((9, 9), dtype=bool)
+	binary[3:6, 3:6] = False
+	areas = sorted(mattepainter_pixels.polygon_area(loop) for loop in mattepainter_pixels.trace_contours(binary))
+	assert len(areas) == 2 and areas[0] < 0.0 < areas[1]
+
+#--------------------------------------------------------------
+# Alpha Analysis
+#--------------------------------------------------------------
+
+def test_classify_alpha():
+	alpha = np.ones((8, 8), dtype=np.float32)
+	assert mattepainter_pixels.classify_alpha(alpha) == 'OPAQUE'
+	alpha[:4] = 0.0
+	assert mattepainter_pixels.classify_alpha(alpha) == 'BINARY'
+	alpha[0, 0] = 0.5
+	assert mattepainter_pixels.classify_alpha(alpha) == 'SOFT'
+
+#--------------------------------------------------------------
+# Grading
+#--------------------------------------------------------------
+
+def test_srgb_roundtrip():
+	values = np.linspace(0.0, 1.0, 256, dtype=np.float32)
+	assert np.abs(mattepainter_pixels.linear_to_srgb(mattepainter_pixels.srgb_to_linear(values)) - values).max() < 1e-5
+	assert mattepainter_pixels.srgb_to_linear(np.float32(0.5)) == pytest.approx(0.2140, abs=1e-4)
+
+def test_hsv_roundtrip():
+	rgb = np.random.default_rng(2).random((16, 16, 3), dtype=np.float32)
+	assert np.abs(mattepainter_pixels.hsv_to_rgb(mattepainter_pixels.rgb_to_hsv(rgb)) - rgb).max() < 1e-5
+	assert np.abs(mattepainter_pixels.apply_hsv(rgb) - rgb).max() < 1e-5
+
+def test_identity_curve_lut():
+	rgb = np.random.default_rng(3).random((16, 16, 3), dtype=np.float32)
+	luts = np.tile(np.linspace(0.0, 1.0, 1024, dtype=np.float32), (3, 1))
+	assert np.abs(mattepainter_pixels.apply_curve_luts(rgb, luts) - rgb).max() < 1e-5
+
+def test_curve_luts_extrapolate_past_the_ends():
+	# A gamma curve with its end slopes keeps float values above 1 and below 0 on the tangent lines
+	positions = np.linspace(0.0, 1.0, 1024, dtype=np.float32)
+	luts = np.tile(positions ** 2.0, (3, 1))
+	slopes = np.tile(np.array((0.0, 2.0), dtype=np.float32), (3, 1))
+	rgb = np.array([[[-0.5, 0.5, 3.0]]], dtype=np.float32).repeat(3, axis=0)
+	rgb[1] = (1.0, 0.0, 1.5)
+	graded = mattepainter_pixels.apply_curve_luts(rgb, luts, slopes=slopes)
+	assert np.allclose(graded[0, 0], (0.0, 0.25, 5.0), atol=1e-5)
+	assert np.allclose(graded[1, 0], (1.0, 0.0, 2.0), atol=1e-5)
+	assert mattepainter_pixels.apply_curve_luts(rgb, luts)[0, 0, 2] == 1.0
+	baked = mattepainter_pixels.bake_grade(np.concatenate((rgb, np.ones((3, 1, 1), dtype=np.float32)), axis=2), luts, curve_slopes=slopes)
+	assert np.allclose(baked[..., :3], graded)
+
+def test_bake_grade_strips_match_untiled_grade():
+	# Gamma-like curve LUT and a hue/saturation shift over the synthetic plate
+	pixels = synthetic_plate(WIDTH, HEIGHT)
+	luts = np.stack([np.linspace(0.0, 1.0, 1024, dtype=np.float32) ** exponent for exponent in (0.8, 1.0, 1.25)])
+	hsv = (0.55, 0.8, 1.1, 1.0)
+	graded = mattepainter_pixels.bake_grade(pixels, luts, 1.0, hsv, tile_rows=16)
+	reference = mattepainter_pixels.apply_hsv(mattepainter_pixels.apply_curve_luts(pixels[:, :, :3], luts), *hsv)
+	assert np.abs(graded[:, :, :3] - reference).max() < 1e-5
+	assert np.array_equal(graded[:, :, 3], pixels[:, :, 3])
+
+#--------------------------------------------------------------
+# Compositing
+#--------------------------------------------------------------
+
+def test_flatten_layers_alpha_follows_coverage():
+	# Four overlapping half-transparent layers, each under a different skewed quad
+	generator = np.random.default_rng(3)
+	layers = []
+	quads = []
+	for i in range(4):
+		layer = np.empty((32, 32, 4), dtype=np.float32)
+		layer[:, :] = (generator.random(), generator.random(), generator.random(), 0.5)
+		centre = generator.random(2) * (WIDTH, HEIGHT)
+		quad = centre + (generator.random((4, 2)) - 0.5) * 0.2 * (WIDTH, HEIGHT) + np.array(((-1, -1), (1, -1), (1, 1), (-1, 1))) * 0.25 * min(WIDTH, HEIGHT)
+		layers.append((mattepainter_pixels.premultiply(layer), mattepainter_pixels.compute_homography(mattepainter_pixels.UNIT_SQUARE, quad)))
+		quads.append(quad)
+	canvas = mattepainter_pixels.flatten_layers(WIDTH, HEIGHT, layers)
+	# Canvas alpha must follow 1 - 0.5^n where n is how many quads cover each pixel
+	y, x = np.mgrid[0:HEIGHT, 0:WIDTH] + 0.5
+	coverage = sum(mattepainter_pixels.points_in_polygon(x, y, quad).astype(np.int64) for quad in quads)
+	assert coverage.max() > 1
+	assert np.abs(canvas[:, :, 3] - (1.0 - 0.5 ** coverage)).max() < 1e-4
+
+def test_screen_bounds_behind_viewer():
+	behind = np.diag((1.0, 1.0, -1.0))
+	assert mattepainter_pixels.screen_bounds(behind, WIDTH, HEIGHT) is None
+	assert mattepainter_pixels.warp_layer(np.ones((4, 4, 4), dtype=np.float32), behind, WIDTH, HEIGHT) is None
+
+#--------------------------------------------------------------
+# Scopes
+#--------------------------------------------------------------
+
+def test_scopes_count_every_sample():
+	pixels = np.random.default_rng(5).random((HEIGHT, WIDTH, 4), dtype=np.float32)
+	samples = np.ascontiguousarray(mattepainter_pixels.subsample(pixels, 64)[0])
+	counts = mattepainter_pixels.histogram(samples, 256)
+	wave = mattepainter_pixels.waveform(samples, 256, 128)
+	count = samples.shape[0] * samples.shape[1]
+	assert (counts.sum(axis=1) == count).all()
+	assert wave.sum() == count
+	reference = np.histogram(samples[:, :, 0], bins=256, range=(0.0, 1.0))[0]
+	assert np.abs(counts[0] - reference).max() <= 1
+	assert mattepainter_pixels.draw_histogram(counts, 128).shape == (128, 256, 4)
+	assert mattepainter_pixels.draw_waveform(wave).shape == (128, 256, 4)
+
+#--------------------------------------------------------------
+# Texture Projection
+#--------------------------------------------------------------
+
+def test_project_triangles_samples_camera_view():
+	# Every texel of the unit square is covered once, and sampled where its surface point projects
+	state = bent_grid(WIDTH, HEIGHT)
+	size = state['size']
+	pixels, covered, visibility = mattepainter_pixels.project_triangles(state['source'], state['uvs'], state['homogeneous'], size, size)
+	assert covered.all()
+	y, x = np.mgrid[0:size, 0:size]
+	u = (x.ravel() + 0.5) / size
+	v = (y.ravel() + 0.5) / size
+	positions = np.stack((u - 0.5, v - 0.5, 0.3 * np.sin(u * 3.0) + 2.0), axis=1)
+	homogeneous = mattepainter_pixels.project_homogeneous(state['camera_matrix'], positions, WIDTH, HEIGHT)
+	source_x = homogeneous[:, 0] / homogeneous[:, 2]
+	source_y = homogeneous[:, 1] / homogeneous[:, 2]
+	inside = (visibility.ravel() > 0.0) & (source_x > 1.0) & (source_x < WIDTH - 2.0) & (source_y > 1.0) & (source_y < HEIGHT - 2.0)
+	expected = mattepainter_pixels.sample_bilinear(state['source'], source_x[inside], source_y[inside])
+	assert inside.sum() > size * size // 4
+	assert np.abs(pixels.reshape(-1, 4)[inside] - expected).mean() < 0.05
+
+def test_project_triangles_depth_occlusion():
+	# A card halfway to the camera hides the middle of the frame, the rest stays visible
+	state = bent_grid(WIDTH, HEIGHT)
+	size = state['size']
+	card = np.array(((-0.2, -0.2, 1.0), (0.2, -0.2, 1.0), (0.2, 0.2, 1.0), (-0.2, 0.2, 1.0)))
+	card_homogeneous = mattepainter_pixels.project_homogeneous(state['camera_matrix'], card, WIDTH, HEIGHT)[[0, 1, 2, 0, 2, 3]].reshape(2, 3, 3)
+	# The grid triangles' view depth is the z of their vertices, the camera looks down +z here
+	depth = 0.3 * np.sin(state['uvs'][:, :, 0] * 3.0) + 2.0
+	depth_buffer = mattepainter_pixels.rasterise_depth(np.concatenate((state['homogeneous'], card_homogeneous)), np.concatenate((depth, np.ones((2, 3)))), WIDTH, HEIGHT)
+	pixels, covered, visibility = mattepainter_pixels.project_triangles(state['source'], state['uvs'], state['homogeneous'], size, size, triangle_depth=depth, depth_buffer=depth_buffer)
+	y, x = np.mgrid[0:size, 0:size]
+	u = (x.ravel() + 0.5) / size
+	v = (y.ravel() + 0.5) / size
+	z = 0.3 * np.sin(u * 3.0) + 2.0
+	# Screen position relative to the frame centre, in units of the card's half size at depth 1
+	screen_x = (u - 0.5) / z / 0.2
+	screen_y = (v - 0.5) / z / 0.2
+	seen = visibility.ravel() > 0.0
+	behind = (np.abs(screen_x) < 0.9) & (np.abs(screen_y) < 0.9)
+	clear = (np.abs(screen_x) > 1.1) | (np.abs(screen_y) > 1.1)
+	assert behind.sum() > 100 and not seen[behind].any()
+	assert seen[clear & (np.abs(u - 0.5) < 0.45) & (np.abs(v - 0.5) < 0.2)].all()
+
+def test_blend_projections_by_weight():
+	# Weights 1 and 0.5 squared are 1 and 0.25, so white over black blends to 0.8, the zero weight camera counts for nothing
+	state = bent_grid(WIDTH, HEIGHT)
+	count = len(state['uvs'])
+	projections = [
+		(np.ones_like(state['source']), state['uvs'], state['homogeneous'], None, None, np.full(count, 1.0)),
+		(np.zeros_like(state['source']), state['uvs'], state['homogeneous'], None, None, np.full(count, 0.5)),
+		(state['source'], state['uvs'], state['homogeneous'], None, None, np.zeros(count)),
+	]
+	pixels, covered, visibility = mattepainter_pixels.blend_projections(projections, state['size'], state['size'], sharpness=2.0)
+	seen = visibility > 0.0
+	assert covered.all() and seen.mean() > 0.5
+	assert np.abs(pixels[seen] - 0.8).max() < 1e-5
+	assert np.abs(visibility[seen] - 1.0).max() < 1e-6
+
+def test_extend_edges_grows_by_margin():
+	# Grows one 4-neighbour step per margin texel, so the filled region ends up a rounded square
+	pixels = np.zeros((16, 16, 4), dtype=np.float32)
+	filled = np.zeros((16, 16), dtype=bool)
+	pixels[4:8, 4:8] = 1.0
+	filled[4:8, 4:8] = True
+	extended, grown = mattepainter_pixels.extend_edges(pixels, filled, 2)
+	y, x = np.mgrid[0:16, 0:16]
+	distance = np.maximum(np.maximum(4 - x, x - 7), 0) + np.maximum(np.maximum(4 - y, y - 7), 0)
+	assert np.array_equal(grown, distance <= 2)
+	assert np.all(extended[grown] == 1.0) and np.all(extended[~grown] == 0.0)
+	assert not filled[0, 0] and np.array_equal(pixels[0, 0], (0.0, 0.0, 0.0, 0.0))
+
+def test_projection_size():
+	# Unit UV square mapped onto a quarter of the plate by two triangles
+	corners_uv = np.array([[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0]])
+	corners_screen = np.array([[0.0, 0.0, 1.0], [WIDTH / 2, 0.0, 1.0], [WIDTH / 2, HEIGHT / 2, 1.0], [0.0, HEIGHT / 2, 1.0]])
+	texels = mattepainter_pixels.projection_texel_count(corners_uv[[[0, 1, 2], [0, 2, 3]]], corners_screen[[[0, 1, 2], [0, 2, 3]]] * 2.0, WIDTH, HEIGHT)
+	expected = (WIDTH / 2) * (HEIGHT / 2)
+	assert abs(texels - expected) < 1e-6 * expected
+	state = bent_grid(WIDTH, HEIGHT)
+	assert 0.0 < mattepainter_pixels.projection_texel_count(state['uvs'], state['homogeneous'], WIDTH, HEIGHT) <= state['size'] ** 2 * 4
+	width, height, capped = mattepainter_pixels.fit_texture_size(expected, WIDTH / HEIGHT, 24, 1 << 40)
+	assert capped is False and abs(width * height - expected) <= WIDTH
+	budget = 1024 * 1024
+	width, height, capped = mattepainter_pixels.fit_texture_size(expected * 64, WIDTH / HEIGHT, 24, budget)
+	assert capped is True and width * height * 24 <= budget * 1.01
+	assert abs(width / height - WIDTH / HEIGHT) < 0.05
+
+#--------------------------------------------------------------
+# Incremental Projection
+#--------------------------------------------------------------
+
+def test_reproject_matches_full_projection():
+	# The bent grid projected once, then a square brush stroke painted over the plate for the reprojection to pick up
+	state = bent_grid(WIDTH, HEIGHT)
+	size = state['size']
+	projection, covered, visibility = mattepainter_pixels.project_triangles(state['source'], state['uvs'], state['homogeneous'], size, size)
+	previous = mattepainter_pixels.tile_checksums(state['source'], tile_size=16)
+	assert not (mattepainter_pixels.tile_checksums(state['source'].copy(), tile_size=16) != previous).any()
+	painted = state['source'].copy()
+	painted[HEIGHT // 3:HEIGHT // 3 + 8, WIDTH // 3:WIDTH // 3 + 8] = (1.0, 0.0, 0.0, 1.0)
+	changed = mattepainter_pixels.tile_checksums(painted, tile_size=16) != previous
+	pixels = projection.copy()
+	updated = mattepainter_pixels.reproject_triangles(pixels, visibility > 0.0, painted, state['uvs'], state['homogeneous'], changed, tile_size=16)
+	expected = mattepainter_pixels.project_triangles(painted, state['uvs'], state['homogeneous'], size, size)[0]
+	assert np.abs(pixels - expected).max() < 1e-5
+	assert 0.0 < updated.mean() < 0.3
+	assert not (pixels != projection).any(axis=2)[~updated].any()
+
+#--------------------------------------------------------------
+# Sequence Projection
+#--------------------------------------------------------------
+
+def test_project_frames_match_single_projections():
+	# Three frames of the bent grid's plate, brightened a little each frame, sharing one view
+	state = bent_grid(WIDTH, HEIGHT)
+	size = state['size']
+	frames = [np.clip(state['source'] + 0.1 * i, 0.0, 1.0) for i in range(3)]
+	samples = mattepainter_pixels.projection_samples(state['uvs'], state['homogeneous'], size, size, WIDTH, HEIGHT)
+	result = list(mattepainter_pixels.project_frames(frames, samples))
+	assert len(result) == len(frames)
+	for frame, pixels in zip(frames, result):
+		expected, covered, visibility = mattepainter_pixels.project_triangles(frame, state['uvs'], state['homogeneous'], size, size)
+		assert np.abs(pixels - expected).max() < 1e-3
+	assert (samples['covered'] == covered).all() and (samples['visibility'] == visibility).all()
+
+def test_project_frames_process_pool_matches_threads():
+	state = bent_grid(WIDTH, HEIGHT, cells=8)
+	size = state['size']
+	samples = mattepainter_pixels.projection_samples(state['uvs'], state['homogeneous'], size, size, WIDTH, HEIGHT)
+	threaded = list(mattepainter_pixels.project_frames([state['source']], samples))
+	processed = list(mattepainter_pixels.project_frames([state['source']], samples, workers=1, processes=True))
+	assert np.array_equal(threaded[0], processed[0])
+
+#--------------------------------------------------------------
+# Image Files
+#--------------------------------------------------------------
+
+def test_encoders_round_trip():
+	# A soft mask as Blender hands out byte images (multiples of 1/255) and a noisy float plate with values above 1
+	mask = np.ones((HEIGHT, WIDTH, 4), dtype=np.float32)
+	mask[:, :, :3] = np.round(np.clip(np.linspace(-0.5, 1.5, WIDTH, dtype=np.float32)[np.newaxis, :, np.newaxis], 0.0, 1.0) * 255.0) / 255.0
+	plate = np.random.default_rng(7).random((HEIGHT, WIDTH, 4), dtype=np.float32) * 4.0
+	png = mattepainter_pixels.encode_png(mask)
+	exr = mattepainter_pixels.encode_exr(plate)
+	assert png[:8] == b'\x89PNG\r\n\x1a\n' and exr[:4] == struct.pack('<i', 20000630)
+	assert np.array_equal(decode_png(png), mask)
+	assert np.array_equal(decode_exr(exr, WIDTH, HEIGHT), plate)
+	assert len(png) < mask.size // 20
+
+def test_write_image_file_replaces_atomically(tmp_path):
+	filepath = os.path.join(tmp_path, 'mask.png')
+	pixels = synthetic_plate(WIDTH, HEIGHT)
+	mattepainter_pixels.write_image_file(filepath, pixels, 'PNG')
+	mattepainter_pixels.write_image_file(filepath, np.zeros_like(pixels), 'PNG')
+	assert os.listdir(tmp_path) == ['mask.png']
+	with open(filepath, 'rb') as file:
+		assert np.all(decode_png(file.read()) == 0.0)